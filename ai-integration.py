@@ -1,10 +1,25 @@
 import os
 import openai
 from flask import Flask, request, jsonify
+from context_snapshot import FinancialContextService
+from llm_cache import LLMResponseCache
+from intent_router import IntentRouter
 
 # Initialize OpenAI API
 openai.api_key = os.environ.get("OPENAI_API_KEY", "your-api-key-here")
 
+# Chat context snapshot, rebuilt only when the data files change
+financial_context_service = FinancialContextService()
+
+# Seconds an OpenAI call may take; callers waiting for an identical call give up after it and ask themselves
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 60))
+
+# Answers to repeated questions (e.g. the preset common_questions), shared across requests
+llm_cache = LLMResponseCache(in_flight_timeout=LLM_TIMEOUT)
+
+# Classifies messages for the rule-based recommendations (English and Spanish)
+intent_router = IntentRouter()
+
 # This function would be part of your Flask application
 @app.route('/api/chat', methods=['POST'])
 def chat():
@@ -17,34 +32,29 @@ def chat():
     financial_context = get_financial_context()  # You'd implement this function
     
     # Create the prompt with financial context
-    system_prompt = f"""
-    You are a financial assistant for SMEs in Chile. You have access to the following financial data:
-    
-    Cash Balance: ${financial_context['cash_balance']}M
-    Revenue: ${financial_context['monthly_revenue']}M per month
-    Expenses: ${financial_context['monthly_expenses']}M per month
-    
-    Your role is to provide financial advice, analyze trends, and suggest optimizations.
-    Always provide specific, actionable advice based on the financial data.
-    """
+    system_prompt = financial_context["system_prompt"]
     
     try:
-        # Call the OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-4",  # Or another appropriate model
-            messages=[
-                {"role": "system", "content": system_prompt},
-                # Include previous conversation history
-                *[{"role": msg["role"], "content": msg["content"]} for msg in chat_history],
-                # Add the current user message
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
+        # Call the OpenAI API, unless the same question was just answered for the same data
+        def complete():
+            response = openai.ChatCompletion.create(
+                model="gpt-4",  # Or another appropriate model
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    # Include previous conversation history
+                    *[{"role": msg["role"], "content": msg["content"]} for msg in chat_history],
+                    # Add the current user message
+                    {"role": "user", "content": user_message}
+                ],
+                temperature=0.7,
+                max_tokens=500,
+                request_timeout=LLM_TIMEOUT
+            )
+            return response.choices[0].message.content
         
         # Extract the AI's response
-        ai_message = response.choices[0].message.content
+        ai_message = llm_cache.get_or_compute(llm_cache.key(user_message, financial_context, chat_history), complete,
+                                              timeout=LLM_TIMEOUT)
         
         # Generate relevant recommendations based on the user's question
         recommendations = generate_recommendations(user_message, financial_context)
@@ -63,28 +73,8 @@ def chat():
 
 def get_financial_context():
     """Get relevant financial data for the AI context"""
-    # In a real application, you would fetch this from your database
-    # For the demo, we'll use the generated data
-    
-    with open('data/chilean_sme_financial_data.json', 'r') as f:
-        financial_data = json.load(f)
-    
-    with open('data/ai_recommendations.json', 'r') as f:
-        recommendations = json.load(f)
-    
-    # Get the most recent financial data
-    latest_month = financial_data["monthly_data"][-1]
-    
-    return {
-        "cash_balance": recommendations["financial_metrics"]["cash_balance"],
-        "monthly_revenue": latest_month["income_statement"]["revenue"],
-        "monthly_expenses": latest_month["income_statement"]["operating_expenses"] + latest_month["income_statement"]["cost_of_goods_sold"],
-        "accounts_receivable": latest_month["balance_sheet"]["accounts_receivable"],
-        "accounts_payable": latest_month["balance_sheet"]["accounts_payable"],
-        "inventory": latest_month["balance_sheet"]["inventory"],
-        "current_ratio": latest_month["financial_ratios"]["current_ratio"],
-        "profit_margin": latest_month["financial_ratios"]["profit_margin"]
-    }
+    # Served from memory; the JSON files are only re-read after they change
+    return financial_context_service.get()
 
 def generate_recommendations(user_message, financial_context):
     """Generate tailored recommendations based on user query and financial data"""
@@ -92,8 +82,9 @@ def generate_recommendations(user_message, financial_context):
     
     # Simple rule-based recommendation system
     # In a real application, this could be much more sophisticated
+    intents = intent_router.intents_of(user_message)
     
-    if any(word in user_message.lower() for word in ["cash", "cashflow", "cash flow", "liquidity"]):
+    if "cash_flow" in intents:
         if financial_context["accounts_receivable"] > financial_context["monthly_revenue"] * 0.8:
             recommendations.append({
                 "type": "cash_flow",
@@ -103,7 +94,7 @@ def generate_recommendations(user_message, financial_context):
                 "action": "Create payment plan"
             })
     
-    if any(word in user_message.lower() for word in ["expense", "cost", "spending"]):
+    if "expenses" in intents:
         recommendations.append({
             "type": "expense",
             "title": "Expense Optimization",
@@ -112,7 +103,7 @@ def generate_recommendations(user_message, financial_context):
             "action": "View expense breakdown"
         })
     
-    if any(word in user_message.lower() for word in ["forecast", "predict", "future"]):
+    if "forecast" in intents:
         recommendations.append({
             "type": "forecast",
             "title": "Financial Forecast",
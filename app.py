@@ -1,68 +1,366 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for, g, has_request_context
 import os
+import re
 import json
+import time
+import itertools
 import random
+import threading
+import click
+from contextlib import contextmanager
+from collections import OrderedDict
 from datetime import datetime, timedelta
-import requests  # For AI service API calls
+try:
+    import fcntl
+except ImportError:  # Windows: data generation is not locked across processes
+    fcntl = None
 
 # Import our data generator
 from financial_data_model import ChileanSMEFinancialDataGenerator
+from columnar_store import ColumnarStore, append_store, store_exists, write_store
+from response_cache import ResponseCache
+from financing_ledger import FinancingLedger
+from investment_ranking import InvestmentRanker, parse_weights
+from llm_client import StreamingLLMClient, LLMBusyError
+from llm_cache import LLMResponseCache
+from intent_router import IntentRouter
+from liquidity_risk import inputs_from_store, simulate_liquidity
+from ratio_engine import RatioEngine, IncrementalRatios, FINANCIAL_RATIOS, WORKING_CAPITAL_RATIOS, store_ratio_inputs
+from metrics import Metrics, instrument, phase
+from fragment_cache import FragmentCache, FragmentCacheExtension
+from tenant_store import Tenant, TenantStore, UnknownTenantError
+from request_ledger import RequestLedger, DETAIL_FIELDS
+from integrity import validate_financial_data
 
 app = Flask(__name__)
 
+# Latency histograms, Server-Timing headers and Prometheus metrics at /metrics
+metrics = Metrics()
+instrument(app, metrics)
+data_load_seconds = metrics.histogram("data_load_duration_seconds",
+                                      "Time to load a company's data or generate it.", ("kind",))
+
 # Initialize OpenAI API (you'll need to replace with your actual API key in production)
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "your-api-key-here")
 
-# Load or generate data on startup
-def load_or_generate_data():
+# Pooled streaming client; set OPENAI_BASE_URL to use llm_stub_server.py offline
+llm_client = StreamingLLMClient.from_env()
+# In-flight answers are given up on once every waiter would have timed out
+llm_cache = LLMResponseCache(in_flight_timeout=llm_client.acquire_timeout + llm_client.timeout)
+
+# Classifies chat messages for the rule-based answers (English and Spanish)
+intent_router = IntentRouter()
+
+# Statements are served from a memory-mapped columnar store; the JSON files are exports.
+# Company 0 keeps the original layout under data/, every other company gets a shard under data/tenants/<id>/
+DATA_DIR = 'data'
+TENANTS_DIR = 'data/tenants'
+STORE_DIR = 'data/store'
+DEFAULT_COMPANY = 0
+# Company ids served are 0 to MAX_COMPANIES - 1. Only the default company is generated on its first request;
+# the others are served once `flask generate-companies` has written their shards, and are a 404 before
+MAX_COMPANIES = int(os.environ.get('MAX_COMPANIES', 10000))
+# Memory budget of the companies kept loaded; the least recently used are dropped beyond it
+TENANT_CACHE_BYTES = int(os.environ.get('TENANT_CACHE_MB', 256)) * 1024 * 1024
+# Held while loading or generating a company's data, so that concurrent workers generate it only once
+DATA_LOCK_FILE = '.lock'
+
+def tenant_dir(company_id):
+    """Directory of a company's data."""
+    return DATA_DIR if company_id == DEFAULT_COMPANY else os.path.join(TENANTS_DIR, str(company_id))
+
+@contextmanager
+def data_lock(directory=DATA_DIR):
+    """Exclusive lock on a data directory across processes (a no-op where flock is unavailable)."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, DATA_LOCK_FILE), 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def load_or_generate_data(company_id=DEFAULT_COMPANY, generate=True):
+    """
+    Load a company's data, generating it first if it is missing and generate is set
+    (UnknownTenantError otherwise); workers starting together wait for the first one.
+    """
+    with data_lock(tenant_dir(company_id)):
+        return _load_or_generate_data(company_id, generate)
+
+def _load_or_generate_data(company_id, generate):
+    directory = tenant_dir(company_id)
+    store_dir = os.path.join(directory, 'store')
+    statements_path = os.path.join(directory, 'chilean_sme_financial_data.json')
+    financing_path = os.path.join(directory, 'financing_data.json')
+    recommendations_path = os.path.join(directory, 'ai_recommendations.json')
+
     # Check if data files exist
-    if (os.path.exists('data/chilean_sme_financial_data.json') and 
-        os.path.exists('data/financing_data.json') and 
-        os.path.exists('data/ai_recommendations.json')):
+    if (os.path.exists(statements_path) and 
+        os.path.exists(financing_path) and 
+        os.path.exists(recommendations_path)):
         
-        # Load existing data
-        with open('data/chilean_sme_financial_data.json', 'r') as f:
-            financial_data = json.load(f)
+        # Build the columnar store once from an existing JSON export
+        if not store_exists(store_dir):
+            with open(statements_path, 'r') as f:
+                write_store(store_dir, json.load(f))
         
-        with open('data/financing_data.json', 'r') as f:
+        with open(financing_path, 'r') as f:
             financing_data = json.load(f)
             
-        with open('data/ai_recommendations.json', 'r') as f:
+        with open(recommendations_path, 'r') as f:
             ai_recommendations = json.load(f)
+    elif not generate:
+        raise UnknownTenantError(f"Unknown company {company_id}")
     else:
-        # Ensure data directory exists
-        os.makedirs('data', exist_ok=True)
-        
-        # Generate new data
-        generator = ChileanSMEFinancialDataGenerator()
-        financial_data = generator.generate_all_data()
-        financing_data = generator.create_financing_data()
-        ai_recommendations = generator.generate_ai_recommendations()
+        # Generate new data; other companies get their own reproducible random stream
+        with data_load_seconds.time("generate"):
+            if company_id == DEFAULT_COMPANY:
+                generator = ChileanSMEFinancialDataGenerator()
+            else:
+                generator = ChileanSMEFinancialDataGenerator(company_name=f"Company {company_id + 1:06d}",
+                                                             seed=company_id)
+            financial_data = generator.generate_all_data()
+            financing_data = generator.create_financing_data()
+            ai_recommendations = generator.generate_ai_recommendations()
         
+        # Statements that do not add up are still served, but logged with where they break
+        integrity = validate_financial_data(financial_data)
+        if not integrity.ok:
+            app.logger.warning(f"Company {company_id}: {integrity.total_violations} accounting integrity "
+                               f"violations, first {integrity.examples[0]}")
+
         # Save to files
-        with open('data/chilean_sme_financial_data.json', 'w') as f:
+        write_store(store_dir, financial_data)
+        
+        # Generator state lets a scheduled job extend the data with append_months()
+        generator.save_state(os.path.join(directory, 'generator_state.json'))
+        
+        with open(statements_path, 'w') as f:
             json.dump(financial_data, f, indent=2)
         
-        with open('data/financing_data.json', 'w') as f:
+        with open(financing_path, 'w') as f:
             json.dump(financing_data, f, indent=2)
             
-        with open('data/ai_recommendations.json', 'w') as f:
+        with open(recommendations_path, 'w') as f:
             json.dump(ai_recommendations, f, indent=2)
     
+    # Lazy view: only the periods a request touches are read from the memory maps
+    financial_data = ColumnarStore(store_dir).company(0)
     return financial_data, financing_data, ai_recommendations
 
-# Global data store
-financial_data, financing_data, ai_recommendations = load_or_generate_data()
+# Files whose modification times identify the loaded data version of a company
+DATA_FILES = [os.path.join('store', 'manifest.json'), 'financing_data.json', 'ai_recommendations.json']
+# Seconds between checks for data regenerated by another process
+DATA_CHECK_INTERVAL = 5
+
+def data_fingerprint(company_id=DEFAULT_COMPANY):
+    """Modification times of a company's data files; changes whenever the data is regenerated."""
+    fingerprint = []
+    for path in DATA_FILES:
+        try:
+            fingerprint.append(os.stat(os.path.join(tenant_dir(company_id), path)).st_mtime_ns)
+        except FileNotFoundError:
+            fingerprint.append(0)
+    return tuple(fingerprint)
+
+last_data_check = time.monotonic()
+
+# Set to load a synthetic contract book of this size instead of the financing history, for load testing
+BULK_CONTRACTS = int(os.environ.get('BULK_CONTRACTS', 0))
+CONTRACTS_PER_PAGE = 20
+MAX_CONTRACTS_LIMIT = 1000
+
+def build_financing_ledger(financing_data):
+    """Indexed contracts with running totals, for the dashboard and the contracts API."""
+    if BULK_CONTRACTS:
+        generator = ChileanSMEFinancialDataGenerator(seed=0)
+        return FinancingLedger.from_columns(generator.generate_financing_history(BULK_CONTRACTS, rng=0))
+    return FinancingLedger.from_records(financing_data["financing_history"])
+
+# Same for the investment options
+BULK_INVESTMENT_OPTIONS = int(os.environ.get('BULK_INVESTMENT_OPTIONS', 0))
+OPTIONS_PER_PAGE = 20
+MAX_OPTIONS_LIMIT = 1000
+
+def build_investment_ranker(financing_data):
+    """Indexed investment options, ranked for the investment options page and API."""
+    if BULK_INVESTMENT_OPTIONS:
+        generator = ChileanSMEFinancialDataGenerator(seed=0)
+        return InvestmentRanker.from_columns(generator.generate_investment_options(BULK_INVESTMENT_OPTIONS, rng=0))
+    return InvestmentRanker.from_records(financing_data["investment_options"])
+
+def load_tenant(company_id):
+    """
+    Load one company's data with its indexes; the loader of the tenant store. Only the
+    default company is generated on demand, the others must have been generated with
+    `flask generate-companies`.
+    """
+    if not 0 <= company_id < MAX_COMPANIES:
+        raise UnknownTenantError(f"Unknown company {company_id}")
+    generate = company_id == DEFAULT_COMPANY
+    # Checked before taking the lock, which would create the directory
+    if not generate and not os.path.isdir(tenant_dir(company_id)):
+        raise UnknownTenantError(f"Unknown company {company_id}")
+    with phase("data_load"), data_load_seconds.time("load"):
+        financial_data, financing_data, ai_recommendations = load_or_generate_data(company_id, generate)
+        directory = tenant_dir(company_id)
+        return Tenant(company_id, data_fingerprint(company_id), financial_data, financing_data, ai_recommendations,
+                      build_financing_ledger(financing_data), build_investment_ranker(financing_data),
+                      files=[os.path.join(directory, 'store'), *(os.path.join(directory, path) for path in DATA_FILES[1:])])
+
+# Loaded companies, least recently used dropped first
+tenant_store = TenantStore(load_tenant, max_bytes=TENANT_CACHE_BYTES)
+
+@app.cli.command('generate-companies')
+@click.argument('first', type=int)
+@click.argument('count', type=int, default=1)
+def generate_companies(first, count):
+    """Generate the data shards of companies FIRST to FIRST + COUNT - 1 that do not exist yet."""
+    if first < 0 or first + count > MAX_COMPANIES:
+        raise click.BadParameter(f"company ids must be between 0 and {MAX_COMPANIES - 1}")
+    start = time.perf_counter()
+    for company_id in range(first, first + count):
+        load_or_generate_data(company_id)
+    click.echo(f"{count} companies ready under {TENANTS_DIR} in {time.perf_counter() - start:.1f}s")
+
+@app.cli.command('append-months')
+@click.argument('company', type=int)
+@click.option('--months', type=int, default=1, help='Months to append.')
+def append_company_months(company, months):
+    """
+    Extend a generated company's statements by MONTHS months from its saved generator
+    state. Only the new months and the quarters and years they fall in are written.
+    """
+    directory = tenant_dir(company)
+    state_path = os.path.join(directory, 'generator_state.json')
+    if not os.path.exists(state_path):
+        raise click.BadParameter(f"no generator state for company {company}")
+    if months < 1:
+        raise click.BadParameter("months must be positive")
+    start = time.perf_counter()
+    with data_lock(directory):
+        generator = ChileanSMEFinancialDataGenerator.load_state(state_path)
+        update = generator.append_months(months)
+        written = append_store(os.path.join(directory, 'store'), update)
+        generator.save_state(state_path)
+    click.echo(f"Company {company} extended to {update['period_end']}: {written} periods written "
+               f"in {time.perf_counter() - start:.2f}s")
+
+def current_company_id():
+    """The company id of the request, from its company query parameter (DEFAULT_COMPANY without one)."""
+    company = request.args.get('company', '')
+    if not company:
+        return DEFAULT_COMPANY
+    # isdigit() also accepts digits such as "²" that int() rejects
+    if not company.isdecimal() or int(company) >= MAX_COMPANIES:
+        raise UnknownTenantError(f"Unknown company {company}")
+    return int(company)
+
+def current_tenant():
+    """The loaded data of the request's company."""
+    if 'tenant' not in g:
+        g.tenant = tenant_store.get(current_company_id())
+    return g.tenant
+
+# Financing requests submitted through the app, for every company
+REQUEST_LEDGER_PATH = os.path.join(DATA_DIR, 'financing_requests.db')
+_request_ledger = None
+_request_ledger_lock = threading.Lock()
+
+def request_ledger():
+    """
+    The financing request ledger, opened on first use: its writer thread and connections
+    must not be created in the gunicorn master, so every worker opens its own.
+    """
+    global _request_ledger
+    with _request_ledger_lock:
+        if _request_ledger is None:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            _request_ledger = RequestLedger(REQUEST_LEDGER_PATH)
+        return _request_ledger
+
+# Serialized API responses, valid for one data version of one company
+response_cache = ResponseCache()
+
+# Rendered {% cache %} blocks of the page templates, per data version and company
+app.jinja_env.add_extension(FragmentCacheExtension)
+fragment_cache = FragmentCache(context=lambda: (current_tenant().version, current_tenant().company_id))
+app.jinja_env.fragment_cache = fragment_cache
+
+# Statement ratios plus the working-capital cycle, compiled once and served by /api/ratios
+ratio_engine = RatioEngine({**FINANCIAL_RATIOS, **WORKING_CAPITAL_RATIOS})
+# Ratios per company and granularity, kept across data versions so that after append_months()
+# only the new and changed periods are evaluated; least recently used dropped beyond the limit
+MAX_RATIO_STATES = 1024
+ratio_states = OrderedDict()
+ratio_states_lock = threading.Lock()
+
+# Bounds of a liquidity simulation per request, about 0.3s of CPU at most; larger runs go through liquidity_risk.py
+MAX_LIQUIDITY_PATHS = 100_000
+MAX_LIQUIDITY_MONTHS = 24
+
+def reload_data():
+    """Drop every loaded company and the responses cached for it, so that data is reloaded from disk."""
+    tenant_store.clear()
+    response_cache.clear()
+    fragment_cache.clear()
+
+def warm_up():
+    """
+    Load the default company and fill its per-version caches (chat context, forecasts)
+    ahead of the first request. Called in the gunicorn master with preload_app, so forked
+    workers share the results.
+    """
+    tenant = tenant_store.get(DEFAULT_COMPANY)
+    tenant.context_service.get()
+    tenant.forecast_service.summary()
+    tenant.financing_ledger.summary()
+
+@app.before_request
+def refresh_data_if_changed():
+    """
+    Drop loaded companies whose data was regenerated by another process, checking at most
+    every DATA_CHECK_INTERVAL seconds; they are reloaded on their next request.
+    """
+    global last_data_check
+    now = time.monotonic()
+    if now - last_data_check < DATA_CHECK_INTERVAL:
+        return
+    last_data_check = now
+    for tenant in tenant_store.loaded():
+        if data_fingerprint(tenant.company_id) != tenant.version:
+            tenant_store.discard(tenant.company_id)
+
+@app.url_defaults
+def keep_company(endpoint, values):
+    """Links built with url_for stay on the request's company."""
+    if endpoint != 'static' and has_request_context() and request.args.get('company'):
+        values.setdefault('company', request.args['company'])
+
+@app.errorhandler(UnknownTenantError)
+def unknown_tenant(e):
+    return jsonify({"error": str(e)}), 404
+
+def cached_json_response(key, build):
+    """Serve build()'s JSON from the response cache, with ETag/304 and gzip support."""
+    tenant = current_tenant()
+    entry = response_cache.get((tenant.company_id, tenant.version), key, build,
+                               lambda data: app.json.dumps(data, separators=(",", ":")))
+    return entry.to_response(request)
 
 # --------------- Routes ---------------
 
 @app.route('/')
 def index():
     """Main dashboard / AI Chat page"""
+    tenant = current_tenant()
     return render_template('index.html', 
-                          recommendations=ai_recommendations,
+                          recommendations=tenant.ai_recommendations,
                           user_name="David Smith",
-                          company_name="Company A")
+                          company_name=tenant.name)
 
 @app.route('/plugins')
 def plugins():
@@ -115,35 +413,50 @@ def plugins():
     return render_template('plugins.html', 
                           plugin_categories=plugin_categories,
                           user_name="David Smith",
-                          company_name="Company A")
+                          company_name=current_tenant().name)
 
 @app.route('/financial-options')
 def financial_options():
     """Financial options page"""
+    tenant = current_tenant()
+    page = max(request.args.get('page', 1, type=int), 1)
+    contracts, total = tenant.financing_ledger.page(page, CONTRACTS_PER_PAGE)
     return render_template('financial_options.html',
-                          financing_data=financing_data,
+                          financing_data=tenant.financing_data,
+                          contracts=contracts,
+                          page=page,
+                          page_count=max(1, -(-total // CONTRACTS_PER_PAGE)),
                           user_name="David Smith",
-                          company_name="Company A")
+                          company_name=tenant.name)
 
 @app.route('/dashboard')
 def dashboard():
     """Portfolio dashboard page"""
     # Get the most recent financial data for the dashboard
-    latest_monthly = financial_data["monthly_data"][-1]
+    tenant = current_tenant()
+    latest_monthly = tenant.financial_data["monthly_data"][-1]
+    
+    # Totals come from the ledger's running aggregates; only one page of contracts is rendered
+    summary = tenant.financing_ledger.summary()
+    page = max(request.args.get('page', 1, type=int), 1)
+    contracts, total = tenant.financing_ledger.page(page, CONTRACTS_PER_PAGE)
     
     portfolio_info = {
         "roi": 23.54,  # Example ROI percentage
-        "open_contracts": sum(1 for item in financing_data["financing_history"] if item["status"] != "Closed"),
-        "total_value": sum(item["amount"] for item in financing_data["financing_history"]),
+        "open_contracts": summary["open_contracts"],
+        "total_value": summary["total_amount"],
         "active_investments": random.randint(3, 8),
-        "contract_data": financing_data["financing_history"]
+        "contract_data": contracts,
+        "forecast": tenant.forecast_service.summary()
     }
     
     return render_template('dashboard.html',
                           portfolio=portfolio_info,
+                          page=page,
+                          page_count=max(1, -(-total // CONTRACTS_PER_PAGE)),
                           monthly_data=latest_monthly,
                           user_name="Elizabeth Jones",  # Different user for this view based on screenshots
-                          company_name="Company XYZ")  # Different company for this view based on screenshots
+                          company_name=tenant.name)
 
 @app.route('/financing-request/<request_id>')
 def financing_request(request_id):
@@ -151,15 +464,40 @@ def financing_request(request_id):
     return render_template('financing_request.html',
                           request_id=request_id,
                           user_name="David Smith",
-                          company_name="Company A")
+                          company_name=current_tenant().name)
 
 @app.route('/investment-options')
 def investment_options():
-    """Investment options page"""
+    """Investment options page, best ranked first"""
+    tenant = current_tenant()
+    page = max(request.args.get('page', 1, type=int), 1)
+    try:
+        ranked = tenant.investment_ranker.top(OPTIONS_PER_PAGE, (page - 1) * OPTIONS_PER_PAGE,
+                                       **investment_filters(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return render_template('investment_options.html',
-                          investment_options=financing_data["investment_options"],
+                          investment_options=ranked["options"],
+                          filters={key: value for key, value in request.args.items() if key not in ('page', 'company') and value},
+                          page=page,
+                          page_count=max(1, -(-ranked["total"] // OPTIONS_PER_PAGE)),
                           user_name="Elizabeth Jones",
-                          company_name="Company XYZ")
+                          company_name=tenant.name)
+
+def investment_filters(args):
+    """Ranking filters and weights from query parameters; invalid numbers raise ValueError."""
+    filters = {}
+    for name in ('min_credit', 'max_credit', 'min_timeframe', 'max_timeframe'):
+        if args.get(name):
+            try:
+                filters[name] = int(args[name])
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+    if args.get('default_risk'):
+        filters['default_risk'] = args['default_risk']
+    if args.get('weights'):
+        filters['weights'] = parse_weights(args['weights'])
+    return filters
 
 # --------------- API Endpoints ---------------
 
@@ -171,9 +509,13 @@ def chat():
     
     # In a real application, you would call your AI service here
     # This is a placeholder for the demo
-    
+    return jsonify(rule_based_response(user_message))
+
+def rule_based_response(user_message):
+    """Canned demo answer and recommendations for a chat message"""
     # Simple rule-based responses for demo purposes
-    if "cashflow" in user_message.lower() or "cash flow" in user_message.lower():
+    intent = intent_router.best(user_message)
+    if intent == "cash_flow":
         response = {
             "text": "Based on your current financial data, I recommend optimizing your cash flow by invoicing clients earlier. Your accounts receivable are currently at 60 days on average, which is quite high. Reducing this to 45 days could improve your cash position by approximately 25%.",
             "recommendations": [
@@ -184,7 +526,7 @@ def chat():
                 }
             ]
         }
-    elif "expenses" in user_message.lower():
+    elif intent == "expenses":
         response = {
             "text": "Your highest increasing expenses this month are marketing costs (up 12%) and software subscriptions (up 8%). I recommend reviewing your SaaS subscriptions for any unused services that could be cancelled.",
             "recommendations": [
@@ -195,9 +537,13 @@ def chat():
                 }
             ]
         }
-    elif "predict" in user_message.lower() or "forecast" in user_message.lower():
+    elif intent == "forecast":
+        forecast = current_tenant().forecast_service.summary()
+        month, quarter = forecast["horizons"]["30"], forecast["horizons"]["90"]
+        # No percentage change from zero cash, e.g. for ledgers imported from an empty opening balance
+        cash_change = f" ({month['cash_change_pct']:+}%)" if month['cash_change_pct'] is not None else ""
         response = {
-            "text": "Based on your current trends, in 30 days your financial position is projected to improve by 5.2%. Your cash reserves should increase to approximately $10.92M with sustained revenue growth at 3.8% monthly.",
+            "text": f"Based on your revenue trend and seasonality, over the next 30 days revenue is projected at ${month['revenue']}M against ${month['expenses']}M of expenses. Your cash reserves should reach approximately ${month['cash']}M{cash_change}, and ${quarter['cash']}M in 90 days, with revenue growing {forecast['monthly_revenue_growth_pct']}% monthly.",
             "recommendations": [
                 {
                     "type": "planning",
@@ -212,17 +558,365 @@ def chat():
             "recommendations": []
         }
     
-    return jsonify(response)
+    return response
+
+def get_financial_context():
+    """Get relevant financial data for the AI context"""
+    return current_tenant().context_service.get()
+
+def build_chat_messages(user_message, chat_history):
+    """System prompt with the financial context, the recent history and the new message"""
+    return [
+        {"role": "system", "content": get_financial_context()["system_prompt"]},
+        *[{"role": msg["role"], "content": msg["content"]} for msg in chat_history],
+        {"role": "user", "content": user_message}
+    ]
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Stream the assistant's answer as Server-Sent Events: one "data" event per text
+    chunk, then a "done" event with the recommendations (or an "error" event).
+    Without a configured LLM the demo's rule-based answer is streamed instead.
+    """
+    data = request.json
+    user_message = data.get('message', '')
+    chat_history = data.get('history', [])
+    fallback = rule_based_response(user_message)
+    
+    if not llm_client.configured:
+        return sse_response(iter(re.findall(r"\S+\s*", fallback["text"])), fallback["recommendations"])
+    
+    # Identical questions against the same data share one answer and one upstream call
+    cache_key = llm_cache.key(user_message, get_financial_context(), chat_history)
+    answer, pending, owner = llm_cache.lookup(cache_key)
+    if pending is not None:
+        try:
+            with phase("llm"):
+                answer = pending.result(timeout=llm_client.acquire_timeout + llm_client.timeout)
+        except Exception as e:
+            app.logger.error(f"Coalesced LLM request failed: {e}")
+            return jsonify({"text": "I'm sorry, I encountered an error processing your request. Please try again.",
+                            "recommendations": []}), 502
+    if answer is not None:
+        return sse_response(iter(re.findall(r"\S+\s*", answer)), fallback["recommendations"])
+    
+    upstream = llm_client.stream(build_chat_messages(user_message, chat_history))
+    # Wait for the first token here so that failures before it get a proper status code
+    try:
+        with phase("llm"):
+            first_token = next(upstream, "")
+    except LLMBusyError as e:
+        llm_cache.fail(cache_key, owner, e)
+        return jsonify({"text": "The assistant is busy right now. Please try again in a moment.",
+                        "recommendations": []}), 503
+    except Exception as e:
+        llm_cache.fail(cache_key, owner, e)
+        app.logger.error(f"Error calling the LLM API: {e}")
+        return jsonify({"text": "I'm sorry, I encountered an error processing your request. Please try again.",
+                        "recommendations": []}), 502
+    
+    started = False
+    
+    def tokens():
+        nonlocal started
+        started = True
+        parts = []
+        completed = False
+        try:
+            for token in itertools.chain([first_token], upstream):
+                parts.append(token)
+                yield token
+            llm_cache.complete(cache_key, owner, "".join(parts))
+            completed = True
+        finally:
+            if not completed:
+                llm_cache.fail(cache_key, owner, ConnectionAbortedError("The answer was not completed"))
+            # Cancels the upstream call if the client disconnected mid-stream
+            upstream.close()
+    
+    def release_unstarted():
+        # Closing a generator that never started skips its finally block
+        if not started:
+            llm_cache.fail(cache_key, owner, ConnectionAbortedError("The response was closed before streaming"))
+            upstream.close()
+    
+    response = sse_response(tokens(), fallback["recommendations"])
+    response.call_on_close(release_unstarted)
+    return response
+
+def sse_response(tokens, recommendations):
+    """Stream text chunks as "data" events followed by a "done" event with the recommendations"""
+    def events():
+        try:
+            for token in tokens:
+                yield sse_event({"text": token})
+            yield sse_event({"recommendations": recommendations}, event="done")
+        except Exception as e:
+            app.logger.error(f"LLM stream failed: {e}")
+            yield sse_event({"text": "The answer was interrupted. Please try again."}, event="error")
+        finally:
+            if hasattr(tokens, "close"):
+                tokens.close()
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/chat/cache-stats')
+def chat_cache_stats():
+    """Hit, miss and coalescing counters of the LLM response cache"""
+    return jsonify(llm_cache.stats())
+
+@app.route('/api/tenant-stats')
+def tenant_stats():
+    """Loaded companies, their size and the hit, miss and eviction counters of the tenant store"""
+    return jsonify(tenant_store.stats())
+
+@app.route('/api/fragment-cache-stats')
+def fragment_cache_stats():
+    """Entries, size and hit counters of the template fragment cache"""
+    return jsonify(fragment_cache.stats())
 
 @app.route('/api/financial-data')
 def get_financial_data():
-    """API endpoint to get financial data"""
-    return jsonify(financial_data)
+    """
+    API endpoint to get financial data.
+    
+    Without query parameters the whole dataset is returned. Otherwise supports:
+    granularity (monthly/quarterly/yearly), start and end (ISO dates), statements and
+    fields (comma-separated), limit and cursor (next_cursor of the previous page).
+    """
+    args = request.args
+    try:
+        return cached_json_response(('financial-data', tuple(sorted(args.items(multi=True)))),
+                                    lambda: query_financial_data(args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def query_financial_data(args):
+    """Build the /api/financial-data payload for the given query parameters."""
+    financial_data = current_tenant().financial_data
+    if not args.keys() - {'company'}:
+        return financial_data.to_dict()
+    
+    page = financial_data.query(
+        granularity=args.get('granularity', 'monthly'),
+        start=args.get('start'),
+        end=args.get('end'),
+        statements=args['statements'].split(',') if args.get('statements') else None,
+        fields=args['fields'].split(',') if args.get('fields') else None,
+        cursor=args.get('cursor'),
+        limit=int(args['limit']) if args.get('limit') else None
+    )
+    page["company_info"] = financial_data["company_info"]
+    return page
+
+@app.route('/api/financing/contracts')
+def get_financing_contracts():
+    """
+    API endpoint to query financing contracts.
+    
+    Supports status (comma-separated), start and end (ISO request dates), min_amount and
+    max_amount, sort (comma-separated keys, "-" for descending, e.g. "-amount,request_date"),
+    limit and cursor (next_cursor of the previous page).
+    """
+    args = request.args
+    try:
+        return cached_json_response(('financing-contracts', tuple(sorted(args.items(multi=True)))),
+                                    lambda: query_financing_contracts(args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def query_financing_contracts(args):
+    """Build the /api/financing/contracts payload for the given query parameters."""
+    limit = int(args.get('limit', 50))
+    if limit > MAX_CONTRACTS_LIMIT:
+        raise ValueError(f"limit must be at most {MAX_CONTRACTS_LIMIT}")
+    return current_tenant().financing_ledger.query(
+        status=args['status'].split(',') if args.get('status') else None,
+        start=args.get('start'),
+        end=args.get('end'),
+        min_amount=float(args['min_amount']) if args.get('min_amount') else None,
+        max_amount=float(args['max_amount']) if args.get('max_amount') else None,
+        sort=args.get('sort', 'id'),
+        cursor=args.get('cursor'),
+        limit=limit
+    )
+
+@app.route('/api/financing/requests', methods=['POST'])
+def submit_financing_request():
+    """
+    Record a financing request of the company: amount (required), request_date (ISO,
+    today by default), purpose, lending_type, rate, duration_days and payments.
+    """
+    # Resolved first, so unknown companies are a 404 before the ledger is opened
+    company_id = current_tenant().company_id
+    data = request.json or {}
+    try:
+        request_id = request_ledger().submit(
+            company_id, data.get('amount', 0), request_date=data.get('request_date'),
+            **{field: data[field] for field in DETAIL_FIELDS if data.get(field) not in (None, '')})
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"id": request_id}), 201
+
+@app.route('/api/financing/requests')
+def get_financing_requests():
+    """
+    API endpoint to query the company's submitted financing requests, newest first.
+    
+    Supports status (comma-separated), start and end (ISO request dates), limit and
+    cursor (next_cursor of the previous page).
+    """
+    company_id = current_tenant().company_id
+    args = request.args
+    try:
+        limit = int(args.get('limit', 50))
+        if limit > MAX_CONTRACTS_LIMIT:
+            raise ValueError(f"limit must be at most {MAX_CONTRACTS_LIMIT}")
+        return jsonify(request_ledger().query(
+            company_id,
+            status=args['status'].split(',') if args.get('status') else None,
+            start=args.get('start'),
+            end=args.get('end'),
+            limit=limit,
+            cursor=args.get('cursor')
+        ))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/financing/requests/summary')
+def get_financing_requests_summary():
+    """Number and total amount of the company's submitted financing requests per status"""
+    company_id = current_tenant().company_id
+    return jsonify(request_ledger().summary(company_id))
+
+@app.route('/api/financing/requests/<int:request_id>')
+def get_financing_request(request_id):
+    """One submitted financing request with its status transitions"""
+    company_id = current_tenant().company_id
+    financing_request = request_ledger().get(request_id)
+    if financing_request is None or financing_request["company_id"] != company_id:
+        return jsonify({"error": f"Unknown financing request {request_id}"}), 404
+    return jsonify(financing_request)
+
+@app.route('/api/financing/requests/<int:request_id>/status', methods=['POST'])
+def set_financing_request_status(request_id):
+    """Move a submitted financing request to another status; the transition is recorded."""
+    company_id = current_tenant().company_id
+    financing_request = request_ledger().get(request_id)
+    if financing_request is None or financing_request["company_id"] != company_id:
+        return jsonify({"error": f"Unknown financing request {request_id}"}), 404
+    status = (request.json or {}).get('status')
+    try:
+        previous = request_ledger().set_status(request_id, status)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"id": request_id, "previous_status": previous, "status": status})
+
+@app.route('/api/investment-options')
+def get_investment_options():
+    """
+    API endpoint to rank investment options.
+    
+    Supports min_credit and max_credit, min_timeframe and max_timeframe (weeks),
+    default_risk (YES/NO), weights (e.g. "customer_credit:0.6,default_risk:0.4"),
+    limit and offset. Options are returned best first with their scores.
+    """
+    args = request.args
+    try:
+        return cached_json_response(('investment-options', tuple(sorted(args.items(multi=True)))),
+                                    lambda: query_investment_options(args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def query_investment_options(args):
+    """Build the /api/investment-options payload for the given query parameters."""
+    limit = int(args.get('limit', 20))
+    if limit > MAX_OPTIONS_LIMIT:
+        raise ValueError(f"limit must be at most {MAX_OPTIONS_LIMIT}")
+    return current_tenant().investment_ranker.top(limit, int(args.get('offset', 0)), **investment_filters(args))
+
+@app.route('/api/forecast')
+def get_forecast():
+    """API endpoint to get the 30/90/365-day revenue, expense and cash forecast"""
+    return cached_json_response(('forecast',), lambda: current_tenant().forecast_service.summary())
+
+@app.route('/api/liquidity-risk')
+def get_liquidity_risk():
+    """
+    API endpoint to get the Monte Carlo liquidity at risk of a company.
+    
+    Supports company, paths, months and seed. The same parameters always give the same result.
+    """
+    args = request.args
+    try:
+        return cached_json_response(('liquidity-risk', tuple(sorted(args.items(multi=True)))),
+                                    lambda: query_liquidity_risk(args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def query_liquidity_risk(args):
+    """Build the /api/liquidity-risk payload for the given query parameters."""
+    paths = int(args.get('paths', 100_000))
+    months = int(args.get('months', 12))
+    if not 0 < paths <= MAX_LIQUIDITY_PATHS or not 0 < months <= MAX_LIQUIDITY_MONTHS:
+        raise ValueError(f"paths must be between 1 and {MAX_LIQUIDITY_PATHS} and months between 1 and {MAX_LIQUIDITY_MONTHS}")
+    tenant = current_tenant()
+    inputs = inputs_from_store(tenant.financial_data.store, months, forecast=tenant.forecast_service.get())
+    risk = simulate_liquidity(inputs, paths, seed=int(args.get('seed', 0)))
+    return risk.summary(0)
+
+@app.route('/api/ratios')
+def get_ratios():
+    """
+    API endpoint to get financial ratios per period, null where a ratio is undefined.
+    
+    Supports granularity (monthly, quarterly or yearly), ratios (comma-separated names) and company.
+    """
+    args = request.args
+    try:
+        return cached_json_response(('ratios', tuple(sorted(args.items(multi=True)))),
+                                    lambda: query_ratios(args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def query_ratios(args):
+    """Build the /api/ratios payload for the given query parameters."""
+    store = current_tenant().financial_data.store
+    granularity = args.get('granularity', 'monthly')
+    if granularity not in ('monthly', 'quarterly', 'yearly'):
+        raise ValueError(f"Unknown granularity: {granularity}")
+    names = args['ratios'].split(',') if args.get('ratios') else ratio_engine.names
+    unknown = [name for name in names if name not in ratio_engine.names]
+    if unknown:
+        raise ValueError(f"Unknown ratios: {', '.join(unknown)}")
+    columns = store_ratio_inputs(store, granularity, ratio_engine)
+    key = (current_tenant().company_id, granularity)
+    with ratio_states_lock:
+        state = ratio_states.pop(key, None) or IncrementalRatios(ratio_engine)
+        ratio_states[key] = state
+        if len(ratio_states) > MAX_RATIO_STATES:
+            ratio_states.popitem(last=False)
+        table = state.update(columns)
+        # The state updates its arrays in place on the next call
+        rows = {name: table[name][0].tolist() for name in names}
+    return {
+        "granularity": granularity,
+        "dates": [str(date) for date in store.period_index(granularity)],
+        "ratios": {name: [None if value != value else round(value, 2) for value in values]
+                   for name, values in rows.items()}
+    }
 
 @app.route('/api/recommendations')
 def get_recommendations():
     """API endpoint to get AI recommendations"""
-    return jsonify(ai_recommendations)
+    return cached_json_response(('recommendations',), lambda: current_tenant().ai_recommendations)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5050))
@@ -0,0 +1,380 @@
+"""
+Benchmarks of the generator, aggregation, data loading, request hot paths, the financing
+request ledger, general-ledger ingestion and statement integrity checks.
+
+Results are written as JSON and compared with a stored baseline; a benchmark is
+reported as a regression when its fastest run is slower than the baseline's by more
+than the tolerance, the minimum being far less noisy than the median. The app is imported in a temporary directory, so its data files are
+generated there and the repository's data/ is left alone.
+
+    python benchmarks.py --save-baseline           # record benchmark_baseline.json
+    python benchmarks.py --fail-on-regression      # compare, exit 1 on regressions
+    python benchmarks.py --quick --only routes
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import threading
+import statistics
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+from financial_data_model import (ChileanSMEFinancialDataGenerator, aggregate_quarterly_data,
+                                  aggregate_yearly_data, FINANCING_STATUSES)
+from request_ledger import RequestLedger
+from gl_ingest import ingest_ledger, write_sample_ledger
+from integrity import validate_batch
+
+RESULTS_FILE = "benchmark_results.json"
+BASELINE_FILE = "benchmark_baseline.json"
+# Slowdown over the baseline reported as a regression
+DEFAULT_TOLERANCE = 1.5
+# Differences below this many seconds are noise, whatever the ratio
+MIN_DIFFERENCE = 2e-4
+
+SIZES = {
+    "full": {"companies": (1, 10, 50), "horizons": (24, 60, 120), "repeat": 5, "requests": 50,
+             "ledger_rows": 2_000_000, "ledger_writes": 20_000, "ledger_queries": 2000, "journal_lines": 2_000_000,
+             "validated_companies": 20_000},
+    "quick": {"companies": (1, 5), "horizons": (24, 60), "repeat": 3, "requests": 10,
+              "ledger_rows": 100_000, "ledger_writes": 2000, "ledger_queries": 200, "journal_lines": 200_000,
+              "validated_companies": 2000}
+}
+GROUPS = ("generator", "aggregation", "load", "routes", "ledger", "ingest", "integrity")
+# Companies the ledger's rows are spread over, and threads submitting requests concurrently
+LEDGER_COMPANIES = 1000
+LEDGER_WRITERS = 16
+
+ROUTES = [
+    ("GET", "/"),
+    ("GET", "/dashboard"),
+    ("GET", "/financial-options"),
+    ("GET", "/investment-options"),
+    ("GET", "/plugins"),
+    ("GET", "/api/financial-data"),
+    ("GET", "/api/financial-data?granularity=quarterly"),
+    ("GET", "/api/financing/contracts?sort=-amount&limit=100"),
+    ("GET", "/api/investment-options?min_credit=50&limit=20"),
+    ("GET", "/api/forecast"),
+    ("GET", "/api/ratios?granularity=quarterly"),
+    ("GET", "/api/liquidity-risk?paths=20000"),
+    ("GET", "/api/recommendations"),
+    ("GET", "/dashboard?company=1"),
+    ("GET", "/api/financial-data?company=1&granularity=quarterly"),
+    ("POST", "/api/chat")
+]
+CHAT_MESSAGE = {"message": "How does my cash flow look?"}
+
+def measure(fn, repeat=5, setup=None):
+    """
+    Time repeat runs of fn after an untimed warm-up run, calling setup untimed before
+    each; median and minimum seconds.
+    """
+    times = []
+    for i in range(repeat + 1):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        if i:
+            times.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(times), "min_seconds": min(times)}
+
+def _generator(seed, months):
+    """A generator covering the given number of months."""
+    generator = ChileanSMEFinancialDataGenerator(seed=seed)
+    generator.end_date = generator.start_date + relativedelta(months=months) - relativedelta(days=1)
+    return generator
+
+def bench_generator(sizes):
+    """Generator throughput as the number of companies and the horizon grow."""
+    results = {}
+    for months in sizes["horizons"]:
+        for n in sizes["companies"]:
+            generators = []
+
+            def setup():
+                generators[:] = [_generator(seed, months) for seed in range(n)]
+                for generator in generators:
+                    generator.generate_all_data()
+
+            def generate_all_data():
+                for seed in range(n):
+                    _generator(seed, months).generate_all_data()
+
+            runs = {
+                "generate_all_data": (generate_all_data, None),
+                "create_financing_data": (lambda: [g.create_financing_data() for g in generators], setup),
+                "generate_ai_recommendations": (lambda: [g.generate_ai_recommendations() for g in generators], setup),
+                "generate_batch": (lambda: _generator(0, months).generate_batch(n, months, rng=0), None)
+            }
+            for name, (fn, before) in runs.items():
+                result = measure(fn, sizes["repeat"], before)
+                result["companies_per_second"] = n / result["seconds"]
+                results[f"generator/{name}/{n}x{months}m"] = result
+    return results
+
+def bench_aggregation(sizes):
+    """Quarterly and yearly aggregation of one company's monthly data."""
+    results = {}
+    for months in sizes["horizons"]:
+        monthly_data = _generator(0, months).generate_all_data()["monthly_data"]
+        results[f"aggregation/quarterly/{months}m"] = measure(lambda: aggregate_quarterly_data(monthly_data),
+                                                              sizes["repeat"])
+        results[f"aggregation/yearly/{months}m"] = measure(lambda: aggregate_yearly_data(monthly_data),
+                                                           sizes["repeat"])
+    return results
+
+def _write_data(generator):
+    """Write the app's JSON exports for one generator into data/, dropping the columnar store."""
+    exports = {
+        "data/chilean_sme_financial_data.json": generator.generate_all_data(),
+        "data/financing_data.json": generator.create_financing_data(),
+        "data/ai_recommendations.json": generator.generate_ai_recommendations()
+    }
+    for path, data in exports.items():
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+    return sum(os.path.getsize(path) for path in exports)
+
+def bench_load(app, sizes):
+    """load_or_generate_data() from JSON exports of growing size, building the store (cold) or not (warm)."""
+    results = {}
+    for months in sizes["horizons"]:
+        file_bytes = _write_data(_generator(0, months))
+        cold = measure(app.load_or_generate_data, sizes["repeat"],
+                       lambda: shutil.rmtree(app.STORE_DIR, ignore_errors=True))
+        warm = measure(app.load_or_generate_data, sizes["repeat"])
+        for name, result in (("cold", cold), ("warm", warm)):
+            result["file_bytes"] = file_bytes
+            result["megabytes_per_second"] = file_bytes / 1e6 / result["seconds"]
+            results[f"load/{name}/{months}m"] = result
+    # Leave the default dataset for the route benchmarks
+    _write_data(ChileanSMEFinancialDataGenerator(seed=0))
+    shutil.rmtree(app.STORE_DIR, ignore_errors=True)
+    app.reload_data()
+    return results
+
+def bench_routes(app, sizes):
+    """Latency of each route through the Flask test client: first request, then warm median and p95."""
+    client = app.app.test_client()
+    results = {}
+    for method, path in ROUTES:
+        def request():
+            if method == "POST":
+                response = client.post(path, json=CHAT_MESSAGE)
+            else:
+                response = client.get(path)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {path} returned {response.status_code}")
+
+        start = time.perf_counter()
+        request()
+        first = time.perf_counter() - start
+        times = []
+        for _ in range(sizes["requests"]):
+            start = time.perf_counter()
+            request()
+            times.append(time.perf_counter() - start)
+        results[f"routes/{method} {path}"] = {
+            "seconds": statistics.median(times),
+            "min_seconds": min(times),
+            "p95_seconds": float(np.percentile(times, 95)),
+            "first_seconds": first
+        }
+    return results
+
+def _latencies(times):
+    return {"seconds": statistics.median(times), "min_seconds": min(times),
+            "p99_seconds": float(np.percentile(times, 99))}
+
+def bench_ledger(sizes):
+    """
+    Financing request ledger holding millions of requests: bulk load rate, sustained
+    inserts per second from concurrent submitters sharing group commits, and the latency
+    of the dashboard queries.
+    """
+    workdir = tempfile.mkdtemp(prefix="sme-ledger-")
+    ledger = RequestLedger(os.path.join(workdir, "requests.db"))
+    rng = np.random.default_rng(0)
+    dates = [str(date) for date in np.arange("2023-01-01", "2025-01-01", dtype="datetime64[D]")]
+    results = {}
+    try:
+        rows = sizes["ledger_rows"]
+        per_company = -(-rows // LEDGER_COMPANIES)
+        start = time.perf_counter()
+        for company in range(LEDGER_COMPANIES):
+            n = min(per_company, rows - company * per_company)
+            statuses = rng.choice(len(FINANCING_STATUSES), n)
+            ledger.add_many(company, [{"amount": amount, "status": FINANCING_STATUSES[status], "request_date": dates[day]}
+                                      for amount, status, day in zip(rng.uniform(1, 100, n).round(2).tolist(),
+                                                                     statuses.tolist(),
+                                                                     rng.integers(0, len(dates), n).tolist())])
+        elapsed = time.perf_counter() - start
+        results[f"ledger/bulk_load/{rows}"] = {"seconds": elapsed / rows, "min_seconds": elapsed / rows,
+                                               "rows_per_second": rows / elapsed}
+
+        writes = sizes["ledger_writes"]
+        commits = ledger.commits
+
+        def submit(worker):
+            for i in range(writes // LEDGER_WRITERS):
+                ledger.submit((worker * 7919 + i) % LEDGER_COMPANIES, 50.0, request_date=dates[-1])
+
+        threads = [threading.Thread(target=submit, args=(worker,)) for worker in range(LEDGER_WRITERS)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        written = writes // LEDGER_WRITERS * LEDGER_WRITERS
+        results[f"ledger/submit/{LEDGER_WRITERS}_writers"] = {
+            "seconds": elapsed / written, "min_seconds": elapsed / written,
+            "inserts_per_second": written / elapsed,
+            "requests_per_commit": written / max(1, ledger.commits - commits)
+        }
+
+        companies = rng.integers(0, LEDGER_COMPANIES, sizes["ledger_queries"]).tolist()
+        queries = {
+            "recent": lambda company: ledger.query(company, limit=20),
+            "status": lambda company: ledger.query(company, status=["Waiting approval"], limit=20),
+            "date_range": lambda company: ledger.query(company, start="2024-01-01", end="2024-03-31", limit=100),
+            "summary": lambda company: ledger.summary(company)
+        }
+        for name, query in queries.items():
+            times = []
+            for company in companies:
+                start = time.perf_counter()
+                query(company)
+                times.append(time.perf_counter() - start)
+            results[f"ledger/query/{name}/{rows}"] = _latencies(times)
+    finally:
+        ledger.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def bench_ingest(sizes):
+    """Monthly statements from a synthetic general-ledger CSV, in journal lines per second."""
+    workdir = tempfile.mkdtemp(prefix="sme-ingest-")
+    try:
+        path = os.path.join(workdir, "ledger.csv")
+        lines = sizes["journal_lines"]
+        write_sample_ledger(path, lines)
+        result = measure(lambda: ingest_ledger(path), max(1, sizes["repeat"] // 2))
+        result["rows_per_second"] = lines / result["seconds"]
+        result["file_bytes"] = os.path.getsize(path)
+        return {f"ingest/general_ledger/{lines}": result}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def bench_integrity(sizes):
+    """Integrity checks of a batch of 24-month companies with its quarterly and yearly rollups."""
+    n = sizes["validated_companies"]
+    batch = _generator(0, 24).generate_batch(n, 24, rng=0)
+    result = measure(lambda: validate_batch(batch), max(1, sizes["repeat"] // 2))
+    result["companies_per_second"] = n / result["seconds"]
+    return {f"integrity/batch/{n}x24m": result}
+
+def run(sizes, groups=GROUPS):
+    """Run the benchmark groups; returns {benchmark name: timings}."""
+    results = {}
+    if "generator" in groups:
+        results.update(bench_generator(sizes))
+    if "aggregation" in groups:
+        results.update(bench_aggregation(sizes))
+    if "ledger" in groups:
+        results.update(bench_ledger(sizes))
+    if "ingest" in groups:
+        results.update(bench_ingest(sizes))
+    if "integrity" in groups:
+        results.update(bench_integrity(sizes))
+    if "load" in groups or "routes" in groups:
+        workdir = tempfile.mkdtemp(prefix="sme-bench-")
+        cwd = os.getcwd()
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        try:
+            os.chdir(workdir)
+            start = time.perf_counter()
+            import app  # generates its data in the working directory
+            elapsed = time.perf_counter() - start
+            results["app/import"] = {"seconds": elapsed, "min_seconds": elapsed}
+            app.load_or_generate_data(1)  # the second company of the multi-company routes
+            if "load" in groups:
+                results.update(bench_load(app, sizes))
+            if "routes" in groups:
+                results.update(bench_routes(app, sizes))
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Per benchmark: baseline minimum seconds, ratio to the baseline and ok/regression/improvement/new."""
+    comparison = {}
+    baseline = baseline.get("results", {}) if baseline else {}
+    for name, result in results.items():
+        if name not in baseline:
+            comparison[name] = {"status": "new"}
+            continue
+        current, previous = result["min_seconds"], baseline[name]["min_seconds"]
+        ratio = current / previous
+        status = "ok"
+        if abs(current - previous) >= MIN_DIFFERENCE:
+            status = "regression" if ratio > tolerance else "improvement" if ratio < 1 / tolerance else "ok"
+        comparison[name] = {"baseline_seconds": previous, "ratio": round(ratio, 3), "status": status}
+    return comparison
+
+def environment():
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark generator, aggregation, loading and routes.")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="also store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    size = "quick" if args.quick else "full"
+    results = run(SIZES[size], args.only)
+    comparison = compare(results, baseline, args.tolerance)
+    report = {"environment": environment(), "size": size, "tolerance": args.tolerance,
+              "baseline": args.baseline if baseline else None, "results": results, "comparison": comparison}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"environment": report["environment"], "size": size, "results": results}, f, indent=2)
+
+    for name, result in results.items():
+        line = f"{name:<70} {result['seconds'] * 1000:10.2f} ms"
+        if comparison[name]["status"] != "new":
+            line += f"  x{comparison[name]['ratio']:<6} {comparison[name]['status']}"
+        print(line)
+    regressions = [name for name, entry in comparison.items() if entry["status"] == "regression"]
+    print(f"{len(results)} benchmarks written to {args.output}, {len(regressions)} regressions")
+    if baseline and baseline.get("size") != size:
+        print(f"Warning: the baseline was recorded with --{baseline.get('size')} sizes")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
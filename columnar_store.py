@@ -0,0 +1,373 @@
+import io
+import os
+import json
+import shutil
+import datetime
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from financial_data_model import (StatementBatch, STATEMENT_FIELDS, QUARTERLY_STATEMENT_FIELDS,
+                                  YEARLY_STATEMENT_FIELDS, column_lists)
+from rollups import rollup
+
+MANIFEST_FILE = "manifest.json"
+STORE_VERSION = 1
+
+# Store granularity -> rollup granularity it is built from (None for the monthly source data)
+GRANULARITIES = {"monthly": None, "quarterly": "quarter", "yearly": "year"}
+# Line items of the period records in the generate_all_data() format
+RECORD_FIELDS = {"monthly": STATEMENT_FIELDS, "quarterly": QUARTERLY_STATEMENT_FIELDS, "yearly": YEARLY_STATEMENT_FIELDS}
+
+def store_exists(directory):
+    return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+def _period_meta(granularity, dates, periods):
+    """Non-statement keys of each period record, in the generate_all_data() format."""
+    if periods is None:
+        return [{"date": d.strftime("%Y-%m-%d"), "year": d.year, "month": d.month} for d in dates]
+    meta = []
+    for start, end in zip(periods.starts.tolist(), periods.ends.tolist()):
+        end_date = dates[end]
+        if granularity == "quarterly":
+            quarter = (end_date.month - 1) // 3 + 1
+            meta.append({
+                "date": f"{end_date.year}-{quarter * 3 - 2:02d}-01",
+                "year": end_date.year,
+                "quarter": quarter,
+                "months_included": [d.month for d in dates[start:end + 1]]
+            })
+        else:
+            meta.append({"year": end_date.year})
+    return meta
+
+def _granularity_statements(batch):
+    """
+    Statements and period metadata of every store granularity for a batch. Quarterly
+    ratios are those of the quarter's last month, as in aggregate_quarterly_data().
+    """
+    periods = rollup(batch, [g for g in GRANULARITIES.values() if g])
+    result = {}
+    for granularity, source in GRANULARITIES.items():
+        statements = batch.statements if source is None else periods[source].statements
+        if granularity == "quarterly":
+            ends = periods[source].ends
+            statements = {**statements, "financial_ratios": {field: values[:, ends] for field, values
+                                                             in batch.statements["financial_ratios"].items()}}
+        result[granularity] = (statements, _period_meta(granularity, batch.dates, None if source is None else periods[source]))
+    return result
+
+def write_store(directory, financial_data):
+    """
+    Write statements to a columnar store: one .npy file per line item and granularity,
+    shaped (companies x periods), plus a JSON manifest with the period metadata.
+
+    financial_data is a StatementBatch or a dict in the generate_all_data() format.
+    Quarterly and yearly columns are rebuilt from the monthly ones with the rollup engine.
+    The store is written to a temporary directory and swapped in, so readers never see
+    a partial store and existing memory maps keep pointing at the old files.
+    """
+    if isinstance(financial_data, StatementBatch):
+        batch = financial_data
+        company_info = [batch.company_info(i) for i in range(batch.n_companies)]
+    else:
+        info = financial_data["company_info"]
+        batch = StatementBatch.from_monthly_records(financial_data["monthly_data"], info["name"], info["industry"])
+        company_info = [info]
+
+    tmp_dir = f"{directory.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    manifest = {"version": STORE_VERSION, "company_info": company_info, "granularities": {}}
+    for granularity, (statements, meta) in _granularity_statements(batch).items():
+        os.makedirs(os.path.join(tmp_dir, granularity))
+        for statement, fields in STATEMENT_FIELDS.items():
+            for field in fields:
+                np.save(os.path.join(tmp_dir, granularity, f"{statement}.{field}.npy"),
+                        np.ascontiguousarray(statements[statement][field], dtype=np.float64))
+        manifest["granularities"][granularity] = {"periods": meta}
+
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+    if os.path.exists(directory):
+        old_dir = f"{directory.rstrip(os.sep)}.old-{os.getpid()}"
+        os.rename(directory, old_dir)
+        os.rename(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.rename(tmp_dir, directory)
+
+def _write_periods(path, values, offset):
+    """
+    Write a (1 x k) array into a single-company .npy column from period offset on,
+    overwriting the periods it covers and growing the file past its end. numpy leaves
+    room in the header for the shape to grow, so only the header and the written
+    periods are touched.
+    """
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            read_header, write_header = np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0
+        else:
+            read_header, write_header = np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        data_start = f.tell()
+        if shape[0] != 1 or not 0 <= offset <= shape[1]:
+            raise ValueError(f"Cannot write periods {offset}+ of a {shape} column")
+        n_periods = max(shape[1], offset + values.shape[1])
+        if n_periods != shape[1]:
+            header = io.BytesIO()
+            write_header(header, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order,
+                                  "shape": (1, n_periods)})
+            if header.tell() != data_start:
+                raise ValueError(f"No room in the header of {path} for {n_periods} periods")
+            f.seek(0)
+            f.write(header.getvalue())
+        f.seek(data_start + offset * dtype.itemsize)
+        f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+def append_store(directory, update):
+    """
+    Append months to a single-company store without rewriting its history.
+
+    update is the result of ChileanSMEFinancialDataGenerator.append_months(), whose
+    months must follow the store's last month. The new monthly rows are appended to
+    each column file; the quarters and years from the start of the first new month's
+    year are rolled up again from the stored months and written over the trailing rows.
+    The manifest is replaced last, so readers pick up the new periods in one step; a
+    reader of the previous version may see the new values of the trailing quarter and year.
+    Returns the number of periods written per granularity.
+    """
+    store = ColumnarStore(directory)
+    if store.n_companies != 1:
+        raise ValueError("append_store() appends to single-company stores; rebuild others with write_store()")
+    new = StatementBatch.from_monthly_records(update["monthly_data"])
+    months = store.manifest["granularities"]["monthly"]["periods"]
+    last = datetime.datetime.strptime(months[-1]["date"], "%Y-%m-%d")
+    expected = datetime.datetime(last.year + last.month // 12, last.month % 12 + 1, 1)
+    if new.dates[0] != expected or any((b.year - a.year) * 12 + b.month - a.month != 1
+                                       for a, b in zip(new.dates, new.dates[1:])):
+        raise ValueError(f"Appended months must be consecutive and start at {expected:%Y-%m-%d}")
+
+    # Roll up again from the first stored month of the year the new months start in
+    n_months = len(months)
+    year = new.dates[0].year
+    start = n_months
+    while start > 0 and months[start - 1]["year"] == year:
+        start -= 1
+    info = store.manifest["company_info"][0]
+    dates = [datetime.datetime.strptime(month["date"], "%Y-%m-%d") for month in months[start:]] + new.dates
+    window = StatementBatch([info["name"]], info["industry"], dates, {
+        statement: {field: np.concatenate([store.column("monthly", statement, field)[:, start:n_months],
+                                           new.statements[statement][field]], axis=1)
+                    for field in fields}
+        for statement, fields in STATEMENT_FIELDS.items()
+    }, {})
+
+    manifest = dict(store.manifest, granularities={})
+    written = {}
+    for granularity, (statements, meta) in _granularity_statements(window).items():
+        periods = store.manifest["granularities"][granularity]["periods"]
+        if granularity == "monthly":
+            # Only the new months; the stored ones are unchanged
+            offset, first = n_months, n_months - start
+        else:
+            offset, first = sum(1 for period in periods if period["year"] < year), 0
+        for statement, fields in STATEMENT_FIELDS.items():
+            for field in fields:
+                _write_periods(os.path.join(directory, granularity, f"{statement}.{field}.npy"),
+                               statements[statement][field][:, first:], offset)
+        manifest["granularities"][granularity] = {"periods": periods[:offset] + meta[first:]}
+        written[granularity] = len(meta) - first
+    manifest["company_info"] = [dict(manifest["company_info"][0], period_end=update["period_end"])]
+
+    tmp_path = os.path.join(directory, f"{MANIFEST_FILE}.tmp-{os.getpid()}")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+    return written
+
+def select_fields(statements=None, fields=None):
+    """
+    Resolve a statement and field projection to {statement: [fields]}, in statement order.
+    Raises ValueError for unknown statements or fields.
+    """
+    if statements is not None:
+        unknown = [statement for statement in statements if statement not in STATEMENT_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown statements: {', '.join(unknown)}")
+    selected = {}
+    matched = set()
+    for statement, names in STATEMENT_FIELDS.items():
+        if statements is not None and statement not in statements:
+            continue
+        if fields is None:
+            selected[statement] = list(names)
+            continue
+        chosen = []
+        for name in names:
+            for requested in (name, f"{statement}.{name}"):
+                if requested in fields:
+                    chosen.append(name)
+                    matched.add(requested)
+        if chosen:
+            selected[statement] = list(dict.fromkeys(chosen))
+    if fields is not None:
+        unknown = [field for field in fields if field not in matched]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+class ColumnarStore:
+    """
+    Read-only view of a columnar store. Columns are memory-mapped on first use, so
+    forked workers share the page cache and only the slices a request reads are loaded.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self._columns = {}
+        self._period_index = {}
+
+    @property
+    def n_companies(self):
+        return len(self.manifest["company_info"])
+
+    def n_periods(self, granularity):
+        return len(self.manifest["granularities"][granularity]["periods"])
+
+    def column(self, granularity, statement, field):
+        """Return the memory-mapped (companies x periods) array of one line item."""
+        key = (granularity, statement, field)
+        if key not in self._columns:
+            path = os.path.join(self.directory, granularity, f"{statement}.{field}.npy")
+            self._columns[key] = np.load(path, mmap_mode="r")
+        return self._columns[key]
+
+    def period_index(self, granularity):
+        """Sorted datetime64 array of the start date of each period, built once per granularity."""
+        if granularity not in self._period_index:
+            dates = [period.get("date", f"{period['year']}-01-01")
+                     for period in self.manifest["granularities"][granularity]["periods"]]
+            self._period_index[granularity] = np.array(dates, dtype="datetime64[D]")
+        return self._period_index[granularity]
+
+    def records(self, granularity, company=0, start=0, stop=None, fields_by_statement=None):
+        """
+        Build period dicts in the generate_all_data() format for periods [start, stop).
+        fields_by_statement limits the statements and line items that are read.
+        """
+        if fields_by_statement is None:
+            fields_by_statement = RECORD_FIELDS[granularity]
+        meta = self.manifest["granularities"][granularity]["periods"][start:stop]
+        if not meta:
+            return []
+        stop = start + len(meta)
+        statements = {
+            statement: {field: self.column(granularity, statement, field)[company:company + 1, start:stop]
+                        for field in fields}
+            for statement, fields in fields_by_statement.items()
+        }
+        rows = column_lists(statements, 0, fields_by_statement)
+        records = []
+        for i, period in enumerate(meta):
+            record = dict(period)
+            for statement, fields in fields_by_statement.items():
+                record[statement] = {field: rows[statement][field][i] for field in fields}
+            records.append(record)
+        return records
+
+    def query(self, granularity="monthly", company=0, start=None, end=None, statements=None,
+              fields=None, cursor=None, limit=None):
+        """
+        Return one page of a company's periods starting between start and end (ISO dates,
+        inclusive), projected to the given statements and fields.
+
+        fields accepts bare line items ("revenue") or qualified ones ("income_statement.revenue").
+        next_cursor is the start date of the first period not returned; pass it back as
+        cursor to continue. Range bounds and cursors are resolved by binary search on the
+        period index, and only the selected columns and periods are read.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be positive")
+        selected = select_fields(statements, fields)
+
+        index = self.period_index(granularity)
+        lo = 0 if start is None else int(np.searchsorted(index, np.datetime64(start, "D"), "left"))
+        if cursor is not None:
+            lo = max(lo, int(np.searchsorted(index, np.datetime64(cursor, "D"), "left")))
+        hi = len(index) if end is None else int(np.searchsorted(index, np.datetime64(end, "D"), "right"))
+        stop = hi if limit is None else min(hi, lo + limit)
+
+        return {
+            "granularity": granularity,
+            "periods": self.records(granularity, company, lo, stop, selected) if lo < stop else [],
+            "next_cursor": str(index[stop]) if stop < hi else None
+        }
+
+    def company(self, company=0):
+        """Return a lazy, dict-like view of one company in the generate_all_data() format."""
+        return CompanyStatements(self, company)
+
+    def export_json(self, path, company=0):
+        """Export one company to the JSON format written by the generator."""
+        with open(path, "w") as f:
+            json.dump(self.company(company).to_dict(), f, indent=2)
+
+class PeriodSequence(Sequence):
+    """List-like access to the periods of one granularity; records are built per access."""
+
+    def __init__(self, store, granularity, company):
+        self.store = store
+        self.granularity = granularity
+        self.company = company
+
+    def __len__(self):
+        return self.store.n_periods(self.granularity)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self.store.records(self.granularity, self.company, start, stop)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("period index out of range")
+        return self.store.records(self.granularity, self.company, index, index + 1)[0]
+
+    def __iter__(self):
+        return iter(self.store.records(self.granularity, self.company))
+
+class CompanyStatements(Mapping):
+    """Mapping with the generate_all_data() keys, backed by a ColumnarStore."""
+
+    def __init__(self, store, company=0):
+        self.store = store
+        self.company = company
+        self._items = {"company_info": store.manifest["company_info"][company]}
+        for granularity in GRANULARITIES:
+            self._items[f"{granularity}_data"] = PeriodSequence(store, granularity, company)
+
+    def __getitem__(self, key):
+        return self._items[key]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def query(self, **kwargs):
+        """Run ColumnarStore.query() for this company."""
+        return self.store.query(company=self.company, **kwargs)
+
+    def to_dict(self):
+        """Materialize the full generate_all_data() dict, e.g. for JSON export."""
+        return {key: value if key == "company_info" else list(value) for key, value in self._items.items()}
@@ -0,0 +1,146 @@
+import os
+import json
+import threading
+
+FINANCIAL_DATA_PATH = 'data/chilean_sme_financial_data.json'
+RECOMMENDATIONS_PATH = 'data/ai_recommendations.json'
+
+def _pct_change(first, last):
+    return round((last / first - 1) * 100, 2) if first else None
+
+def _days(balance, flow):
+    """Balance expressed in days of a monthly flow (e.g. DSO from receivables and revenue)."""
+    return round(balance / flow * 30, 1) if flow > 0 else None
+
+def build_financial_context(monthly_data, recommendations, trend_months=6):
+    """
+    Precompute everything the chat needs from the data: the latest month's figures,
+    trends over the last trend_months months and derived KPIs.
+    """
+    recent = list(monthly_data[-trend_months:])
+    latest = recent[-1]
+    income = latest["income_statement"]
+    balance = latest["balance_sheet"]
+    monthly_expenses = income["operating_expenses"] + income["cost_of_goods_sold"]
+
+    revenue = [month["income_statement"]["revenue"] for month in recent]
+    expenses = [month["income_statement"]["operating_expenses"] + month["income_statement"]["cost_of_goods_sold"]
+                for month in recent]
+    net_income = [month["income_statement"]["net_income"] for month in recent]
+    cash = [month["balance_sheet"]["cash_and_equivalents"] for month in recent]
+    net_cash_change = [month["cash_flow_statement"]["net_change_in_cash"] for month in recent]
+    avg_net_cash_change = sum(net_cash_change) / len(net_cash_change)
+
+    dso = _days(balance["accounts_receivable"], income["revenue"])
+    dio = _days(balance["inventory"], income["cost_of_goods_sold"])
+    dpo = _days(balance["accounts_payable"], income["cost_of_goods_sold"])
+
+    return {
+        # Latest month
+        "date": latest["date"],
+        "cash_balance": recommendations["financial_metrics"]["cash_balance"],
+        "monthly_revenue": income["revenue"],
+        "monthly_expenses": round(monthly_expenses, 2),
+        "accounts_receivable": balance["accounts_receivable"],
+        "accounts_payable": balance["accounts_payable"],
+        "inventory": balance["inventory"],
+        "current_ratio": latest["financial_ratios"]["current_ratio"],
+        "profit_margin": latest["financial_ratios"]["profit_margin"],
+        # Trends over the recent months
+        "trends": {
+            "months": [month["date"] for month in recent],
+            "revenue": revenue,
+            "expenses": [round(value, 2) for value in expenses],
+            "net_income": net_income,
+            "cash": cash,
+            "revenue_change_pct": _pct_change(revenue[0], revenue[-1]),
+            "expenses_change_pct": _pct_change(expenses[0], expenses[-1]),
+            "cash_change_pct": _pct_change(cash[0], cash[-1]),
+            "avg_monthly_net_cash_change": round(avg_net_cash_change, 2)
+        },
+        # Derived KPIs
+        "kpis": {
+            "gross_margin_pct": round(income["gross_profit"] / income["revenue"] * 100, 2) if income["revenue"] > 0 else None,
+            "ebitda_margin_pct": round(income["ebitda"] / income["revenue"] * 100, 2) if income["revenue"] > 0 else None,
+            "days_sales_outstanding": dso,
+            "days_inventory_outstanding": dio,
+            "days_payables_outstanding": dpo,
+            "cash_conversion_cycle": round(dso + dio - dpo, 1) if None not in (dso, dio, dpo) else None,
+            # Months of cash left at the recent burn rate; None while cash is growing
+            "cash_runway_months": round(balance["cash_and_equivalents"] / -avg_net_cash_change, 1) if avg_net_cash_change < 0 else None
+        }
+    }
+
+def format_system_prompt(context):
+    """Render the chat system prompt for a context."""
+    trends = context["trends"]
+    kpis = context["kpis"]
+    return f"""
+    You are a financial assistant for SMEs in Chile. You have access to the following financial data:
+
+    Cash Balance: ${context['cash_balance']}M
+    Revenue: ${context['monthly_revenue']}M per month
+    Expenses: ${context['monthly_expenses']}M per month
+    Current ratio: {context['current_ratio']}, profit margin: {context['profit_margin']}%
+
+    Over the last {len(trends['months'])} months revenue changed {trends['revenue_change_pct']}%,
+    expenses {trends['expenses_change_pct']}% and cash {trends['cash_change_pct']}%.
+    Days sales outstanding: {kpis['days_sales_outstanding']}, days payables outstanding: {kpis['days_payables_outstanding']},
+    cash conversion cycle: {kpis['cash_conversion_cycle']} days.
+
+    Your role is to provide financial advice, analyze trends, and suggest optimizations.
+    Always provide specific, actionable advice based on the financial data.
+    """
+
+class FinancialContextService:
+    """
+    Serves the chat context from memory, rebuilding it only when the data version changes.
+
+    With a source callable returning (version, financial_data, recommendations) the
+    context follows in-memory data; otherwise the JSON files are read and their
+    modification times are the version. invalidate() forces a rebuild.
+    """
+
+    def __init__(self, source=None, financial_data_path=FINANCIAL_DATA_PATH,
+                 recommendations_path=RECOMMENDATIONS_PATH, trend_months=6):
+        self.source = source
+        self.financial_data_path = financial_data_path
+        self.recommendations_path = recommendations_path
+        self.trend_months = trend_months
+        self._version = None
+        self._context = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+
+    def _file_version(self):
+        return (os.stat(self.financial_data_path).st_mtime_ns, os.stat(self.recommendations_path).st_mtime_ns)
+
+    def _load_files(self):
+        with open(self.financial_data_path, 'r') as f:
+            financial_data = json.load(f)
+        with open(self.recommendations_path, 'r') as f:
+            recommendations = json.load(f)
+        return financial_data, recommendations
+
+    def get(self):
+        """Return the current context; it also carries the rendered system_prompt."""
+        if self.source is not None:
+            data_version, financial_data, recommendations = self.source()
+        else:
+            data_version, financial_data, recommendations = self._file_version(), None, None
+        version = (self._generation, data_version)
+        if version == self._version:
+            return self._context
+
+        with self._lock:
+            if version != self._version:
+                if financial_data is None:
+                    financial_data, recommendations = self._load_files()
+                context = build_financial_context(financial_data["monthly_data"], recommendations, self.trend_months)
+                context["system_prompt"] = format_system_prompt(context)
+                self._context, self._version = context, version
+            return self._context
@@ -1,10 +1,55 @@
 import json
 import random
 import datetime
-import pandas as pd
 import numpy as np
 from dateutil.relativedelta import relativedelta
 
+from ratio_engine import RatioEngine, statement_columns
+
+# Line items of each statement, in the order they appear in the generated dicts
+INCOME_STATEMENT_FIELDS = [
+    "revenue", "cost_of_goods_sold", "gross_profit", "operating_expenses", "ebitda",
+    "depreciation_amortization", "ebit", "financial_expenses", "ebt", "taxes", "net_income"
+]
+BALANCE_SHEET_FIELDS = [
+    "cash_and_equivalents", "accounts_receivable", "inventory", "total_current_assets",
+    "property_plant_equipment", "intangible_assets", "other_noncurrent_assets",
+    "total_noncurrent_assets", "total_assets", "accounts_payable", "short_term_debt",
+    "total_current_liabilities", "long_term_debt", "other_noncurrent_liabilities",
+    "total_noncurrent_liabilities", "total_liabilities", "capital", "retained_earnings",
+    "total_equity"
+]
+CASH_FLOW_FIELDS = [
+    "cash_from_operations", "cash_from_investing", "cash_from_financing",
+    "net_change_in_cash", "beginning_cash_balance", "ending_cash_balance"
+]
+MONTHLY_RATIO_FIELDS = [
+    "current_ratio", "quick_ratio", "debt_to_equity", "return_on_assets",
+    "return_on_equity", "profit_margin", "inventory_turnover"
+]
+STATEMENT_FIELDS = {
+    "income_statement": INCOME_STATEMENT_FIELDS,
+    "balance_sheet": BALANCE_SHEET_FIELDS,
+    "cash_flow_statement": CASH_FLOW_FIELDS,
+    "financial_ratios": MONTHLY_RATIO_FIELDS
+}
+# Fields of the quarterly and yearly reports. Their cash flow statements hold the flows
+# only, the cash balances being those of the first and last month; quarters carry the
+# ratios of their last month and years the annual ratios without inventory turnover.
+QUARTERLY_STATEMENT_FIELDS = {
+    **STATEMENT_FIELDS,
+    "cash_flow_statement": [field for field in CASH_FLOW_FIELDS
+                            if field not in ("beginning_cash_balance", "ending_cash_balance")]
+}
+YEARLY_STATEMENT_FIELDS = {**QUARTERLY_STATEMENT_FIELDS, "financial_ratios": MONTHLY_RATIO_FIELDS[:-1]}
+
+# Financing contract statuses and how often each is drawn
+FINANCING_STATUSES = ("Waiting approval", "Denied", "Closed")
+FINANCING_STATUS_WEIGHTS = (0.2, 0.1, 0.7)
+# Investment option descriptions and timeframes (in weeks)
+INVESTMENT_DESCRIPTIONS = ("Pay an invoice", "Investments", "Urgent fees")
+INVESTMENT_TIMEFRAMES = (12, 24, 36, 48)
+
 class ChileanSMEFinancialDataGenerator:
     """
     Generator for realistic financial data for a Chilean SME following IFRS standards.
@@ -12,18 +57,23 @@ class ChileanSMEFinancialDataGenerator:
     and cash flow statements.
     """
     
-    def __init__(self, company_name="Company A", industry="Technology", start_date="2023-01-01"):
+    def __init__(self, company_name="Company A", industry="Technology", start_date="2023-01-01", seed=None):
         """Initialize the data generator with company details and timeframe."""
         self.company_name = company_name
         self.industry = industry
         self.start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
         self.end_date = self.start_date + relativedelta(years=2) - relativedelta(days=1)
         
+        # Own random streams so runs can be seeded and resumed (see get_state); np_rng is the
+        # default for the array generators and is seeded from a copy of rng's stream
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(random.Random(seed).getrandbits(128))
+        
         # Initial financial constants (in millions of CLP)
-        self.initial_assets = random.uniform(800, 1200)
-        self.revenue_growth_rate = random.uniform(0.10, 0.25)  # 10-25% annual growth
-        self.gross_margin = random.uniform(0.40, 0.60)  # 40-60% gross margin
-        self.opex_ratio = random.uniform(0.25, 0.35)  # 25-35% of revenue
+        self.initial_assets = self.rng.uniform(800, 1200)
+        self.revenue_growth_rate = self.rng.uniform(0.10, 0.25)  # 10-25% annual growth
+        self.gross_margin = self.rng.uniform(0.40, 0.60)  # 40-60% gross margin
+        self.opex_ratio = self.rng.uniform(0.25, 0.35)  # 25-35% of revenue
         self.tax_rate = 0.27  # Chile's corporate tax rate
         
         # Seasonality factors for monthly revenue (Jan=index 0)
@@ -34,9 +84,15 @@ class ChileanSMEFinancialDataGenerator:
         self.quarterly_data = []
         self.yearly_data = []
         
-    def generate_all_data(self):
-        """Generate all financial data for the specified timeframe."""
-        self._generate_monthly_data()
+    def generate_all_data(self, vectorized=False):
+        """
+        Generate all financial data for the specified timeframe.
+        With vectorized=True the monthly statements are a dict view over generate_batch().
+        """
+        if vectorized:
+            self.monthly_data = self.generate_batch().monthly_records(0)
+        else:
+            self._generate_monthly_data()
         self._generate_quarterly_data()
         self._generate_yearly_data()
         return {
@@ -57,224 +113,276 @@ class ChileanSMEFinancialDataGenerator:
         last_month_data = None
         
         while current_date <= self.end_date:
-            month_num = current_date.month - 1  # 0-indexed month for seasonality
-            year_progress = (current_date - self.start_date).days / 365
-            
-            # Calculate base metrics with growth over time
-            base_revenue = self.initial_assets * 0.15 * (1 + self.revenue_growth_rate) ** year_progress
-            # Apply seasonality factor
-            revenue = base_revenue * self.seasonality[month_num]
-            
-            # Calculate other income statement items
-            cogs = revenue * (1 - self.gross_margin)
-            gross_profit = revenue - cogs
-            operating_expenses = revenue * self.opex_ratio
-            ebitda = gross_profit - operating_expenses
-            
-            # Randomize depreciation and amortization (3-7% of revenue)
-            depreciation = revenue * random.uniform(0.03, 0.07)
-            
-            # Calculate EBIT and other metrics
-            ebit = ebitda - depreciation
-            financial_expenses = self.initial_assets * 0.005 * (1 - year_progress * 0.1)  # Decreasing over time
-            ebt = ebit - financial_expenses
-            tax = max(0, ebt * self.tax_rate)
-            net_income = ebt - tax
-            
-            # Calculate balance sheet items
-            if last_month_data:
-                prev_cash = last_month_data["balance_sheet"]["cash_and_equivalents"]
-                prev_assets = last_month_data["balance_sheet"]["total_assets"]
-                prev_equity = last_month_data["balance_sheet"]["total_equity"]
-            else:
-                prev_cash = self.initial_assets * 0.15
-                prev_assets = self.initial_assets
-                prev_equity = self.initial_assets * 0.4
-            
-            # Cash changes (simplified)
-            cash_from_operations = net_income + depreciation - random.uniform(0, net_income * 0.3)
-            cash_from_investing = -random.uniform(depreciation * 0.5, depreciation * 1.5)
-            cash_from_financing = -random.uniform(0, net_income * 0.2)
-            net_cash_change = cash_from_operations + cash_from_investing + cash_from_financing
-            
-            # Balance sheet construction
-            cash = prev_cash + net_cash_change
-            accounts_receivable = revenue * random.uniform(0.5, 0.7)
-            inventory = cogs * random.uniform(0.3, 0.5)
-            current_assets = cash + accounts_receivable + inventory
-            
-            ppe = prev_assets * 0.5 - depreciation + max(0, -cash_from_investing)
-            intangible_assets = prev_assets * 0.1
-            other_noncurrent_assets = prev_assets * 0.1
-            noncurrent_assets = ppe + intangible_assets + other_noncurrent_assets
-            
-            total_assets = current_assets + noncurrent_assets
-            
-            # Liabilities
-            accounts_payable = cogs * random.uniform(0.4, 0.6)
-            short_term_debt = total_assets * random.uniform(0.05, 0.15)
-            current_liabilities = accounts_payable + short_term_debt
-            
-            long_term_debt = total_assets * random.uniform(0.2, 0.3)
-            other_noncurrent_liabilities = total_assets * random.uniform(0.05, 0.1)
-            noncurrent_liabilities = long_term_debt + other_noncurrent_liabilities
-            
-            total_liabilities = current_liabilities + noncurrent_liabilities
-            
-            # Equity
-            equity = total_assets - total_liabilities
-            retained_earnings = prev_equity + net_income - random.uniform(0, net_income * 0.3)  # Some dividends
-            capital = equity - retained_earnings
-            
-            month_data = {
-                "date": current_date.strftime("%Y-%m-%d"),
-                "year": current_date.year,
-                "month": current_date.month,
-                "income_statement": {
-                    "revenue": round(revenue, 2),
-                    "cost_of_goods_sold": round(cogs, 2),
-                    "gross_profit": round(gross_profit, 2),
-                    "operating_expenses": round(operating_expenses, 2),
-                    "ebitda": round(ebitda, 2),
-                    "depreciation_amortization": round(depreciation, 2),
-                    "ebit": round(ebit, 2),
-                    "financial_expenses": round(financial_expenses, 2),
-                    "ebt": round(ebt, 2),
-                    "taxes": round(tax, 2),
-                    "net_income": round(net_income, 2)
-                },
-                "balance_sheet": {
-                    "cash_and_equivalents": round(cash, 2),
-                    "accounts_receivable": round(accounts_receivable, 2),
-                    "inventory": round(inventory, 2),
-                    "total_current_assets": round(current_assets, 2),
-                    "property_plant_equipment": round(ppe, 2),
-                    "intangible_assets": round(intangible_assets, 2),
-                    "other_noncurrent_assets": round(other_noncurrent_assets, 2),
-                    "total_noncurrent_assets": round(noncurrent_assets, 2),
-                    "total_assets": round(total_assets, 2),
-                    "accounts_payable": round(accounts_payable, 2),
-                    "short_term_debt": round(short_term_debt, 2),
-                    "total_current_liabilities": round(current_liabilities, 2),
-                    "long_term_debt": round(long_term_debt, 2),
-                    "other_noncurrent_liabilities": round(other_noncurrent_liabilities, 2),
-                    "total_noncurrent_liabilities": round(noncurrent_liabilities, 2),
-                    "total_liabilities": round(total_liabilities, 2),
-                    "capital": round(capital, 2),
-                    "retained_earnings": round(retained_earnings, 2),
-                    "total_equity": round(equity, 2)
-                },
-                "cash_flow_statement": {
-                    "cash_from_operations": round(cash_from_operations, 2),
-                    "cash_from_investing": round(cash_from_investing, 2),
-                    "cash_from_financing": round(cash_from_financing, 2),
-                    "net_change_in_cash": round(net_cash_change, 2),
-                    "beginning_cash_balance": round(prev_cash, 2),
-                    "ending_cash_balance": round(cash, 2)
-                },
-                "financial_ratios": {
-                    "current_ratio": round(current_assets / current_liabilities, 2) if current_liabilities > 0 else "N/A",
-                    "quick_ratio": round((current_assets - inventory) / current_liabilities, 2) if current_liabilities > 0 else "N/A",
-                    "debt_to_equity": round(total_liabilities / equity, 2) if equity > 0 else "N/A",
-                    "return_on_assets": round(net_income / total_assets * 100, 2) if total_assets > 0 else "N/A",
-                    "return_on_equity": round(net_income / equity * 100, 2) if equity > 0 else "N/A",
-                    "profit_margin": round(net_income / revenue * 100, 2) if revenue > 0 else "N/A",
-                    "inventory_turnover": round(cogs / inventory, 2) if inventory > 0 else "N/A"
-                }
-            }
-            
+            month_data = self._generate_month(current_date, last_month_data)
             self.monthly_data.append(month_data)
             last_month_data = month_data
             current_date = current_date + relativedelta(months=1)
-    
+
+    def _generate_month(self, current_date, last_month_data):
+        """Generate the statements of one month, continuing from the previous month's data."""
+        month_num = current_date.month - 1  # 0-indexed month for seasonality
+        year_progress = (current_date - self.start_date).days / 365
+        
+        # Calculate base metrics with growth over time
+        base_revenue = self.initial_assets * 0.15 * (1 + self.revenue_growth_rate) ** year_progress
+        # Apply seasonality factor
+        revenue = base_revenue * self.seasonality[month_num]
+        
+        # Calculate other income statement items
+        cogs = revenue * (1 - self.gross_margin)
+        gross_profit = revenue - cogs
+        operating_expenses = revenue * self.opex_ratio
+        ebitda = gross_profit - operating_expenses
+        
+        # Randomize depreciation and amortization (3-7% of revenue)
+        depreciation = revenue * self.rng.uniform(0.03, 0.07)
+        
+        # Calculate EBIT and other metrics
+        ebit = ebitda - depreciation
+        financial_expenses = self.initial_assets * 0.005 * (1 - year_progress * 0.1)  # Decreasing over time
+        ebt = ebit - financial_expenses
+        tax = max(0, ebt * self.tax_rate)
+        net_income = ebt - tax
+        
+        # Calculate balance sheet items
+        if last_month_data:
+            prev_cash = last_month_data["balance_sheet"]["cash_and_equivalents"]
+            prev_assets = last_month_data["balance_sheet"]["total_assets"]
+            prev_equity = last_month_data["balance_sheet"]["total_equity"]
+        else:
+            prev_cash = self.initial_assets * 0.15
+            prev_assets = self.initial_assets
+            prev_equity = self.initial_assets * 0.4
+        
+        # Cash changes (simplified)
+        cash_from_operations = net_income + depreciation - self.rng.uniform(0, net_income * 0.3)
+        cash_from_investing = -self.rng.uniform(depreciation * 0.5, depreciation * 1.5)
+        cash_from_financing = -self.rng.uniform(0, net_income * 0.2)
+        net_cash_change = cash_from_operations + cash_from_investing + cash_from_financing
+        
+        # Balance sheet construction
+        cash = prev_cash + net_cash_change
+        accounts_receivable = revenue * self.rng.uniform(0.5, 0.7)
+        inventory = cogs * self.rng.uniform(0.3, 0.5)
+        current_assets = cash + accounts_receivable + inventory
+        
+        ppe = prev_assets * 0.5 - depreciation + max(0, -cash_from_investing)
+        intangible_assets = prev_assets * 0.1
+        other_noncurrent_assets = prev_assets * 0.1
+        noncurrent_assets = ppe + intangible_assets + other_noncurrent_assets
+        
+        total_assets = current_assets + noncurrent_assets
+        
+        # Liabilities
+        accounts_payable = cogs * self.rng.uniform(0.4, 0.6)
+        short_term_debt = total_assets * self.rng.uniform(0.05, 0.15)
+        current_liabilities = accounts_payable + short_term_debt
+        
+        long_term_debt = total_assets * self.rng.uniform(0.2, 0.3)
+        other_noncurrent_liabilities = total_assets * self.rng.uniform(0.05, 0.1)
+        noncurrent_liabilities = long_term_debt + other_noncurrent_liabilities
+        
+        total_liabilities = current_liabilities + noncurrent_liabilities
+        
+        # Equity
+        equity = total_assets - total_liabilities
+        retained_earnings = prev_equity + net_income - self.rng.uniform(0, net_income * 0.3)  # Some dividends
+        capital = equity - retained_earnings
+        
+        month_data = {
+            "date": current_date.strftime("%Y-%m-%d"),
+            "year": current_date.year,
+            "month": current_date.month,
+            "income_statement": {
+                "revenue": round(revenue, 2),
+                "cost_of_goods_sold": round(cogs, 2),
+                "gross_profit": round(gross_profit, 2),
+                "operating_expenses": round(operating_expenses, 2),
+                "ebitda": round(ebitda, 2),
+                "depreciation_amortization": round(depreciation, 2),
+                "ebit": round(ebit, 2),
+                "financial_expenses": round(financial_expenses, 2),
+                "ebt": round(ebt, 2),
+                "taxes": round(tax, 2),
+                "net_income": round(net_income, 2)
+            },
+            "balance_sheet": {
+                "cash_and_equivalents": round(cash, 2),
+                "accounts_receivable": round(accounts_receivable, 2),
+                "inventory": round(inventory, 2),
+                "total_current_assets": round(current_assets, 2),
+                "property_plant_equipment": round(ppe, 2),
+                "intangible_assets": round(intangible_assets, 2),
+                "other_noncurrent_assets": round(other_noncurrent_assets, 2),
+                "total_noncurrent_assets": round(noncurrent_assets, 2),
+                "total_assets": round(total_assets, 2),
+                "accounts_payable": round(accounts_payable, 2),
+                "short_term_debt": round(short_term_debt, 2),
+                "total_current_liabilities": round(current_liabilities, 2),
+                "long_term_debt": round(long_term_debt, 2),
+                "other_noncurrent_liabilities": round(other_noncurrent_liabilities, 2),
+                "total_noncurrent_liabilities": round(noncurrent_liabilities, 2),
+                "total_liabilities": round(total_liabilities, 2),
+                "capital": round(capital, 2),
+                "retained_earnings": round(retained_earnings, 2),
+                "total_equity": round(equity, 2)
+            },
+            "cash_flow_statement": {
+                "cash_from_operations": round(cash_from_operations, 2),
+                "cash_from_investing": round(cash_from_investing, 2),
+                "cash_from_financing": round(cash_from_financing, 2),
+                "net_change_in_cash": round(net_cash_change, 2),
+                "beginning_cash_balance": round(prev_cash, 2),
+                "ending_cash_balance": round(cash, 2)
+            },
+        }
+        month_data["financial_ratios"] = {
+            name: round(float(value), 2) if value == value else "N/A"
+            for name, value in compute_financial_ratios(
+                {"revenue": revenue, "cost_of_goods_sold": cogs, "net_income": net_income},
+                {"total_current_assets": current_assets, "total_current_liabilities": current_liabilities,
+                 "inventory": inventory, "total_liabilities": total_liabilities, "total_equity": equity,
+                 "total_assets": total_assets}).items()
+        }
+        
+        return month_data
+
+    def append_months(self, k=1):
+        """
+        Extend the dataset by k months without regenerating the history.
+
+        Only the quarter and year aggregates that contain new months are recomputed.
+        Returns the new months and those aggregates; merge_appended_data() applies them
+        to a stored dataset.
+        """
+        if not self.monthly_data:
+            raise ValueError("No months to continue from; generate data or load a saved state first")
+        
+        first_new = len(self.monthly_data)
+        current_date = datetime.datetime.strptime(self.monthly_data[-1]["date"], "%Y-%m-%d") + relativedelta(months=1)
+        for _ in range(k):
+            self.monthly_data.append(self._generate_month(current_date, self.monthly_data[-1]))
+            current_date = current_date + relativedelta(months=1)
+        self.end_date = current_date - relativedelta(days=1)
+        
+        # Walk back to the first month of the year / quarter the new months fall in
+        first_month = self.monthly_data[first_new]
+        year_start = quarter_start = first_new
+        while year_start > 0 and self.monthly_data[year_start - 1]["year"] == first_month["year"]:
+            year_start -= 1
+            if (self.monthly_data[year_start]["month"] - 1) // 3 == (first_month["month"] - 1) // 3:
+                quarter_start = year_start
+        
+        update = {
+            "period_end": self.end_date.strftime("%Y-%m-%d"),
+            "monthly_data": self.monthly_data[first_new:],
+            "quarterly_data": aggregate_quarterly_data(self.monthly_data[quarter_start:]),
+            "yearly_data": aggregate_yearly_data(self.monthly_data[year_start:])
+        }
+        self.quarterly_data = _replace_trailing_periods(self.quarterly_data, update["quarterly_data"], _quarter_key)
+        self.yearly_data = _replace_trailing_periods(self.yearly_data, update["yearly_data"], _year_key)
+        return update
+
+    def get_state(self):
+        """
+        Return the JSON-serializable state needed to resume generation with append_months():
+        company constants, the random streams and the months of the latest year.
+        """
+        version, internal_state, gauss_next = self.rng.getstate()
+        latest_year = self.monthly_data[-1]["year"] if self.monthly_data else None
+        return {
+            "company_name": self.company_name,
+            "industry": self.industry,
+            "start_date": self.start_date.strftime("%Y-%m-%d"),
+            "end_date": self.end_date.strftime("%Y-%m-%d"),
+            "initial_assets": self.initial_assets,
+            "revenue_growth_rate": self.revenue_growth_rate,
+            "gross_margin": self.gross_margin,
+            "opex_ratio": self.opex_ratio,
+            "tax_rate": self.tax_rate,
+            "seasonality": self.seasonality,
+            "rng_state": [version, list(internal_state), gauss_next],
+            "np_rng_state": self.np_rng.bit_generator.state,
+            "open_year_months": [month for month in self.monthly_data if month["year"] == latest_year]
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a generator from get_state(); it holds only the months of the latest year."""
+        generator = cls(state["company_name"], state["industry"], state["start_date"])
+        generator.end_date = datetime.datetime.strptime(state["end_date"], "%Y-%m-%d")
+        for key in ["initial_assets", "revenue_growth_rate", "gross_margin", "opex_ratio", "tax_rate", "seasonality"]:
+            setattr(generator, key, state[key])
+        version, internal_state, gauss_next = state["rng_state"]
+        generator.rng.setstate((version, tuple(internal_state), gauss_next))
+        # States saved before np_rng existed keep the fresh stream
+        if "np_rng_state" in state:
+            generator.np_rng.bit_generator.state = state["np_rng_state"]
+        generator.monthly_data = list(state["open_year_months"])
+        return generator
+
+    def save_state(self, filename):
+        """Save the generator state to a JSON file."""
+        with open(filename, 'w') as f:
+            json.dump(self.get_state(), f)
+
+    @classmethod
+    def load_state(cls, filename):
+        """Load a generator saved with save_state()."""
+        with open(filename, 'r') as f:
+            return cls.from_state(json.load(f))
+
+    def _np_rng(self, rng):
+        return self.np_rng if rng is None else np.random.default_rng(rng)
+
+    def generate_batch(self, n_companies=None, months=None, rng=None, dtype=np.float64):
+        """
+        Generate monthly statements for many companies at once as NumPy arrays.
+
+        Applies the same model as _generate_monthly_data to a (companies x months) grid.
+        With n_companies=None the batch holds this company only, using its own constants;
+        otherwise n_companies profiles are drawn from the same ranges as __init__.
+        months defaults to the generator's timeframe.
+
+        rng may be a seed, a Generator, or a list with one Generator per company. With a
+        list every company draws from its own stream, so its statements do not depend on
+        which batch it is generated in. It defaults to the generator's own np_rng.
+        """
+        if isinstance(rng, (list, tuple)):
+            if n_companies is None:
+                n_companies = len(rng)
+            elif n_companies != len(rng):
+                raise ValueError("Expected one random generator per company")
+        else:
+            rng = self._np_rng(rng)
+        if n_companies is None:
+            profiles = {
+                "initial_assets": np.array([self.initial_assets]),
+                "revenue_growth_rate": np.array([self.revenue_growth_rate]),
+                "gross_margin": np.array([self.gross_margin]),
+                "opex_ratio": np.array([self.opex_ratio])
+            }
+            company_names = [self.company_name]
+        else:
+            profiles = draw_company_profiles(n_companies, rng)
+            company_names = [f"{self.company_name} {i + 1}" for i in range(n_companies)]
+
+        if months is None:
+            months = ((self.end_date.year - self.start_date.year) * 12
+                      + self.end_date.month - self.start_date.month + 1)
+        dates = [self.start_date + relativedelta(months=i) for i in range(months)]
+
+        columns = _simulate_monthly_statements(profiles, dates, self.start_date, self.seasonality,
+                                               self.tax_rate, rng, dtype)
+        return StatementBatch(company_names, self.industry, dates, columns, profiles)
+
     def _generate_quarterly_data(self):
         """Aggregate monthly data into quarterly reports."""
-        quarters = {}
-        
-        for month_data in self.monthly_data:
-            year = month_data["year"]
-            month = month_data["month"]
-            quarter = (month - 1) // 3 + 1
-            quarter_key = f"{year}Q{quarter}"
-            
-            if quarter_key not in quarters:
-                quarters[quarter_key] = {
-                    "date": f"{year}-{quarter*3-2:02d}-01",  # First day of first month in quarter
-                    "year": year,
-                    "quarter": quarter,
-                    "income_statement": {k: 0 for k in month_data["income_statement"].keys()},
-                    "cash_flow_statement": {k: 0 for k in month_data["cash_flow_statement"].keys() 
-                                          if k not in ["beginning_cash_balance", "ending_cash_balance"]},
-                    "months_included": []
-                }
-            
-            # Aggregate income statement and cash flow
-            for key in month_data["income_statement"]:
-                quarters[quarter_key]["income_statement"][key] += month_data["income_statement"][key]
-                
-            for key in month_data["cash_flow_statement"]:
-                if key not in ["beginning_cash_balance", "ending_cash_balance"]:
-                    quarters[quarter_key]["cash_flow_statement"][key] += month_data["cash_flow_statement"][key]
-            
-            quarters[quarter_key]["months_included"].append(month)
-            
-            # Last month of the quarter - add balance sheet
-            if month % 3 == 0 or month == 12:
-                quarters[quarter_key]["balance_sheet"] = month_data["balance_sheet"]
-                quarters[quarter_key]["financial_ratios"] = month_data["financial_ratios"]
-        
-        # Convert dictionary to list and sort by date
-        self.quarterly_data = list(quarters.values())
-        self.quarterly_data.sort(key=lambda x: (x["year"], x["quarter"]))
+        self.quarterly_data = aggregate_quarterly_data(self.monthly_data)
     
     def _generate_yearly_data(self):
         """Aggregate data into yearly financial statements."""
-        years = {}
-        
-        for month_data in self.monthly_data:
-            year = month_data["year"]
-            
-            if year not in years:
-                years[year] = {
-                    "year": year,
-                    "income_statement": {k: 0 for k in month_data["income_statement"].keys()},
-                    "cash_flow_statement": {k: 0 for k in month_data["cash_flow_statement"].keys() 
-                                          if k not in ["beginning_cash_balance", "ending_cash_balance"]},
-                }
-            
-            # Aggregate income statement and cash flow
-            for key in month_data["income_statement"]:
-                years[year]["income_statement"][key] += month_data["income_statement"][key]
-                
-            for key in month_data["cash_flow_statement"]:
-                if key not in ["beginning_cash_balance", "ending_cash_balance"]:
-                    years[year]["cash_flow_statement"][key] += month_data["cash_flow_statement"][key]
-            
-            # December data - use for balance sheet
-            if month_data["month"] == 12:
-                years[year]["balance_sheet"] = month_data["balance_sheet"]
-                # Calculate annual ratios
-                annual_net_income = years[year]["income_statement"]["net_income"]
-                annual_revenue = years[year]["income_statement"]["revenue"]
-                total_assets = month_data["balance_sheet"]["total_assets"]
-                total_equity = month_data["balance_sheet"]["total_equity"]
-                current_assets = month_data["balance_sheet"]["total_current_assets"]
-                current_liabilities = month_data["balance_sheet"]["total_current_liabilities"]
-                inventory = month_data["balance_sheet"]["inventory"]
-                total_liabilities = month_data["balance_sheet"]["total_liabilities"]
-                
-                years[year]["financial_ratios"] = {
-                    "current_ratio": round(current_assets / current_liabilities, 2) if current_liabilities > 0 else "N/A",
-                    "quick_ratio": round((current_assets - inventory) / current_liabilities, 2) if current_liabilities > 0 else "N/A",
-                    "debt_to_equity": round(total_liabilities / total_equity, 2) if total_equity > 0 else "N/A",
-                    "return_on_assets": round(annual_net_income / total_assets * 100, 2) if total_assets > 0 else "N/A",
-                    "return_on_equity": round(annual_net_income / total_equity * 100, 2) if total_equity > 0 else "N/A",
-                    "profit_margin": round(annual_net_income / annual_revenue * 100, 2) if annual_revenue > 0 else "N/A"
-                }
-        
-        # Convert dictionary to list and sort by year
-        self.yearly_data = list(years.values())
-        self.yearly_data.sort(key=lambda x: x["year"])
+        self.yearly_data = aggregate_yearly_data(self.monthly_data)
 
     def save_to_json(self, filename="chilean_sme_financial_data.json"):
         """Save the generated data to a JSON file."""
@@ -287,7 +395,7 @@ class ChileanSMEFinancialDataGenerator:
         current_date = datetime.datetime.now()
         
         # Credit score (range 1-100, Chile uses a different scoring system than US)
-        credit_score = random.randint(65, 95)
+        credit_score = self.rng.randint(65, 95)
         
         # Contract limit based on company size and credit score (in millions)
         contract_limit = round(self.initial_assets * (credit_score / 100) * 0.5, 2)
@@ -296,27 +404,25 @@ class ChileanSMEFinancialDataGenerator:
         financing_history = []
         for i in range(5):
             # Random date within the last year
-            days_ago = random.randint(30, 365)
+            days_ago = self.rng.randint(30, 365)
             request_date = (current_date - datetime.timedelta(days=days_ago)).strftime("%b %d, %Y")
             
             # Random amount based on contract limit
-            amount = round(random.uniform(contract_limit * 0.1, contract_limit * 0.4), 2)
+            amount = round(self.rng.uniform(contract_limit * 0.1, contract_limit * 0.4), 2)
             
             # Random status weighted toward completed
-            status_options = ["Waiting approval", "Denied", "Closed"]
-            status_weights = [0.2, 0.1, 0.7]
-            status = random.choices(status_options, status_weights)[0]
+            status = self.rng.choices(FINANCING_STATUSES, FINANCING_STATUS_WEIGHTS)[0]
             
             # Generate contract number
-            contract_number = f"NR-{random.randint(1000, 9999)}-{random.randint(1000, 9999)}"
+            contract_number = f"NR-{self.rng.randint(1000, 9999)}-{self.rng.randint(1000, 9999)}"
             
             financing_history.append({
                 "id": i + 1,
                 "contract_number": contract_number,
                 "request_date": request_date,
                 "status": status,
-                "due_date": (current_date - datetime.timedelta(days=random.randint(0, 30))).strftime("%m/%d/%Y") if status == "Closed" else "",
-                "days_until_payment": random.randint(0, 30) if status != "Closed" else 0,
+                "due_date": (current_date - datetime.timedelta(days=self.rng.randint(0, 30))).strftime("%m/%d/%Y") if status == "Closed" else "",
+                "days_until_payment": self.rng.randint(0, 30) if status != "Closed" else 0,
                 "amount": amount
             })
         
@@ -327,23 +433,22 @@ class ChileanSMEFinancialDataGenerator:
             product_id = 30 + i
             
             # Description
-            descriptions = ["Pay an invoice", "Investments", "Urgent fees"]
-            description = descriptions[random.randint(0, min(2, len(descriptions)-1))]
+            description = INVESTMENT_DESCRIPTIONS[self.rng.randint(0, min(2, len(INVESTMENT_DESCRIPTIONS)-1))]
             
             # Request date - next month
-            request_date = (current_date + datetime.timedelta(days=random.randint(1, 30))).strftime("%b %d, %Y")
+            request_date = (current_date + datetime.timedelta(days=self.rng.randint(1, 30))).strftime("%b %d, %Y")
             
             # Timeframe in weeks
-            timeframe = random.choice([12, 24, 36, 48])
+            timeframe = self.rng.choice(INVESTMENT_TIMEFRAMES)
             
             # Risk score (0-100)
-            customer_credit = random.randint(50, 99)
+            customer_credit = self.rng.randint(50, 99)
             
             # Yes/No field
-            default_risk = random.choice(["YES", "NO"])
+            default_risk = self.rng.choice(["YES", "NO"])
             
             # Amount
-            amount = round(random.uniform(1000, 5000), 2)
+            amount = round(self.rng.uniform(1000, 5000), 2)
             
             investment_options.append({
                 "id": product_id,
@@ -362,6 +467,56 @@ class ChileanSMEFinancialDataGenerator:
             "investment_options": investment_options
         }
     
+    def generate_financing_history(self, n_contracts, rng=None, contract_limit=None, now=None):
+        """
+        Generate n_contracts financing contracts at once as NumPy columns, drawn like the
+        financing_history of create_financing_data. Statuses are codes into
+        FINANCING_STATUSES, dates are datetime64[D] (NaT for no due date) and ids run
+        from 1. contract_limit defaults to the limit of a company with a median credit score.
+        rng is a seed or a Generator and defaults to the generator's own np_rng.
+        """
+        rng = self._np_rng(rng)
+        if contract_limit is None:
+            contract_limit = round(self.initial_assets * 0.8 * 0.5, 2)
+        today = np.datetime64((now or datetime.datetime.now()).date(), "D")
+
+        status = rng.choice(len(FINANCING_STATUSES), size=n_contracts, p=FINANCING_STATUS_WEIGHTS).astype(np.int8)
+        closed = status == FINANCING_STATUSES.index("Closed")
+        due_date = today - rng.integers(0, 31, size=n_contracts).astype("timedelta64[D]")
+        due_date[~closed] = np.datetime64("NaT")
+        number_parts = rng.integers(1000, 10000, size=(2, n_contracts))
+        contract_number = np.char.add(np.char.add(np.char.add(b"NR-", number_parts[0].astype("S4")), b"-"),
+                                      number_parts[1].astype("S4"))
+
+        return {
+            "id": np.arange(1, n_contracts + 1, dtype=np.int64),
+            "contract_number": contract_number.astype("S16"),
+            "request_date": today - rng.integers(30, 366, size=n_contracts).astype("timedelta64[D]"),
+            "status": status,
+            "due_date": due_date,
+            "days_until_payment": np.where(closed, 0, rng.integers(0, 31, size=n_contracts)).astype(np.int32),
+            "amount": np.round(rng.uniform(contract_limit * 0.1, contract_limit * 0.4, size=n_contracts), 2)
+        }
+    
+    def generate_investment_options(self, n_options, rng=None, now=None):
+        """
+        Generate n_options investment options at once as NumPy columns, drawn like the
+        investment_options of create_financing_data. Descriptions are codes into
+        INVESTMENT_DESCRIPTIONS, default_risk is a boolean and ids start at 30.
+        rng is a seed or a Generator and defaults to the generator's own np_rng.
+        """
+        rng = self._np_rng(rng)
+        today = np.datetime64((now or datetime.datetime.now()).date(), "D")
+        return {
+            "id": np.arange(30, 30 + n_options, dtype=np.int64),
+            "description": rng.integers(0, len(INVESTMENT_DESCRIPTIONS), size=n_options).astype(np.int8),
+            "request_date": today + rng.integers(1, 31, size=n_options).astype("timedelta64[D]"),
+            "timeframe": rng.choice(np.array(INVESTMENT_TIMEFRAMES, dtype=np.int16), size=n_options),
+            "customer_credit": rng.integers(50, 100, size=n_options).astype(np.int16),
+            "default_risk": rng.random(n_options) < 0.5,
+            "amount": np.round(rng.uniform(1000, 5000, size=n_options), 2)
+        }
+    
     def generate_ai_recommendations(self):
         """Generate AI recommendations based on financial data."""
         # Get recent financial data
@@ -376,23 +531,23 @@ class ChileanSMEFinancialDataGenerator:
         monthly_expenses = recent_data["income_statement"]["operating_expenses"] + recent_data["income_statement"]["cost_of_goods_sold"]
         
         # Random upcoming payment
-        upcoming_payment = round(random.uniform(500, 2000), 2)
+        upcoming_payment = round(self.rng.uniform(500, 2000), 2)
         
         # Random potential revenue increase
-        potential_revenue_increase = round(monthly_revenue * random.uniform(0.05, 0.15), 2)
+        potential_revenue_increase = round(monthly_revenue * self.rng.uniform(0.05, 0.15), 2)
         
         # Random invoices due
         invoices_due = []
-        total_invoices = random.randint(2, 4)
+        total_invoices = self.rng.randint(2, 4)
         total_invoice_value = 0
         
         for i in range(total_invoices):
-            invoice_value = round(random.uniform(300, 1000), 2)
+            invoice_value = round(self.rng.uniform(300, 1000), 2)
             total_invoice_value += invoice_value
             invoices_due.append({
-                "id": f"INV-{random.randint(1000, 9999)}",
+                "id": f"INV-{self.rng.randint(1000, 9999)}",
                 "value": invoice_value,
-                "due_date": (datetime.datetime.now() + datetime.timedelta(days=random.randint(1, 7))).strftime("%b %d")
+                "due_date": (datetime.datetime.now() + datetime.timedelta(days=self.rng.randint(1, 7))).strftime("%b %d")
             })
         
         recommendations = {
@@ -400,16 +555,16 @@ class ChileanSMEFinancialDataGenerator:
                 "cash_balance": cash_balance,
                 "projected_revenues": monthly_revenue * 12,
                 "expected_net_cash": cash_balance + (monthly_revenue - monthly_expenses) * 3,
-                "cash_balance_change": round(random.uniform(-2.0, 2.0), 1),
-                "revenue_change": round(random.uniform(-5.0, 5.0), 1),
-                "net_cash_change": round(random.uniform(-3.0, 3.0), 1)
+                "cash_balance_change": round(self.rng.uniform(-2.0, 2.0), 1),
+                "revenue_change": round(self.rng.uniform(-5.0, 5.0), 1),
+                "net_cash_change": round(self.rng.uniform(-3.0, 3.0), 1)
             },
             "recommendations": [
                 {
                     "type": "cash_flow",
                     "title": "Cash Flow Optimization",
                     "description": f"Upcoming payment of ${upcoming_payment} may impact your cash balance. Consider invoicing project ABC early.",
-                    "potential": round(random.uniform(1000, 3000), 0),
+                    "potential": round(self.rng.uniform(1000, 3000), 0),
                     "action": "Send Invoice"
                 },
                 {
@@ -423,7 +578,7 @@ class ChileanSMEFinancialDataGenerator:
                     "type": "payment",
                     "title": "Payment Due Soon",
                     "description": f"{total_invoices} invoices worth ${total_invoice_value:.2f} are due in the next 7 days. Schedule payments now.",
-                    "due_date": (datetime.datetime.now() + datetime.timedelta(days=random.randint(5, 20))).strftime("%b %d"),
+                    "due_date": (datetime.datetime.now() + datetime.timedelta(days=self.rng.randint(5, 20))).strftime("%b %d"),
                     "action": "Schedule Payment Now"
                 }
             ],
@@ -436,6 +591,332 @@ class ChileanSMEFinancialDataGenerator:
         
         return recommendations
 
+class StatementBatch:
+    """
+    Columnar monthly statements for a batch of companies.
+
+    statements[statement][field] is a (companies x months) array. Ratios that the
+    dict format reports as "N/A" are NaN here.
+    """
+
+    def __init__(self, company_names, industry, dates, statements, profiles):
+        self.company_names = list(company_names)
+        self.industry = industry
+        self.dates = list(dates)
+        self.statements = statements
+        self.profiles = profiles
+        self.years = np.array([d.year for d in self.dates])
+        self.months = np.array([d.month for d in self.dates])
+
+    @property
+    def n_companies(self):
+        return len(self.company_names)
+
+    @property
+    def n_months(self):
+        return len(self.dates)
+
+    @classmethod
+    def from_monthly_records(cls, monthly_data, company_name="Company A", industry="Technology"):
+        """
+        Build a single-company batch from a monthly_data list of dicts. The records' own
+        ratios are kept ("N/A" becomes NaN); ratios are computed only for records without them.
+        """
+        dates = [datetime.datetime.strptime(month["date"], "%Y-%m-%d") for month in monthly_data]
+        statements = {
+            statement: {field: np.array([[month[statement][field] for month in monthly_data]], dtype=float)
+                        for field in fields}
+            for statement, fields in STATEMENT_FIELDS.items() if statement != "financial_ratios"
+        }
+        if all("financial_ratios" in month for month in monthly_data):
+            statements["financial_ratios"] = {
+                field: np.array([[np.nan if month["financial_ratios"][field] == "N/A" else month["financial_ratios"][field]
+                                  for month in monthly_data]], dtype=float)
+                for field in STATEMENT_FIELDS["financial_ratios"]
+            }
+        else:
+            statements["financial_ratios"] = compute_financial_ratios(statements["income_statement"],
+                                                                      statements["balance_sheet"])
+        return cls([company_name], industry, dates, statements, {})
+
+    def column(self, statement, field):
+        """Return the (companies x months) array for one line item."""
+        return self.statements[statement][field]
+
+    def monthly_records(self, company=0):
+        """Build the monthly_data list of dicts for one company."""
+        rows = column_lists(self.statements, company)
+        records = []
+        for i, date in enumerate(self.dates):
+            record = {"date": date.strftime("%Y-%m-%d"), "year": date.year, "month": date.month}
+            for statement, fields in STATEMENT_FIELDS.items():
+                record[statement] = {field: rows[statement][field][i] for field in fields}
+            records.append(record)
+        return records
+
+    def company_info(self, company=0):
+        """Return the company_info block of one company."""
+        period_end = self.dates[-1] + relativedelta(months=1) - relativedelta(days=1)
+        return {
+            "name": self.company_names[company],
+            "industry": self.industry,
+            "period_start": self.dates[0].strftime("%Y-%m-%d"),
+            "period_end": period_end.strftime("%Y-%m-%d")
+        }
+
+    def to_dict(self, company=0):
+        """Return one company in the same format as generate_all_data()."""
+        monthly_data = self.monthly_records(company)
+        return {
+            "company_info": self.company_info(company),
+            "monthly_data": monthly_data,
+            "quarterly_data": aggregate_quarterly_data(monthly_data),
+            "yearly_data": aggregate_yearly_data(monthly_data)
+        }
+
+def _company_uniforms(rng, n_companies, size):
+    """
+    Draw U(0, 1) values of the given size for each company, shape (companies, *size).
+    rng is a single Generator or a list with one Generator per company.
+    """
+    if isinstance(rng, (list, tuple)):
+        return np.stack([company_rng.random(size) for company_rng in rng])
+    return rng.random((n_companies,) + tuple(size))
+
+def draw_company_profiles(n_companies, rng):
+    """Draw per-company constants from the same ranges as the generator's __init__."""
+    u = _company_uniforms(rng, n_companies, (4,))
+    return {
+        "initial_assets": 800 + 400 * u[:, 0],
+        "revenue_growth_rate": 0.10 + 0.15 * u[:, 1],
+        "gross_margin": 0.40 + 0.20 * u[:, 2],
+        "opex_ratio": 0.25 + 0.10 * u[:, 3]
+    }
+
+def _lagged(values, first):
+    """Shift a (companies x months) array one month right, filling month 0 with first."""
+    lagged = np.empty_like(values)
+    lagged[:, 0] = first
+    lagged[:, 1:] = values[:, :-1]
+    return lagged
+
+def _simulate_monthly_statements(profiles, dates, start_date, seasonality, tax_rate, rng, dtype):
+    """Vectorized counterpart of _generate_monthly_data over all companies and months."""
+    initial_assets = profiles["initial_assets"].astype(dtype)[:, None]
+    growth_rate = profiles["revenue_growth_rate"].astype(dtype)[:, None]
+    gross_margin = profiles["gross_margin"].astype(dtype)[:, None]
+    opex_ratio = profiles["opex_ratio"].astype(dtype)[:, None]
+    shape = (initial_assets.shape[0], len(dates))
+
+    # One block of U(0, 1) noise per company, consumed one (companies x months) slice per draw
+    noise = iter(np.moveaxis(_company_uniforms(rng, shape[0], (11, shape[1])).astype(dtype), 1, 0))
+
+    def draw(low, high):
+        return low + (high - low) * next(noise)
+
+    year_progress = np.array([(d - start_date).days / 365 for d in dates], dtype=dtype)
+    season = np.asarray(seasonality, dtype=dtype)[[d.month - 1 for d in dates]]
+
+    # Income statement
+    revenue = initial_assets * 0.15 * (1 + growth_rate) ** year_progress * season
+    cogs = revenue * (1 - gross_margin)
+    gross_profit = revenue - cogs
+    operating_expenses = revenue * opex_ratio
+    ebitda = gross_profit - operating_expenses
+    depreciation = revenue * draw(0.03, 0.07)
+    ebit = ebitda - depreciation
+    financial_expenses = np.broadcast_to(initial_assets * 0.005 * (1 - year_progress * 0.1), shape)
+    ebt = ebit - financial_expenses
+    tax = np.maximum(0, ebt * tax_rate)
+    net_income = ebt - tax
+
+    # Cash flow; the cash rollforward is a running sum of monthly changes
+    cash_from_operations = net_income + depreciation - net_income * draw(0, 0.3)
+    cash_from_investing = -depreciation * draw(0.5, 1.5)
+    cash_from_financing = -net_income * draw(0, 0.2)
+    net_cash_change = cash_from_operations + cash_from_investing + cash_from_financing
+    cash = initial_assets * 0.15 + np.cumsum(net_cash_change, axis=1)
+    prev_cash = _lagged(cash, initial_assets[:, 0] * 0.15)
+
+    accounts_receivable = revenue * draw(0.5, 0.7)
+    inventory = cogs * draw(0.3, 0.5)
+    current_assets = cash + accounts_receivable + inventory
+
+    # Total assets follow A[t] = 0.7 * A[t-1] + b[t] (PPE, intangibles and other
+    # non-current assets carry 70% of last month's assets), solved for all months
+    # at once with a lower-triangular matrix of decay powers.
+    capex = np.maximum(0, -cash_from_investing)
+    b = current_assets - depreciation + capex
+    steps = np.arange(shape[1])
+    lags = steps[:, None] - steps[None, :]
+    decay = np.where(lags >= 0, 0.7 ** np.maximum(lags, 0), 0).astype(dtype)
+    total_assets = b @ decay.T + initial_assets * (0.7 ** (steps + 1)).astype(dtype)
+    prev_assets = _lagged(total_assets, initial_assets[:, 0])
+
+    ppe = prev_assets * 0.5 - depreciation + capex
+    intangible_assets = prev_assets * 0.1
+    other_noncurrent_assets = prev_assets * 0.1
+    noncurrent_assets = ppe + intangible_assets + other_noncurrent_assets
+
+    accounts_payable = cogs * draw(0.4, 0.6)
+    short_term_debt = total_assets * draw(0.05, 0.15)
+    current_liabilities = accounts_payable + short_term_debt
+    long_term_debt = total_assets * draw(0.2, 0.3)
+    other_noncurrent_liabilities = total_assets * draw(0.05, 0.1)
+    noncurrent_liabilities = long_term_debt + other_noncurrent_liabilities
+    total_liabilities = current_liabilities + noncurrent_liabilities
+
+    equity = total_assets - total_liabilities
+    prev_equity = _lagged(equity, initial_assets[:, 0] * 0.4)
+    retained_earnings = prev_equity + net_income - net_income * draw(0, 0.3)
+    capital = equity - retained_earnings
+
+    statements = {
+        "income_statement": {
+            "revenue": revenue,
+            "cost_of_goods_sold": cogs,
+            "gross_profit": gross_profit,
+            "operating_expenses": operating_expenses,
+            "ebitda": ebitda,
+            "depreciation_amortization": depreciation,
+            "ebit": ebit,
+            "financial_expenses": np.ascontiguousarray(financial_expenses),
+            "ebt": ebt,
+            "taxes": tax,
+            "net_income": net_income
+        },
+        "balance_sheet": {
+            "cash_and_equivalents": cash,
+            "accounts_receivable": accounts_receivable,
+            "inventory": inventory,
+            "total_current_assets": current_assets,
+            "property_plant_equipment": ppe,
+            "intangible_assets": intangible_assets,
+            "other_noncurrent_assets": other_noncurrent_assets,
+            "total_noncurrent_assets": noncurrent_assets,
+            "total_assets": total_assets,
+            "accounts_payable": accounts_payable,
+            "short_term_debt": short_term_debt,
+            "total_current_liabilities": current_liabilities,
+            "long_term_debt": long_term_debt,
+            "other_noncurrent_liabilities": other_noncurrent_liabilities,
+            "total_noncurrent_liabilities": noncurrent_liabilities,
+            "total_liabilities": total_liabilities,
+            "capital": capital,
+            "retained_earnings": retained_earnings,
+            "total_equity": equity
+        },
+        "cash_flow_statement": {
+            "cash_from_operations": cash_from_operations,
+            "cash_from_investing": cash_from_investing,
+            "cash_from_financing": cash_from_financing,
+            "net_change_in_cash": net_cash_change,
+            "beginning_cash_balance": prev_cash,
+            "ending_cash_balance": cash
+        },
+    }
+    statements["financial_ratios"] = compute_financial_ratios(statements["income_statement"],
+                                                              statements["balance_sheet"])
+    return statements
+
+# Ratios of the financial_ratios block, compiled once
+FINANCIAL_RATIO_ENGINE = RatioEngine()
+
+def compute_financial_ratios(income_statement, balance_sheet):
+    """
+    Compute the financial_ratios block from column arrays of any shape.
+    Flows may cover a month or a longer period; balances are taken as given. Ratios
+    with a non-positive denominator are NaN.
+    """
+    return FINANCIAL_RATIO_ENGINE.evaluate(statement_columns({"income_statement": income_statement,
+                                                              "balance_sheet": balance_sheet})).values
+
+def column_lists(statements, company, fields_by_statement=STATEMENT_FIELDS):
+    """
+    Round each column of one company to 2 decimals and convert it to a Python list.
+    Converting whole columns is much faster than rounding cell by cell. NaN ratios
+    become "N/A" as in the dict format.
+    """
+    rows = {}
+    for statement, fields in fields_by_statement.items():
+        rows[statement] = {}
+        for field in fields:
+            values = np.round(statements[statement][field][company], 2).tolist()
+            if statement == "financial_ratios":
+                values = ["N/A" if value != value else value for value in values]
+            rows[statement][field] = values
+    return rows
+
+def _quarter_key(period):
+    return (period["year"], period["quarter"])
+
+def _year_key(period):
+    return period["year"]
+
+def _replace_trailing_periods(periods, updated, period_key):
+    """Replace the trailing periods whose keys appear in updated, then append updated."""
+    replaced = {period_key(period) for period in updated}
+    periods = list(periods)
+    while periods and period_key(periods[-1]) in replaced:
+        periods.pop()
+    return periods + updated
+
+def merge_appended_data(financial_data, update):
+    """Apply the result of append_months() to a dataset in the generate_all_data() format."""
+    financial_data["company_info"]["period_end"] = update["period_end"]
+    financial_data["monthly_data"].extend(update["monthly_data"])
+    financial_data["quarterly_data"] = _replace_trailing_periods(financial_data["quarterly_data"],
+                                                                 update["quarterly_data"], _quarter_key)
+    financial_data["yearly_data"] = _replace_trailing_periods(financial_data["yearly_data"],
+                                                              update["yearly_data"], _year_key)
+    return financial_data
+
+def _period_report(period, fields_by_statement):
+    return {statement: {field: period[statement][field] for field in fields}
+            for statement, fields in fields_by_statement.items()}
+
+def aggregate_quarterly_data(monthly_data):
+    """
+    Aggregate monthly data into quarterly reports. Like the balance sheet, the ratios
+    are those of the quarter's last month.
+    """
+    if not monthly_data:
+        return []
+    from rollups import rollup  # rollups imports this module
+    quarters = rollup(StatementBatch.from_monthly_records(monthly_data), ["quarter"])["quarter"]
+    reports = []
+    for period, end in zip(quarters.records(0), quarters.ends.tolist()):
+        report = _period_report(period, QUARTERLY_STATEMENT_FIELDS)
+        reports.append({
+            "date": f"{period['year']}-{period['quarter'] * 3 - 2:02d}-01",  # First day of first month in quarter
+            "year": period["year"],
+            "quarter": period["quarter"],
+            "income_statement": report["income_statement"],
+            "cash_flow_statement": report["cash_flow_statement"],
+            "months_included": period["months_included"],
+            "balance_sheet": report["balance_sheet"],
+            "financial_ratios": monthly_data[end]["financial_ratios"]
+        })
+    return reports
+
+def aggregate_yearly_data(monthly_data):
+    """Aggregate data into yearly financial statements."""
+    if not monthly_data:
+        return []
+    from rollups import rollup  # rollups imports this module
+    years = rollup(StatementBatch.from_monthly_records(monthly_data), ["year"])["year"]
+    reports = []
+    for period in years.records(0):
+        report = _period_report(period, YEARLY_STATEMENT_FIELDS)
+        reports.append({
+            "year": period["year"],
+            "income_statement": report["income_statement"],
+            "cash_flow_statement": report["cash_flow_statement"],
+            "balance_sheet": report["balance_sheet"],
+            "financial_ratios": report["financial_ratios"]
+        })
+    return reports
+
 # Example usage
 if __name__ == "__main__":
     generator = ChileanSMEFinancialDataGenerator()
@@ -0,0 +1,423 @@
+import datetime
+import threading
+
+import numpy as np
+
+from financial_data_model import FINANCING_STATUSES as STATUSES
+
+# Contracts in any other status count as open on the dashboard
+CLOSED_STATUSES = ("Closed",)
+# Upper edges of the exposure buckets, in $M
+EXPOSURE_EDGES = (25.0, 50.0, 100.0, 200.0)
+SORT_KEYS = ("id", "request_date", "amount", "status")
+# Appends of up to this many contracts are merged into the cached sort orders; larger ones drop them
+MAX_MERGED_ROWS = 4096
+# Filtered totals kept for the current contracts
+MAX_CACHED_TOTALS = 256
+
+REQUEST_DATE_FORMAT = "%b %d, %Y"
+DUE_DATE_FORMAT = "%m/%d/%Y"
+
+_COLUMNS = {
+    "id": np.int64,
+    "contract_number": "S16",
+    "request_date": "datetime64[D]",
+    "status": np.int8,
+    "due_date": "datetime64[D]",
+    "days_until_payment": np.int32,
+    "amount": np.float64
+}
+
+def _parse_dates(values, date_format):
+    # Contracts share few distinct dates, so each one is parsed once
+    parsed = {"": np.datetime64("NaT")}
+    for value in set(values):
+        if value not in parsed:
+            parsed[value] = np.datetime64(datetime.datetime.strptime(value, date_format).date())
+    return np.array([parsed[value] for value in values], dtype="datetime64[D]")
+
+def _format_dates(values, date_format):
+    # Formats each distinct date once; NaT becomes ""
+    distinct, inverse = np.unique(values, return_inverse=True)
+    formatted = ["" if np.isnat(value) else value.astype(datetime.date).strftime(date_format) for value in distinct]
+    return [formatted[i] for i in inverse]
+
+def parse_sort(sort):
+    """
+    Parse a sort spec such as "-amount,request_date" into ((key, descending), ...).
+    Ties are always broken by ascending id.
+    """
+    spec = []
+    for key in (sort or "id").split(","):
+        key = key.strip()
+        descending = key.startswith("-")
+        key = key.lstrip("-")
+        if key not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {key}, expected one of {', '.join(SORT_KEYS)}")
+        spec.append((key, descending))
+    return tuple(spec)
+
+class FinancingLedger:
+    """
+    Columnar store of financing contracts with indexes on status, request date and amount.
+
+    Contracts are kept in growable numpy columns ordered by id. Counts and sums per
+    (status, exposure bucket) are updated as contracts are added or change status,
+    so dashboard totals never scan the contracts. Sort orders are computed once per
+    sort spec; appended contracts are merged into them, and specs on status are dropped
+    when a status changes. The per-status row lists are extended on append and rebuilt
+    lazily after status changes. Query totals come from the aggregates when only
+    statuses are filtered, and are otherwise cached until the contracts change.
+    Writes and cache fills hold a lock, so one ledger can serve concurrent requests.
+    """
+
+    def __init__(self, capacity=1024, exposure_edges=EXPOSURE_EDGES):
+        self.exposure_edges = np.asarray(exposure_edges, dtype=np.float64)
+        self.size = 0
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._counts = np.zeros((len(STATUSES), len(self.exposure_edges) + 1), dtype=np.int64)
+        self._sums = np.zeros((len(STATUSES), len(self.exposure_edges) + 1), dtype=np.float64)
+        self._orders = {}
+        self._status_rows = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, contracts, **kwargs):
+        """Build a ledger from contract dicts as found in financing_data["financing_history"]."""
+        ledger = cls(capacity=max(1024, len(contracts)), **kwargs)
+        ledger.add_many(contracts)
+        return ledger
+
+    @classmethod
+    def from_columns(cls, columns, **kwargs):
+        """Build a ledger from arrays, e.g. from ChileanSMEFinancialDataGenerator.generate_financing_history()."""
+        ledger = cls(capacity=max(1024, len(columns["id"])), **kwargs)
+        ledger.add_columns(columns)
+        return ledger
+
+    def __len__(self):
+        return self.size
+
+    def column(self, name):
+        """Read-only view of a column over the stored contracts."""
+        view = self._columns[name][:self.size]
+        view.flags.writeable = False
+        return view
+
+    def _reserve(self, n):
+        capacity = len(self._columns["id"])
+        if self.size + n <= capacity:
+            return
+        capacity = max(self.size + n, capacity * 2)
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self._columns[name] = grown
+
+    def _buckets(self, amounts):
+        return np.searchsorted(self.exposure_edges, amounts, side="left")
+
+    def _status_codes(self, statuses):
+        try:
+            return np.array([STATUSES.index(status) for status in statuses], dtype=np.int8)
+        except ValueError:
+            raise ValueError(f"Unknown contract status, expected one of {', '.join(STATUSES)}")
+
+    def add(self, contract):
+        """Append one contract; its id must be greater than every stored id."""
+        self.add_many([contract])
+
+    def add_many(self, contracts):
+        """Append contract dicts in ascending id order."""
+        if not contracts:
+            return
+        self.add_columns({
+            "id": np.array([contract["id"] for contract in contracts], dtype=np.int64),
+            "contract_number": np.array([contract["contract_number"].encode("ascii") for contract in contracts], dtype="S16"),
+            "request_date": _parse_dates([contract["request_date"] for contract in contracts], REQUEST_DATE_FORMAT),
+            "status": self._status_codes([contract["status"] for contract in contracts]),
+            "due_date": _parse_dates([contract.get("due_date", "") for contract in contracts], DUE_DATE_FORMAT),
+            "days_until_payment": np.array([contract.get("days_until_payment", 0) for contract in contracts], dtype=np.int32),
+            "amount": np.array([contract["amount"] for contract in contracts], dtype=np.float64)
+        })
+
+    def add_columns(self, columns):
+        """Append contracts given as one array per column, in ascending id order."""
+        ids = np.asarray(columns["id"], dtype=np.int64)
+        if not len(ids):
+            return
+        if np.any(np.diff(ids) <= 0):
+            raise ValueError("Contract ids must be unique and added in ascending order")
+        status = np.asarray(columns["status"], dtype=np.int8)
+        if np.any((status < 0) | (status >= len(STATUSES))):
+            raise ValueError(f"Unknown contract status, expected one of {', '.join(STATUSES)}")
+
+        with self._lock:
+            if self.size and ids[0] <= self._columns["id"][self.size - 1]:
+                raise ValueError("Contract ids must be unique and added in ascending order")
+            start = self.size
+            self._reserve(len(ids))
+            for name, dtype in _COLUMNS.items():
+                self._columns[name][start:start + len(ids)] = np.asarray(columns[name], dtype=dtype)
+            self.size += len(ids)
+
+            amounts = self._columns["amount"][start:self.size]
+            buckets = self._buckets(amounts)
+            np.add.at(self._counts, (status, buckets), 1)
+            np.add.at(self._sums, (status, buckets), amounts)
+
+            self._totals.clear()
+            self._merge_orders(start)
+            new_rows = np.arange(start, self.size)
+            for code in np.unique(status):
+                rows = self._status_rows.get(int(code))
+                if rows is not None:
+                    self._status_rows[int(code)] = np.concatenate([rows, new_rows[status == code]])
+
+    def row_of(self, contract_id):
+        """Row of a contract id; raises KeyError for unknown ids."""
+        ids = self._columns["id"][:self.size]
+        row = int(np.searchsorted(ids, contract_id))
+        if row == self.size or ids[row] != contract_id:
+            raise KeyError(contract_id)
+        return row
+
+    def set_status(self, contract_id, status, due_date=None, days_until_payment=None):
+        """Change the status of a contract and move its amount between aggregates."""
+        code = self._status_codes([status])[0]
+        due_date = None if due_date is None else _parse_dates([due_date], DUE_DATE_FORMAT)[0]
+        with self._lock:
+            row = self.row_of(contract_id)
+            old_code = self._columns["status"][row]
+            if due_date is not None:
+                self._columns["due_date"][row] = due_date
+            if days_until_payment is not None:
+                self._columns["days_until_payment"][row] = days_until_payment
+            if code == old_code:
+                return
+
+            amount = self._columns["amount"][row]
+            bucket = self._buckets(amount)
+            self._counts[old_code, bucket] -= 1
+            self._sums[old_code, bucket] -= amount
+            self._counts[code, bucket] += 1
+            self._sums[code, bucket] += amount
+            self._columns["status"][row] = code
+            self._totals.clear()
+            self._status_rows.pop(int(old_code), None)
+            self._status_rows.pop(int(code), None)
+            for spec in [spec for spec in self._orders if any(key == "status" for key, _ in spec)]:
+                del self._orders[spec]
+
+    def summary(self):
+        """Contract counts and amounts in total, per status, for open contracts and per exposure bucket."""
+        open_codes = [i for i, status in enumerate(STATUSES) if status not in CLOSED_STATUSES]
+        open_counts = self._counts[open_codes].sum(axis=0)
+        open_sums = self._sums[open_codes].sum(axis=0)
+        lower_edges = np.concatenate([[0.0], self.exposure_edges])
+        upper_edges = np.concatenate([self.exposure_edges, [np.inf]])
+        return {
+            "total_contracts": int(self._counts.sum()),
+            "total_amount": round(float(self._sums.sum()), 2),
+            "open_contracts": int(open_counts.sum()),
+            "open_amount": round(float(open_sums.sum()), 2),
+            "by_status": {status: {"count": int(self._counts[i].sum()), "amount": round(float(self._sums[i].sum()), 2)}
+                          for i, status in enumerate(STATUSES)},
+            # Open exposure by contract size
+            "exposure": [{"min": float(low), "max": None if np.isinf(high) else float(high),
+                          "count": int(count), "amount": round(float(total), 2)}
+                         for low, high, count, total in zip(lower_edges, upper_edges, open_counts, open_sums)]
+        }
+
+    def _rows_with_status(self, code):
+        with self._lock:
+            rows = self._status_rows.get(code)
+            if rows is None:
+                rows = np.flatnonzero(self._columns["status"][:self.size] == code)
+                self._status_rows[code] = rows
+            return rows
+
+    def _sort_values(self, key, rows=slice(None)):
+        # Numeric sort values, so descending keys can be negated
+        values = self._columns[key][:self.size][rows]
+        return values.view(np.int64) if key == "request_date" else values
+
+    def _sort(self, spec, rows):
+        """rows sorted by a parsed sort spec, ties broken by id."""
+        keys = [self._columns["id"][rows]]
+        for key, descending in reversed(spec):
+            values = self._sort_values(key, rows)
+            keys.append(-values if descending else values)
+        # lexsort sorts by the last key first
+        return rows[np.lexsort(keys)]
+
+    def _order(self, spec):
+        """Rows sorted by a parsed sort spec, cached and kept up to date on append."""
+        with self._lock:
+            order = self._orders.get(spec)
+            if order is None:
+                if spec == (("id", False),):
+                    order = np.arange(self.size)
+                else:
+                    order = self._sort(spec, np.arange(self.size))
+                self._orders[spec] = order
+            return order
+
+    def _merge_orders(self, start):
+        """Insert the rows appended from start into every cached sort order."""
+        new_rows = np.arange(start, self.size)
+        for spec, order in list(self._orders.items()):
+            if spec == (("id", False),):
+                self._orders[spec] = np.arange(self.size)
+            elif len(new_rows) > MAX_MERGED_ROWS:
+                del self._orders[spec]
+            else:
+                new_order = self._sort(spec, new_rows)
+                positions = [self._bisect(order, spec, self._sort_tuple(spec, row)) for row in new_order.tolist()]
+                self._orders[spec] = np.insert(order, positions, new_order)
+
+    def _sort_tuple(self, spec, row):
+        return tuple(-self._sort_values(key, row) if descending else self._sort_values(key, row)
+                     for key, descending in spec) + (self._columns["id"][row],)
+
+    def _bisect(self, order, spec, target):
+        """Index in order just past the rows whose sort tuple is <= target."""
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._sort_tuple(spec, order[mid]) <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _position_after(self, order, spec, contract_id):
+        """Index in order just past the contract with contract_id, by binary search on its sort values."""
+        return self._bisect(order, spec, self._sort_tuple(spec, self.row_of(contract_id)))
+
+    def _total(self, statuses, start, end, min_amount, max_amount):
+        """Number of contracts matching the filters, from the aggregates or cached per filter."""
+        if start is None and end is None and min_amount is None and max_amount is None:
+            counts = self._counts if statuses is None else self._counts[np.unique(statuses)]
+            return int(counts.sum())
+        key = (None if statuses is None else tuple(sorted(set(statuses.tolist()))), start, end, min_amount, max_amount)
+        with self._lock:
+            total = self._totals.get(key)
+            if total is None:
+                if len(self._totals) >= MAX_CACHED_TOTALS:
+                    self._totals.pop(next(iter(self._totals)))
+                total = self._totals[key] = int(self._filter_mask(None, statuses, start, end, min_amount, max_amount).sum())
+            return total
+
+    def rows(self, status=None, sort="id", descending=False):
+        """Row numbers of the contracts with a status (all when None) in sort order."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        if sort == "id" and not descending and status is not None:
+            return self._rows_with_status(int(self._status_codes([status])[0]))
+        order = self._order(((sort, descending),))
+        if status is not None:
+            order = order[self._columns["status"][order] == self._status_codes([status])[0]]
+        return order
+
+    def records(self, rows):
+        """Contract dicts for rows, in the format of financing_data["financing_history"]."""
+        columns = {name: column[rows] for name, column in self._columns.items()}
+        request_dates = _format_dates(columns["request_date"], REQUEST_DATE_FORMAT)
+        due_dates = _format_dates(columns["due_date"], DUE_DATE_FORMAT)
+        return [{
+            "id": contract_id,
+            "contract_number": contract_number.decode("ascii"),
+            "request_date": request_date,
+            "status": STATUSES[status],
+            "due_date": due_date,
+            "days_until_payment": days_until_payment,
+            "amount": amount
+        } for contract_id, contract_number, request_date, status, due_date, days_until_payment, amount in zip(
+            columns["id"].tolist(), columns["contract_number"].tolist(), request_dates, columns["status"].tolist(),
+            due_dates, columns["days_until_payment"].tolist(), columns["amount"].tolist())]
+
+    def page(self, page=1, per_page=20, status=None, sort="id", descending=False):
+        """One page of contracts (1-based) and the number of matching contracts."""
+        if page < 1 or per_page < 1:
+            raise ValueError("page and per_page must be positive")
+        order = self.rows(status, sort, descending)
+        start = (page - 1) * per_page
+        return self.records(order[start:start + per_page]), len(order)
+
+    def _filter_mask(self, rows, statuses, start, end, min_amount, max_amount):
+        """Filter mask over rows, or over all contracts when rows is None."""
+        if rows is None:
+            rows = slice(0, self.size)
+            mask = np.ones(self.size, dtype=bool)
+        else:
+            mask = np.ones(len(rows), dtype=bool)
+        if statuses is not None:
+            mask &= np.isin(self._columns["status"][rows], statuses)
+        if start is not None or end is not None:
+            dates = self._columns["request_date"][rows]
+            if start is not None:
+                mask &= dates >= start
+            if end is not None:
+                mask &= dates <= end
+        if min_amount is not None or max_amount is not None:
+            amounts = self._columns["amount"][rows]
+            if min_amount is not None:
+                mask &= amounts >= min_amount
+            if max_amount is not None:
+                mask &= amounts <= max_amount
+        return mask
+
+    def query(self, status=None, start=None, end=None, min_amount=None, max_amount=None,
+              sort="id", cursor=None, limit=50):
+        """
+        Return one page of contracts matching the filters, in the order of a sort spec
+        such as "-amount,request_date".
+
+        status is a status or a list of statuses; start and end bound the request date
+        (ISO dates, inclusive) and min_amount and max_amount the amount. next_cursor is
+        the id of the last contract returned; pass it back as cursor to continue. The
+        cursor is located by binary search in the cached sort order and the filters are
+        applied to the following rows in growing chunks until the page is full.
+        """
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        spec = parse_sort(sort)
+        if status is not None:
+            statuses = self._status_codes([status] if isinstance(status, str) else status)
+        else:
+            statuses = None
+        start = None if start is None else np.datetime64(start, "D")
+        end = None if end is None else np.datetime64(end, "D")
+        filters = (statuses, start, end, min_amount, max_amount)
+
+        order = self._order(spec)
+        position = 0
+        if cursor is not None:
+            try:
+                position = self._position_after(order, spec, int(cursor))
+            except (KeyError, ValueError):
+                raise ValueError(f"Invalid cursor: {cursor}")
+
+        # One extra match tells whether there is a next page
+        selected = []
+        found = 0
+        chunk = max(1024, limit * 4)
+        while position < len(order) and found <= limit:
+            rows = order[position:position + chunk]
+            matches = rows[self._filter_mask(rows, *filters)]
+            selected.append(matches[:limit + 1 - found])
+            found += len(selected[-1])
+            position += chunk
+            chunk *= 2
+        rows = np.concatenate(selected) if selected else np.empty(0, dtype=np.int64)
+
+        return {
+            "contracts": self.records(rows[:limit]),
+            "total": self._total(*filters),
+            "next_cursor": str(self._columns["id"][rows[limit - 1]]) if len(rows) > limit else None
+        }
+
+    def to_records(self):
+        return self.records(np.arange(self.size))
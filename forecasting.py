@@ -0,0 +1,156 @@
+"""
+Seasonal trend forecasts of revenue, expenses and cash.
+
+Each series is modelled as level + trend * month + seasonal[month of year], with the
+same 12 monthly slots as the generator's seasonality. Revenue and expenses are fitted
+on a log scale, so their trend is a monthly growth rate and their seasonality is
+multiplicative; cash is fitted on its own scale. Every company shares the same design
+matrix, so one least-squares solve fits a whole batch of companies.
+"""
+import threading
+
+import numpy as np
+
+HORIZON_DAYS = (30, 90, 365)
+# Flows are summed over a horizon, balances are read at its end
+FLOW_SERIES = ("revenue", "expenses")
+BALANCE_SERIES = ("cash",)
+LOG_SERIES = ("revenue", "expenses")
+
+def _horizon_months(days):
+    return max(1, int(round(days / 30.4375)))
+
+def statement_series(column):
+    """Forecast inputs from column(statement, field), which returns (companies x months) arrays."""
+    return {
+        "revenue": np.asarray(column("income_statement", "revenue"), dtype=np.float64),
+        "expenses": (np.asarray(column("income_statement", "cost_of_goods_sold"), dtype=np.float64)
+                     + np.asarray(column("income_statement", "operating_expenses"), dtype=np.float64)),
+        "cash": np.asarray(column("balance_sheet", "cash_and_equivalents"), dtype=np.float64)
+    }
+
+def _fit(values, months_of_year, log):
+    """Fit level, trend and 12 seasonal terms to every row of a (companies x months) array."""
+    n_months = values.shape[1]
+    design = np.zeros((n_months, 14))
+    design[:, 0] = 1.0
+    design[:, 1] = np.arange(n_months)
+    design[np.arange(n_months), 2 + months_of_year] = 1.0
+    target = np.log(np.maximum(values, 1e-9)) if log else values
+    # Minimum-norm least squares: the seasonal dummies are collinear with the level
+    coefficients = target @ np.linalg.pinv(design).T
+    level, trend, seasonal = coefficients[:, 0], coefficients[:, 1], coefficients[:, 2:]
+
+    # Seasonal terms average to zero over the observed months; unobserved months get none
+    observed = np.zeros(12, dtype=bool)
+    observed[months_of_year] = True
+    offset = seasonal[:, observed].mean(axis=1)
+    seasonal = np.where(observed, seasonal - offset[:, None], 0.0)
+    return level + offset, trend, seasonal
+
+class SeasonalForecast:
+    """
+    Fitted forecast models for a batch of companies. series maps each series name to a
+    (companies x months) array and dates holds the month of each column.
+    """
+
+    def __init__(self, series, dates):
+        dates = np.asarray(dates, dtype="datetime64[M]")
+        self.last_date = dates[-1]
+        self.n_months = len(dates)
+        months_of_year = dates.astype(np.int64) % 12
+        self.last_values = {name: values[:, -1].copy() for name, values in series.items()}
+        self.params = {name: _fit(values, months_of_year, name in LOG_SERIES) for name, values in series.items()}
+
+    @classmethod
+    def from_store(cls, store, granularity="monthly"):
+        """Fit every company of a ColumnarStore."""
+        series = statement_series(lambda statement, field: store.column(granularity, statement, field))
+        return cls(series, store.period_index(granularity))
+
+    @classmethod
+    def from_batch(cls, batch):
+        """Fit every company of a StatementBatch."""
+        return cls(statement_series(batch.column), batch.dates)
+
+    @property
+    def n_companies(self):
+        return len(next(iter(self.last_values.values())))
+
+    def project(self, months=12):
+        """Monthly projections for the next months, as {series: (companies x months)} arrays."""
+        steps = np.arange(1, months + 1)
+        t = self.n_months - 1 + steps
+        months_of_year = (self.last_date.astype(np.int64) + steps) % 12
+        projections = {}
+        for name, (level, trend, seasonal) in self.params.items():
+            values = level[:, None] + trend[:, None] * t + seasonal[:, months_of_year]
+            projections[name] = np.exp(values) if name in LOG_SERIES else values
+        return projections
+
+    def horizons(self, days=HORIZON_DAYS):
+        """Per horizon: flow totals over the horizon and balances at its end, per company."""
+        projections = self.project(max(_horizon_months(d) for d in days))
+        result = {}
+        for d in days:
+            months = _horizon_months(d)
+            result[d] = {name: projections[name][:, :months].sum(axis=1) for name in FLOW_SERIES}
+            result[d].update({name: projections[name][:, months - 1] for name in BALANCE_SERIES})
+        return result
+
+    def summary(self, company=0, days=HORIZON_DAYS):
+        """JSON-ready forecast of one company."""
+        monthly = self.project(max(_horizon_months(d) for d in days))
+        horizons = self.horizons(days)
+        cash_now = float(self.last_values["cash"][company])
+        level, trend, seasonal = self.params["revenue"]
+        return {
+            "as_of": str(self.last_date),
+            "monthly_revenue_growth_pct": round(float(np.expm1(trend[company])) * 100, 2),
+            "cash": round(cash_now, 2),
+            "horizons": {str(d): {
+                "revenue": round(float(horizons[d]["revenue"][company]), 2),
+                "expenses": round(float(horizons[d]["expenses"][company]), 2),
+                "cash": round(float(horizons[d]["cash"][company]), 2),
+                "cash_change_pct": round((float(horizons[d]["cash"][company]) / cash_now - 1) * 100, 2) if cash_now else None
+            } for d in days},
+            "monthly": {
+                "dates": [str(self.last_date + i) for i in range(1, monthly["revenue"].shape[1] + 1)],
+                **{name: np.round(values[company], 2).tolist() for name, values in monthly.items()}
+            },
+            # Multiplicative seasonal factors around 1, comparable to the generator's seasonality
+            "revenue_seasonality": np.round(np.exp(seasonal[company]), 3).tolist()
+        }
+
+class ForecastService:
+    """
+    Keeps the forecast of every company fitted for the current data version.
+    source returns (version, store); the models are refitted only when version changes.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        # (version, forecast, summaries by company), replaced as a whole on refit
+        self._state = (None, None, {})
+        self._lock = threading.Lock()
+
+    def _current(self):
+        version, store = self.source()
+        state = self._state
+        if version == state[0]:
+            return state
+        with self._lock:
+            if version != self._state[0]:
+                self._state = (version, SeasonalForecast.from_store(store), {})
+            return self._state
+
+    def get(self):
+        """The SeasonalForecast of the current data version."""
+        return self._current()[1]
+
+    def summary(self, company=0):
+        """Cached SeasonalForecast.summary() of one company."""
+        _, forecast, summaries = self._current()
+        if company not in summaries:
+            summaries[company] = forecast.summary(company)
+        return summaries[company]
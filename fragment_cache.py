@@ -0,0 +1,88 @@
+"""
+Cache of rendered template fragments.
+
+Templates mark blocks whose output only changes with the data:
+
+    {% cache "contract_table", page %} ... {% endcache %}
+
+The block is rendered once per data version, tenant, fragment name and key values
+(here the page), and later renders reuse its HTML. Entries are kept in an LRU bounded
+by their total size; entries of older data versions are never hit again and age out.
+"""
+import threading
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+_HASHABLE = (str, int, float, bool, type(None))
+
+class FragmentCache:
+    """
+    LRU cache of rendered fragments bounded by total characters. context() returns the
+    (data version, tenant) the fragments are rendered for.
+    """
+
+    def __init__(self, context, max_bytes=16 * 1024 * 1024):
+        self.context = context
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        """Return the cached HTML for key in the current context, calling render() on a miss."""
+        cache_key = self.context() + tuple(value if isinstance(value, _HASHABLE) else repr(value) for value in key)
+        with self._lock:
+            html = self._entries.get(cache_key)
+            if html is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = render()
+        with self._lock:
+            if cache_key not in self._entries and len(html) <= self.max_bytes:
+                self._entries[cache_key] = html
+                self.size += len(html)
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja {% cache name, key... %}...{% endcache %} tag backed by the environment's
+    fragment_cache. Without one the block is rendered every time.
+    """
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_render", [nodes.List(key)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return Markup(cache.get_or_render(key, caller))
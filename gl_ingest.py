@@ -0,0 +1,342 @@
+"""
+Monthly statements from general-ledger CSV exports.
+
+A general ledger lists journal lines: a date, an account and a debit and credit
+amount (or one signed amount). The file is read in chunks of rows; each chunk is
+mapped to line items through the chart of accounts and added to per-month totals with
+one bincount, so memory stays constant whatever the file size. The monthly movements
+are then turned into the income statement, balance sheet and cash flow statement of
+the generate_all_data() format, which the rollups, the columnar store and the app use
+unchanged.
+
+    python gl_ingest.py ledger.csv --name "Company B" --store data/tenants/1/store
+    python gl_ingest.py --sample 5000000 sample_ledger.csv     # write a synthetic ledger to try it
+"""
+import csv
+import json
+import time
+import argparse
+import datetime
+import itertools
+
+import numpy as np
+
+from financial_data_model import StatementBatch, STATEMENT_FIELDS, compute_financial_ratios
+
+# Account code prefix -> line item; the longest matching prefix wins
+DEFAULT_ACCOUNT_MAP = {
+    "1101": "cash_and_equivalents",
+    "1102": "accounts_receivable",
+    "1103": "inventory",
+    "1201": "property_plant_equipment",
+    "1202": "intangible_assets",
+    "12": "other_noncurrent_assets",
+    "2101": "accounts_payable",
+    "2102": "short_term_debt",
+    "2201": "long_term_debt",
+    "22": "other_noncurrent_liabilities",
+    "3101": "capital",
+    "3102": "retained_earnings",
+    "41": "revenue",
+    "51": "cost_of_goods_sold",
+    "52": "operating_expenses",
+    "53": "depreciation_amortization",
+    "54": "financial_expenses",
+    "55": "taxes"
+}
+
+# Line items the ledger accumulates; assets and expenses have debit balances, the others credit ones
+LEDGER_ITEMS = (
+    "cash_and_equivalents", "accounts_receivable", "inventory", "property_plant_equipment",
+    "intangible_assets", "other_noncurrent_assets", "accounts_payable", "short_term_debt",
+    "long_term_debt", "other_noncurrent_liabilities", "capital", "retained_earnings",
+    "revenue", "cost_of_goods_sold", "operating_expenses", "depreciation_amortization",
+    "financial_expenses", "taxes"
+)
+CREDIT_ITEMS = ("accounts_payable", "short_term_debt", "long_term_debt", "other_noncurrent_liabilities",
+                "capital", "retained_earnings", "revenue")
+_ITEM_INDEX = {item: i for i, item in enumerate(LEDGER_ITEMS)}
+_SIGNS = np.array([-1.0 if item in CREDIT_ITEMS else 1.0 for item in LEDGER_ITEMS])
+
+class AccountMapper:
+    """Resolves account codes to line item indices by longest prefix, once per distinct account."""
+
+    def __init__(self, account_map=DEFAULT_ACCOUNT_MAP):
+        unknown = set(account_map.values()) - set(LEDGER_ITEMS)
+        if unknown:
+            raise ValueError(f"Unknown line items in the account map: {', '.join(sorted(unknown))}")
+        self.prefixes = sorted(account_map.items(), key=lambda entry: -len(entry[0]))
+        self._resolved = {}
+
+    def __getitem__(self, account):
+        """Line item index of an account, or -1 if no prefix matches."""
+        index = self._resolved.get(account)
+        if index is None:
+            index = next((_ITEM_INDEX[item] for prefix, item in self.prefixes if account.startswith(prefix)), -1)
+            self._resolved[account] = index
+        return index
+
+class LedgerAggregator:
+    """
+    Running per-month totals of the line items, in their normal balance (debits minus
+    credits for assets and expenses, credits minus debits for the others).
+    """
+
+    def __init__(self, account_map=DEFAULT_ACCOUNT_MAP, date_format="%Y-%m-%d"):
+        self.mapper = AccountMapper(account_map)
+        self.date_format = date_format
+        self.rows = 0
+        self.unmapped = {}
+        # Month number (year * 12 + month - 1) -> totals per line item
+        self._months = {}
+        self._month_of_date = {}
+
+    def _month(self, date):
+        month = self._month_of_date.get(date)
+        if month is None:
+            parsed = datetime.datetime.strptime(date, self.date_format)
+            month = self._month_of_date[date] = parsed.year * 12 + parsed.month - 1
+        return month
+
+    def add(self, dates, accounts, amounts):
+        """Add one chunk of journal lines: date strings, account codes and debit-minus-credit amounts."""
+        amounts = np.asarray(amounts, dtype=np.float64)
+        self.rows += len(amounts)
+        month_of_date, month = self._month_of_date, self._month
+        months = np.fromiter((month_of_date[date] if date in month_of_date else month(date) for date in dates),
+                             dtype=np.int64, count=len(amounts))
+        mapper = self.mapper
+        items = np.fromiter((mapper[account] for account in accounts), dtype=np.int64, count=len(amounts))
+
+        unmapped = items < 0
+        if unmapped.any():
+            for account in itertools.compress(accounts, unmapped.tolist()):
+                self.unmapped[account] = self.unmapped.get(account, 0) + 1
+            months, items, amounts = months[~unmapped], items[~unmapped], amounts[~unmapped]
+        if not len(amounts):
+            return
+
+        first = int(months.min())
+        n_months = int(months.max()) - first + 1
+        totals = np.bincount((months - first) * len(LEDGER_ITEMS) + items, weights=amounts,
+                             minlength=n_months * len(LEDGER_ITEMS)).reshape(n_months, len(LEDGER_ITEMS))
+        for offset in np.flatnonzero(totals.any(axis=1)).tolist():
+            month = first + offset
+            if month in self._months:
+                self._months[month] += totals[offset]
+            else:
+                self._months[month] = totals[offset].copy()
+
+    def movements(self):
+        """(first month number, (months x items) movements in normal balance), with empty months filled in."""
+        if not self._months:
+            raise ValueError("The ledger has no mapped journal lines")
+        first, last = min(self._months), max(self._months)
+        movements = np.zeros((last - first + 1, len(LEDGER_ITEMS)))
+        for month, totals in self._months.items():
+            movements[month - first] = totals
+        return first, movements * _SIGNS
+
+def statements_from_movements(movements, opening=None):
+    """
+    Build the statement columns (1 x months arrays, as in a StatementBatch) from monthly
+    movements per line item. Balances accumulate from opening (zero by default); the
+    income statement items are the month's flows and net income accumulates into
+    retained earnings, since monthly exports carry no closing entries. The cash flow
+    statement is derived from balance changes: investing from the non-current assets
+    (capex is the PPE change plus depreciation), financing from debt and equity, and
+    operations as the rest of the change in cash.
+    """
+    flows = {item: movements[:, i] for i, item in enumerate(LEDGER_ITEMS)}
+    opening = opening or {}
+
+    income = {name: flows[name] for name in ("revenue", "cost_of_goods_sold", "operating_expenses",
+                                              "depreciation_amortization", "financial_expenses", "taxes")}
+    income["gross_profit"] = income["revenue"] - income["cost_of_goods_sold"]
+    income["ebitda"] = income["gross_profit"] - income["operating_expenses"]
+    income["ebit"] = income["ebitda"] - income["depreciation_amortization"]
+    income["ebt"] = income["ebit"] - income["financial_expenses"]
+    income["net_income"] = income["ebt"] - income["taxes"]
+
+    balance = {item: opening.get(item, 0.0) + np.cumsum(flows[item]) for item in LEDGER_ITEMS[:12]}
+    balance["retained_earnings"] = balance["retained_earnings"] + np.cumsum(income["net_income"])
+    balance["total_current_assets"] = balance["cash_and_equivalents"] + balance["accounts_receivable"] + balance["inventory"]
+    balance["total_noncurrent_assets"] = (balance["property_plant_equipment"] + balance["intangible_assets"]
+                                          + balance["other_noncurrent_assets"])
+    balance["total_assets"] = balance["total_current_assets"] + balance["total_noncurrent_assets"]
+    balance["total_current_liabilities"] = balance["accounts_payable"] + balance["short_term_debt"]
+    balance["total_noncurrent_liabilities"] = balance["long_term_debt"] + balance["other_noncurrent_liabilities"]
+    balance["total_liabilities"] = balance["total_current_liabilities"] + balance["total_noncurrent_liabilities"]
+    balance["total_equity"] = balance["capital"] + balance["retained_earnings"]
+
+    ending_cash = balance["cash_and_equivalents"]
+    beginning_cash = ending_cash - flows["cash_and_equivalents"]
+    investing = -(flows["property_plant_equipment"] + flows["depreciation_amortization"]
+                  + flows["intangible_assets"] + flows["other_noncurrent_assets"])
+    financing = (flows["short_term_debt"] + flows["long_term_debt"] + flows["other_noncurrent_liabilities"]
+                 + flows["capital"] + flows["retained_earnings"])
+    cash_flow = {
+        "cash_from_operations": flows["cash_and_equivalents"] - investing - financing,
+        "cash_from_investing": investing,
+        "cash_from_financing": financing,
+        "net_change_in_cash": flows["cash_and_equivalents"],
+        "beginning_cash_balance": beginning_cash,
+        "ending_cash_balance": ending_cash
+    }
+
+    statements = {
+        "income_statement": {field: income[field][np.newaxis] for field in STATEMENT_FIELDS["income_statement"]},
+        "balance_sheet": {field: balance[field][np.newaxis] for field in STATEMENT_FIELDS["balance_sheet"]},
+        "cash_flow_statement": {field: cash_flow[field][np.newaxis] for field in STATEMENT_FIELDS["cash_flow_statement"]}
+    }
+    statements["financial_ratios"] = compute_financial_ratios(statements["income_statement"], statements["balance_sheet"])
+    return statements
+
+def _amounts(values):
+    # Blank cells are zero
+    return np.array([float(value) if value else 0.0 for value in values])
+
+def read_ledger_chunks(path, chunk_rows=500_000, date_column="date", account_column="account",
+                       debit_column="debit", credit_column="credit", amount_column=None, delimiter=","):
+    """
+    Yield (dates, accounts, amounts) for each chunk of chunk_rows journal lines of a CSV
+    with a header row. amounts are debits minus credits, or amount_column if given.
+    """
+    with open(path, newline="") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader)
+        wanted = [date_column, account_column] + ([amount_column] if amount_column else [debit_column, credit_column])
+        missing = [name for name in wanted if name not in header]
+        if missing:
+            raise ValueError(f"{path} has no column {', '.join(missing)}")
+        indices = [header.index(name) for name in wanted]
+        while True:
+            rows = list(itertools.islice(reader, chunk_rows))
+            if not rows:
+                return
+            try:
+                columns = [[row[i] for row in rows] for i in indices]
+                if amount_column:
+                    amounts = _amounts(columns[2])
+                else:
+                    amounts = _amounts(columns[2]) - _amounts(columns[3])
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"Malformed journal line in {path} near line {reader.line_num}: {e}")
+            yield columns[0], columns[1], amounts
+
+def ingest_ledger(path, company_name="Company A", industry="Technology", account_map=DEFAULT_ACCOUNT_MAP,
+                  opening=None, date_format="%Y-%m-%d", scale=1.0, strict=False, **csv_options):
+    """
+    Stream a general-ledger CSV into monthly statements. Returns (batch, stats): a
+    one-company StatementBatch (batch.to_dict() is the generate_all_data() format,
+    write_store() takes it directly) and ingestion statistics. Amounts are multiplied by
+    scale, e.g. 1e-6 for ledgers in pesos. Lines of unmapped accounts are counted in
+    stats["unmapped"] and skipped, or raise ValueError with strict.
+    """
+    start = time.perf_counter()
+    aggregator = LedgerAggregator(account_map, date_format)
+    chunks = 0
+    for dates, accounts, amounts in read_ledger_chunks(path, **csv_options):
+        aggregator.add(dates, accounts, amounts * scale if scale != 1.0 else amounts)
+        chunks += 1
+    if strict and aggregator.unmapped:
+        raise ValueError(f"Unmapped accounts: {', '.join(sorted(aggregator.unmapped))}")
+
+    first, movements = aggregator.movements()
+    dates = [datetime.datetime(month // 12, month % 12 + 1, 1) for month in range(first, first + len(movements))]
+    batch = StatementBatch([company_name], industry, dates, statements_from_movements(movements, opening), {})
+    elapsed = time.perf_counter() - start
+    stats = {
+        "rows": aggregator.rows,
+        "chunks": chunks,
+        "months": len(dates),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(aggregator.rows / elapsed) if elapsed else None,
+        "unmapped": aggregator.unmapped
+    }
+    return batch, stats
+
+# Journal entries of the sample ledger: (debit account, credit account, relative size)
+SAMPLE_ENTRIES = (
+    ("110201", "410101", 1.00),   # sale on credit
+    ("110101", "110201", 0.95),   # collection
+    ("110301", "210101", 0.55),   # inventory purchase
+    ("510101", "110301", 0.50),   # cost of goods sold
+    ("210101", "110101", 0.52),   # supplier payment
+    ("520101", "110101", 0.30),   # operating expenses
+    ("530101", "120101", 0.05),   # depreciation
+    ("120101", "110101", 0.06),   # capital expenditure
+    ("540101", "110101", 0.01),   # interest paid
+    ("550101", "110101", 0.02),   # taxes paid
+    ("110101", "220101", 0.02),   # borrowing
+    ("220101", "110101", 0.015)   # debt repayment
+)
+
+def write_sample_ledger(path, n_lines, months=24, start_date="2023-01-01", seed=0, chunk_lines=1_000_000):
+    """
+    Write a synthetic, balanced general ledger of about n_lines journal lines (two per
+    entry) over the given months, starting with an opening capital contribution.
+    """
+    rng = np.random.default_rng(seed)
+    first = np.datetime64(start_date, "D")
+    days = ((np.datetime64(start_date, "M") + months).astype("datetime64[D]") - first).astype(np.int64)
+    n_entries = n_lines // 2
+    weights = np.array([entry[2] for entry in SAMPLE_ENTRIES])
+    with open(path, "w", newline="") as f:
+        f.write("entry,date,account,debit,credit\n")
+        f.write(f"0,{start_date},110101,{n_entries * 2.0:.2f},\n0,{start_date},310101,,{n_entries * 2.0:.2f}\n")
+        for offset in range(0, n_entries, chunk_lines // 2):
+            n = min(chunk_lines // 2, n_entries - offset)
+            kinds = rng.choice(len(SAMPLE_ENTRIES), n, p=weights / weights.sum())
+            dates = np.sort(first + rng.integers(0, days, n)).astype(str).tolist()
+            amounts = np.round(rng.uniform(0.5, 1.5, n) * 10, 2).tolist()
+            lines = []
+            for entry, kind, date, amount in zip(range(offset + 1, offset + n + 1), kinds.tolist(), dates, amounts):
+                debit, credit, _ = SAMPLE_ENTRIES[kind]
+                lines.append(f"{entry},{date},{debit},{amount},\n{entry},{date},{credit},,{amount}\n")
+            f.writelines(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build monthly statements from a general-ledger CSV.")
+    parser.add_argument("ledger")
+    parser.add_argument("--name", default="Company A")
+    parser.add_argument("--industry", default="Technology")
+    parser.add_argument("--accounts", help="JSON file mapping account code prefixes to line items")
+    parser.add_argument("--amount-column", help="signed amount column instead of debit and credit")
+    parser.add_argument("--date-format", default="%Y-%m-%d")
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier of the amounts, e.g. 1e-6 for pesos")
+    parser.add_argument("--chunk-rows", type=int, default=500_000)
+    parser.add_argument("--strict", action="store_true", help="fail on accounts missing from the map")
+    parser.add_argument("--output", help="write the statements as JSON in the generate_all_data() format")
+    parser.add_argument("--store", help="write the statements to a columnar store directory")
+    parser.add_argument("--sample", type=int, metavar="LINES", help="write a synthetic ledger of LINES lines instead")
+    args = parser.parse_args()
+
+    if args.sample:
+        start = time.perf_counter()
+        write_sample_ledger(args.ledger, args.sample)
+        print(f"Wrote {args.sample} journal lines to {args.ledger} in {time.perf_counter() - start:.1f}s")
+    else:
+        account_map = DEFAULT_ACCOUNT_MAP
+        if args.accounts:
+            with open(args.accounts) as f:
+                account_map = json.load(f)
+        batch, stats = ingest_ledger(args.ledger, args.name, args.industry, account_map, date_format=args.date_format,
+                                     scale=args.scale, strict=args.strict, chunk_rows=args.chunk_rows,
+                                     amount_column=args.amount_column, delimiter=args.delimiter)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(batch.to_dict(), f, indent=2)
+        if args.store:
+            from columnar_store import write_store
+            write_store(args.store, batch)
+        for account, lines in sorted(stats["unmapped"].items()):
+            print(f"Unmapped account {account}: {lines} lines skipped")
+        from integrity import validate_batch
+        integrity = validate_batch(batch)
+        for example in integrity.examples:
+            print(f"Integrity violation {example['check']} in {example['period']}: {example['actual']} != "
+                  f"{example['expected']}")
+        print(f"{stats['rows']} journal lines, {stats['months']} months in {stats['seconds']}s "
+              f"({stats['rows_per_second']} rows/s), {integrity.total_violations} integrity violations")
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings, read by default from the working directory.
+
+With preload_app the master imports the app once: the data is loaded (or generated)
+and the caches are warmed before forking, and workers share those pages copy-on-write
+instead of each loading its own copy. Set GUNICORN_PRELOAD=0 to load per worker, e.g.
+to pick up code changes with a graceful reload. Workers come from WEB_CONCURRENCY
+and the port from PORT, as gunicorn reads them by default.
+"""
+import gc
+import os
+
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        import app  # already imported by the master, this only looks it up
+        app.warm_up()
+    # Move everything allocated so far out of the collector's reach, so that collections
+    # in the workers do not write to (and so copy) the pages of the preloaded objects
+    gc.freeze()
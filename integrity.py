@@ -0,0 +1,278 @@
+"""
+Accounting-integrity checks of monthly statements and their rollups.
+
+Every check compares two (companies x periods) arrays in one vectorized expression:
+the subtotal identities of each statement, the balance sheet equation, the cash
+roll-forward within and across months, and the quarterly and yearly figures against
+their months (flows summed, balances at the period's end). A value passes when it is
+within atol per rounded value involved plus rtol of its magnitude, so statements
+rounded to cents pass. Only violations are turned into Python objects, so a clean
+batch of any size costs a few array passes per check.
+
+    python integrity.py data/store
+    python integrity.py data/portfolio            # every shard of a generated portfolio
+    python integrity.py data/chilean_sme_financial_data.json
+"""
+import os
+import json
+import time
+import argparse
+import datetime
+
+import numpy as np
+
+from financial_data_model import StatementBatch, STATEMENT_FIELDS
+from rollups import rollup, period_bounds, FLOW_STATEMENTS, OPENING_BALANCES, CLOSING_BALANCES
+
+# (check, line item, the expression it must equal)
+IDENTITIES = (
+    ("gross_profit", "gross_profit", "revenue - cost_of_goods_sold"),
+    ("ebitda", "ebitda", "gross_profit - operating_expenses"),
+    ("ebit", "ebit", "ebitda - depreciation_amortization"),
+    ("ebt", "ebt", "ebit - financial_expenses"),
+    ("net_income", "net_income", "ebt - taxes"),
+    ("current_assets", "total_current_assets", "cash_and_equivalents + accounts_receivable + inventory"),
+    ("noncurrent_assets", "total_noncurrent_assets",
+     "property_plant_equipment + intangible_assets + other_noncurrent_assets"),
+    ("total_assets", "total_assets", "total_current_assets + total_noncurrent_assets"),
+    ("current_liabilities", "total_current_liabilities", "accounts_payable + short_term_debt"),
+    ("noncurrent_liabilities", "total_noncurrent_liabilities", "long_term_debt + other_noncurrent_liabilities"),
+    ("total_liabilities", "total_liabilities", "total_current_liabilities + total_noncurrent_liabilities"),
+    ("total_equity", "total_equity", "capital + retained_earnings"),
+    ("balance_sheet_equation", "total_assets", "total_liabilities + total_equity"),
+    ("net_change_in_cash", "net_change_in_cash", "cash_from_operations + cash_from_investing + cash_from_financing"),
+    ("cash_rollforward", "ending_cash_balance", "beginning_cash_balance + net_change_in_cash"),
+    ("cash_balance", "ending_cash_balance", "cash_and_equivalents")
+)
+# Violations kept per check with their locations; the others are only counted
+MAX_EXAMPLES = 20
+
+def _terms(expression):
+    """Parse "a + b - c" into ((1, "a"), (1, "b"), (-1, "c"))."""
+    tokens = expression.split()
+    terms = [(1, tokens[0])]
+    for operator, name in zip(tokens[1::2], tokens[2::2]):
+        terms.append((1 if operator == "+" else -1, name))
+    return tuple(terms)
+
+_IDENTITY_TERMS = tuple((check, item, _terms(expression)) for check, item, expression in IDENTITIES)
+# Lines summed over a period's months
+_FLOW_FIELDS = {field for statement in FLOW_STATEMENTS for field in STATEMENT_FIELDS[statement]
+                if field not in OPENING_BALANCES and field not in CLOSING_BALANCES}
+
+def _rounded_values(field, months):
+    """Rounded values behind a figure: a period's flow sums its rounded months and is rounded itself."""
+    return months + 1 if months is not None and field in _FLOW_FIELDS else 1
+
+class IntegrityReport:
+    """Values checked and violations per check; examples locate the first violations of each."""
+
+    def __init__(self, atol=0.005, rtol=1e-6, company_offset=0, max_examples=MAX_EXAMPLES):
+        self.atol = atol
+        self.rtol = rtol
+        self.company_offset = company_offset
+        self.max_examples = max_examples
+        self.checked = {}
+        self.violations = {}
+        self.examples = []
+
+    @property
+    def ok(self):
+        return not any(self.violations.values())
+
+    @property
+    def total_violations(self):
+        return sum(self.violations.values())
+
+    def check(self, name, actual, expected, n_values, periods):
+        """
+        Compare actual with expected, (companies x periods) arrays; n_values is how many
+        rounded values each comparison involves and periods labels the columns. NaN fails.
+        """
+        actual = np.asarray(actual, dtype=np.float64)
+        expected = np.asarray(expected, dtype=np.float64)
+        difference = np.abs(actual - expected)
+        tolerance = self.atol * n_values + self.rtol * np.maximum(np.abs(actual), np.abs(expected))
+        failed = ~(difference <= tolerance)
+        count = int(np.count_nonzero(failed))
+        self.checked[name] = self.checked.get(name, 0) + failed.size
+        self.violations[name] = self.violations.get(name, 0) + count
+        if not count:
+            return
+        kept = sum(1 for example in self.examples if example["check"] == name)
+        companies, columns = np.nonzero(failed)
+        for company, column in zip(companies[:max(0, self.max_examples - kept)].tolist(),
+                                   columns[:max(0, self.max_examples - kept)].tolist()):
+            self.examples.append({
+                "check": name,
+                "company": company + self.company_offset,
+                "period": periods[column],
+                "actual": float(actual[company, column]),
+                "expected": float(expected[company, column]),
+                "difference": float(difference[company, column]),
+                "tolerance": float(tolerance[company, column])
+            })
+
+    def merge(self, other):
+        """Add the counts and examples of another report, e.g. of the next shard."""
+        for name, count in other.checked.items():
+            self.checked[name] = self.checked.get(name, 0) + count
+        for name, count in other.violations.items():
+            self.violations[name] = self.violations.get(name, 0) + count
+        self.examples.extend(example for example in other.examples
+                             if sum(1 for kept in self.examples if kept["check"] == example["check"]) < self.max_examples)
+        return self
+
+    def summary(self):
+        return {
+            "ok": self.ok,
+            "values_checked": sum(self.checked.values()),
+            "violations": {name: count for name, count in self.violations.items() if count},
+            "examples": self.examples,
+            "atol": self.atol,
+            "rtol": self.rtol
+        }
+
+def _columns(statements):
+    return {field: values for statement, fields in statements.items() if statement != "financial_ratios"
+            for field, values in fields.items()}
+
+def check_identities(report, statements, periods, granularity="monthly", months=None):
+    """
+    Check the subtotal identities, the balance sheet equation and the cash roll-forward
+    within each period; months is the number of months per period of rolled-up statements.
+    """
+    columns = _columns(statements)
+    for check, item, terms in _IDENTITY_TERMS:
+        expected = sum(sign * columns[name] for sign, name in terms)
+        n_values = _rounded_values(item, months) + sum(_rounded_values(name, months) for _, name in terms)
+        report.check(f"{granularity}/{check}", columns[item], expected, n_values, periods)
+
+def check_cash_continuity(report, statements, periods, granularity="monthly"):
+    """Beginning cash of each period equals the ending cash of the previous one (consecutive periods only)."""
+    cash_flow = statements["cash_flow_statement"]
+    if cash_flow["ending_cash_balance"].shape[1] > 1:
+        report.check(f"{granularity}/opening_cash", cash_flow["beginning_cash_balance"][:, 1:],
+                     cash_flow["ending_cash_balance"][:, :-1], 2, periods[1:])
+
+def check_rollup(report, monthly, statements, starts, ends, periods, granularity):
+    """
+    Check period statements against their months: flows are the sums over the months
+    (as differences of cumulative sums, so overlapping periods such as TTM work), balances
+    the last month's values and beginning cash the first month's.
+    """
+    starts = np.asarray(starts)
+    ends = np.asarray(ends)
+    months_per_period = ends - starts + 1
+    for statement in FLOW_STATEMENTS:
+        for field in STATEMENT_FIELDS[statement]:
+            values = monthly[statement][field]
+            if field in OPENING_BALANCES:
+                expected = values[:, starts]
+            elif field in CLOSING_BALANCES:
+                expected = values[:, ends]
+            else:
+                totals = np.zeros((values.shape[0], values.shape[1] + 1))
+                np.cumsum(values, axis=1, out=totals[:, 1:])
+                expected = totals[:, ends + 1] - totals[:, starts]
+            report.check(f"{granularity}/sum/{field}", statements[statement][field], expected,
+                         months_per_period + 1, periods)
+    for field, values in monthly["balance_sheet"].items():
+        report.check(f"{granularity}/closing/{field}", statements["balance_sheet"][field], values[:, ends], 2, periods)
+
+def validate_statements(monthly, dates, period_statements=None, report=None, **options):
+    """
+    Validate monthly statements ({statement: {field: (companies x months)}}) with the given
+    month dates, and optionally period_statements {granularity: (statements, starts, ends,
+    labels)} against them. Returns an IntegrityReport.
+    """
+    report = report or IntegrityReport(**options)
+    labels = [date.strftime("%Y-%m-%d") for date in dates]
+    check_identities(report, monthly, labels)
+    check_cash_continuity(report, monthly, labels)
+    for granularity, (statements, starts, ends, periods) in (period_statements or {}).items():
+        check_identities(report, statements, periods, granularity, np.asarray(ends) - np.asarray(starts) + 1)
+        check_rollup(report, monthly, statements, starts, ends, periods, granularity)
+    return report
+
+def validate_batch(batch, granularities=("quarter", "year"), **options):
+    """Validate a StatementBatch and its rollups to the given granularities."""
+    periods = {granularity: (rolled.statements, rolled.starts, rolled.ends, rolled.labels)
+               for granularity, rolled in rollup(batch, granularities).items()}
+    return validate_statements(batch.statements, batch.dates, periods, **options)
+
+def validate_store(store, **options):
+    """Validate a ColumnarStore: its monthly columns and the stored quarterly and yearly columns."""
+    def statements(granularity):
+        return {statement: {field: np.asarray(store.column(granularity, statement, field)) for field in fields}
+                for statement, fields in STATEMENT_FIELDS.items() if statement != "financial_ratios"}
+
+    months = store.period_index("monthly")
+    dates = [datetime.datetime.strptime(str(month)[:10], "%Y-%m-%d") for month in months]
+    periods = {}
+    for granularity in ("quarterly", "yearly"):
+        starts = np.searchsorted(months, store.period_index(granularity))
+        ends = np.append(starts[1:] - 1, len(months) - 1)
+        periods[granularity] = (statements(granularity), starts, ends,
+                                [str(period)[:10] for period in store.period_index(granularity)])
+    return validate_statements(statements("monthly"), dates, periods, **options)
+
+def validate_financial_data(financial_data, **options):
+    """Validate data in the generate_all_data() format, including its quarterly_data and yearly_data."""
+    batch = StatementBatch.from_monthly_records(financial_data["monthly_data"])
+    periods = {}
+    for granularity, key in (("quarter", "quarterly_data"), ("year", "yearly_data")):
+        labels, starts, ends = period_bounds(batch.dates, granularity)
+        records = financial_data.get(key)
+        if records is None:
+            continue
+        if len(records) != len(labels):
+            raise ValueError(f"{key} has {len(records)} periods, the months make {len(labels)}")
+        statements = {statement: {field: np.array([[record[statement][field] for record in records]], dtype=float)
+                                  for field in fields if field in records[0][statement]}
+                      for statement, fields in STATEMENT_FIELDS.items() if statement != "financial_ratios"}
+        # Period reports leave out the cash balances, which are those of the first and last month
+        cash_flow = statements["cash_flow_statement"]
+        cash_flow.setdefault("beginning_cash_balance", batch.statements["cash_flow_statement"]["beginning_cash_balance"][:, starts])
+        cash_flow.setdefault("ending_cash_balance", batch.statements["cash_flow_statement"]["ending_cash_balance"][:, ends])
+        periods[granularity] = (statements, starts, ends, labels)
+    return validate_statements(batch.statements, batch.dates, periods, **options)
+
+def validate_portfolio(output_dir, **options):
+    """Validate every shard of a portfolio written by portfolio.generate_portfolio()."""
+    from portfolio import MANIFEST_FILE, load_shard
+
+    with open(os.path.join(output_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    report = None
+    for shard in manifest["shards"]:
+        shard_report = validate_batch(load_shard(os.path.join(output_dir, shard["file"])),
+                                      company_offset=shard["first_company"], **options)
+        report = shard_report if report is None else report.merge(shard_report)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the accounting integrity of statements.")
+    parser.add_argument("path", nargs="?", default="data/store",
+                        help="a columnar store, a portfolio directory or a generate_all_data() JSON file")
+    parser.add_argument("--atol", type=float, default=0.005, help="absolute tolerance per rounded value")
+    parser.add_argument("--rtol", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    options = {"atol": args.atol, "rtol": args.rtol}
+    if os.path.isfile(args.path):
+        with open(args.path) as f:
+            report = validate_financial_data(json.load(f), **options)
+    elif os.path.exists(os.path.join(args.path, "portfolio.json")):
+        report = validate_portfolio(args.path, **options)
+    else:
+        from columnar_store import ColumnarStore
+        report = validate_store(ColumnarStore(args.path), **options)
+    elapsed = time.perf_counter() - start
+
+    for example in report.examples:
+        print(f"{example['check']}: company {example['company']} {example['period']}: "
+              f"{example['actual']} != {example['expected']} (off by {example['difference']:.4f}, "
+              f"tolerance {example['tolerance']:.4f})")
+    print(f"{sum(report.checked.values())} values checked in {elapsed:.2f}s, {report.total_violations} violations")
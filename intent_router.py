@@ -0,0 +1,162 @@
+"""
+Keyword intent router for chat messages.
+
+All phrases of all intents are compiled into one trie-shaped regex, so a message is
+classified in a single left-to-right pass whose cost depends on the message length
+rather than on the number of intents. Matching ignores case and accents and a phrase
+also matches longer forms of a word ("expense" matches "expenses"). Phrases of up to
+SHORT_PHRASE_LENGTH characters match whole words and their plurals only, so "caja"
+matches "cajas" but not "cajero".
+
+    python intent_router.py --intents 500 --messages 20000
+"""
+import re
+import time
+import random
+import argparse
+import unicodedata
+from collections import namedtuple
+
+# Phrases per intent with their weight; Spanish synonyms are written without accents.
+# The order of the intents breaks ties between equal scores.
+INTENT_RULES = {
+    "cash_flow": {
+        "cashflow": 2, "cash flow": 2, "liquidity": 2, "working capital": 2,
+        "flujo de caja": 2, "flujo de efectivo": 2, "liquidez": 2, "capital de trabajo": 2,
+        "tesoreria": 1, "efectivo": 1, "caja": 1
+    },
+    "expenses": {
+        "expense": 2, "spending": 2, "spend": 1, "overhead": 1,
+        "gasto": 2, "egreso": 2, "costo": 1, "coste": 1
+    },
+    "forecast": {
+        "forecast": 2, "predict": 2, "projection": 2, "outlook": 1, "future": 1,
+        "pronostico": 2, "prediccion": 2, "predecir": 2, "proyeccion": 2, "proyectar": 2,
+        "prevision": 2, "futuro": 1
+    }
+}
+
+SHORT_PHRASE_LENGTH = 4
+_PLURAL_SUFFIXES = ("", "s", "es")
+
+IntentMatch = namedtuple("IntentMatch", ["intent", "score", "terms"])
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_text(text):
+    """Case-fold, strip accents and reduce punctuation and whitespace to single spaces."""
+    text = text.casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", text).strip()
+
+def _trie_pattern(node):
+    """Regex for a character trie; longer continuations are tried first."""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+class IntentRouter:
+    """
+    Classifies messages against keyword rules. rules maps an intent to a list of
+    phrases or to a dict of phrase weights; an intent's score is the sum of the
+    weights of the distinct phrases found in the message.
+    """
+
+    def __init__(self, rules=INTENT_RULES):
+        self.intents = list(rules)
+        self._phrases = {}
+        trie = {}
+        for intent in self.intents:
+            weights = rules[intent]
+            if not isinstance(weights, dict):
+                weights = dict.fromkeys(weights, 1)
+            for phrase, weight in weights.items():
+                phrase = normalize_text(phrase)
+                self._phrases.setdefault(phrase, []).append((intent, weight))
+                node = trie
+                for char in phrase:
+                    node = node.setdefault(char, {})
+                node[""] = True
+        self._order = {intent: i for i, intent in enumerate(self.intents)}
+        self._pattern = re.compile(r"\b(" + _trie_pattern(trie) + r")(\w*)")
+
+    def match(self, message):
+        """Return an IntentMatch for every intent found in message, best first."""
+        found = {match.group(1) for match in self._pattern.finditer(normalize_text(message))
+                 if len(match.group(1)) > SHORT_PHRASE_LENGTH or match.group(2) in _PLURAL_SUFFIXES}
+        scores = {}
+        terms = {}
+        for phrase in found:
+            for intent, weight in self._phrases[phrase]:
+                scores[intent] = scores.get(intent, 0) + weight
+                terms.setdefault(intent, []).append(phrase)
+        return sorted((IntentMatch(intent, scores[intent], sorted(terms[intent])) for intent in scores),
+                      key=lambda match: (-match.score, self._order[match.intent]))
+
+    def intents_of(self, message):
+        """Set of the intents found in message."""
+        return {match.intent for match in self.match(message)}
+
+    def best(self, message, default=None):
+        """The highest scoring intent of message, or default if none matches."""
+        matches = self.match(message)
+        return matches[0].intent if matches else default
+
+def _naive_intents(rules, message):
+    # The lower()/substring scan the router replaces, one pass per intent
+    return {intent for intent, phrases in rules.items() if any(phrase in message.lower() for phrase in phrases)}
+
+def _synthetic_rules(n_intents, phrases_per_intent, rng):
+    def word():
+        return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9)))
+    rules = {f"intent_{i}": [word() for _ in range(phrases_per_intent)] for i in range(n_intents - len(INTENT_RULES))}
+    rules.update(INTENT_RULES)
+    return rules
+
+def benchmark(n_intents=500, n_messages=20000, phrases_per_intent=8, seed=0):
+    """Messages per second of the router and of a naive substring scan over the same rules."""
+    rng = random.Random(seed)
+    rules = _synthetic_rules(n_intents, phrases_per_intent, rng)
+    vocabulary = [phrase for phrases in rules.values() for phrase in phrases]
+    filler = ["how", "can", "I", "improve", "my", "business", "this", "month", "¿Cómo", "está", "mi", "negocio?"]
+    messages = [" ".join(rng.choice(vocabulary) if rng.random() < 0.2 else rng.choice(filler)
+                         for _ in range(rng.randint(5, 25))) for _ in range(n_messages)]
+
+    start = time.perf_counter()
+    router = IntentRouter(rules)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for message in messages:
+        router.match(message)
+    router_time = time.perf_counter() - start
+
+    naive_messages = messages[:max(1, n_messages // 10)]
+    start = time.perf_counter()
+    for message in naive_messages:
+        _naive_intents(rules, message)
+    naive_time = time.perf_counter() - start
+
+    return {
+        "intents": len(rules),
+        "phrases": len(vocabulary),
+        "compile_seconds": round(compile_time, 4),
+        "router_messages_per_second": round(n_messages / router_time),
+        "naive_messages_per_second": round(len(naive_messages) / naive_time)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the intent router against a naive substring scan.")
+    parser.add_argument("--intents", type=int, nargs="+", default=[3, 50, 500])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--phrases-per-intent", type=int, default=8)
+    args = parser.parse_args()
+
+    for n_intents in args.intents:
+        print(benchmark(max(n_intents, len(INTENT_RULES)), args.messages, args.phrases_per_intent))
@@ -0,0 +1,253 @@
+import datetime
+
+import numpy as np
+
+from financial_data_model import INVESTMENT_DESCRIPTIONS
+
+REQUEST_DATE_FORMAT = "%b %d, %Y"
+# Timeframes are scored against one year, in weeks
+MAX_TIMEFRAME = 52
+
+# Weight of each normalized feature in the score; every feature is in [0, 1], higher is better
+DEFAULT_WEIGHTS = {"customer_credit": 0.5, "default_risk": 0.3, "timeframe": 0.2}
+FEATURES = ("customer_credit", "default_risk", "timeframe", "amount")
+INDEXED_COLUMNS = ("customer_credit", "timeframe", "default_risk")
+
+_COLUMNS = {
+    "id": np.int64,
+    "description": np.int16,
+    "request_date": "datetime64[D]",
+    "timeframe": np.int16,
+    "customer_credit": np.int16,
+    "default_risk": np.bool_,
+    "amount": np.float64
+}
+
+def parse_weights(text):
+    """Parse "customer_credit:0.7,timeframe:0.3" into a weights dict."""
+    weights = {}
+    for item in text.split(","):
+        feature, _, weight = item.partition(":")
+        try:
+            weights[feature.strip()] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight: {item}, expected feature:weight")
+    return weights
+
+def _features(columns):
+    """Normalized feature columns of a batch of options."""
+    return {
+        "customer_credit": columns["customer_credit"] / 100.0,
+        "default_risk": np.where(columns["default_risk"], 0.0, 1.0),
+        "timeframe": 1.0 - np.minimum(columns["timeframe"], MAX_TIMEFRAME) / MAX_TIMEFRAME,
+        # Larger tickets rank higher; amounts are scored on a log scale up to $1M
+        "amount": np.clip(np.log10(np.maximum(columns["amount"], 1.0)) / 6.0, 0.0, 1.0)
+    }
+
+class _RowList:
+    """Growable array of row numbers with amortized O(1) appends."""
+
+    def __init__(self):
+        self._rows = np.empty(16, dtype=np.int64)
+        self.size = 0
+
+    def extend(self, rows):
+        if self.size + len(rows) > len(self._rows):
+            grown = np.empty(max(self.size + len(rows), len(self._rows) * 2), dtype=np.int64)
+            grown[:self.size] = self._rows[:self.size]
+            self._rows = grown
+        self._rows[self.size:self.size + len(rows)] = rows
+        self.size += len(rows)
+
+    @property
+    def rows(self):
+        return self._rows[:self.size]
+
+class InvestmentRanker:
+    """
+    Ranks investment options by a weighted score over normalized features.
+
+    Options are stored in growable numpy columns. customer_credit, timeframe and
+    default_risk take few distinct values, so each is indexed by a row list per
+    value, which inserts extend in amortized O(1). A query starts from the index
+    whose matching lists are shortest, filters those candidates with vectorized masks
+    and selects the top k by partitioning instead of sorting every candidate.
+    """
+
+    def __init__(self, capacity=1024, weights=DEFAULT_WEIGHTS):
+        self.weights = self._check_weights(weights)
+        self.size = 0
+        self.descriptions = list(INVESTMENT_DESCRIPTIONS)
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._features = {name: np.empty(capacity, dtype=np.float64) for name in FEATURES}
+        self._indexes = {name: {} for name in INDEXED_COLUMNS}
+
+    @classmethod
+    def from_records(cls, options, **kwargs):
+        """Build a ranker from option dicts as found in financing_data["investment_options"]."""
+        ranker = cls(capacity=max(1024, len(options)), **kwargs)
+        ranker.add_many(options)
+        return ranker
+
+    @classmethod
+    def from_columns(cls, columns, **kwargs):
+        """Build a ranker from arrays, e.g. from ChileanSMEFinancialDataGenerator.generate_investment_options()."""
+        ranker = cls(capacity=max(1024, len(columns["id"])), **kwargs)
+        ranker.add_columns(columns)
+        return ranker
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def _check_weights(weights):
+        unknown = set(weights) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown score features: {', '.join(sorted(unknown))}, expected {', '.join(FEATURES)}")
+        if any(weight < 0 for weight in weights.values()):
+            raise ValueError("Score weights must not be negative")
+        return dict(weights)
+
+    def _reserve(self, n):
+        capacity = len(self._columns["id"])
+        if self.size + n <= capacity:
+            return
+        capacity = max(self.size + n, capacity * 2)
+        for arrays in (self._columns, self._features):
+            for name, column in arrays.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                arrays[name] = grown
+
+    def _description_code(self, description):
+        if description not in self.descriptions:
+            self.descriptions.append(description)
+        return self.descriptions.index(description)
+
+    def add(self, option):
+        """Insert one option."""
+        self.add_many([option])
+
+    def add_many(self, options):
+        """Insert option dicts."""
+        if not options:
+            return
+        self.add_columns({
+            "id": np.array([option["id"] for option in options], dtype=np.int64),
+            "description": np.array([self._description_code(option["description"]) for option in options], dtype=np.int16),
+            "request_date": np.array([datetime.datetime.strptime(option["request_date"], REQUEST_DATE_FORMAT).date()
+                                      for option in options], dtype="datetime64[D]"),
+            "timeframe": np.array([option["timeframe"] for option in options], dtype=np.int16),
+            "customer_credit": np.array([option["customer_credit"] for option in options], dtype=np.int16),
+            "default_risk": np.array([option["default_risk"] == "YES" for option in options], dtype=np.bool_),
+            "amount": np.array([option["amount"] for option in options], dtype=np.float64)
+        })
+
+    def add_columns(self, columns):
+        """Insert options given as one array per column, merging them into the indexes."""
+        n = len(columns["id"])
+        if not n:
+            return
+        start = self.size
+        self._reserve(n)
+        new = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in _COLUMNS.items()}
+        for name, values in new.items():
+            self._columns[name][start:start + n] = values
+        for name, values in _features(new).items():
+            self._features[name][start:start + n] = values
+        self.size += n
+
+        rows = np.arange(start, self.size, dtype=np.int64)
+        for name in INDEXED_COLUMNS:
+            index = self._indexes[name]
+            for value in np.unique(new[name]).tolist():
+                index.setdefault(value, _RowList()).extend(rows[new[name] == value])
+
+    def _candidates(self, filters):
+        """Rows matching the filters, read from the most selective index and masked by the others."""
+        best = None
+        for name, (low, high) in filters.items():
+            lists = [row_list for value, row_list in self._indexes[name].items() if low <= value <= high]
+            count = sum(row_list.size for row_list in lists)
+            if best is None or count < best[0]:
+                best = (count, name, lists)
+        if best is None:
+            return np.arange(self.size)
+        _, used, lists = best
+        rows = np.concatenate([row_list.rows for row_list in lists]) if lists else np.empty(0, dtype=np.int64)
+
+        mask = np.ones(len(rows), dtype=bool)
+        for name, (low, high) in filters.items():
+            if name != used:
+                values = self._columns[name][rows]
+                mask &= (values >= low) & (values <= high)
+        return rows[mask]
+
+    def top(self, k=20, offset=0, min_credit=None, max_credit=None, default_risk=None,
+            min_timeframe=None, max_timeframe=None, weights=None):
+        """
+        Return the options ranked offset to offset + k by score among those matching the
+        filters, with their scores and the number of matches. default_risk is a boolean
+        or "YES"/"NO"; weights override the ranker's weights for this query. Equal scores
+        are ordered by id, so pages are stable.
+        """
+        if k < 1 or offset < 0:
+            raise ValueError("k must be positive and offset must not be negative")
+        weights = self.weights if weights is None else self._check_weights(weights)
+        if isinstance(default_risk, str):
+            if default_risk.upper() not in ("YES", "NO"):
+                raise ValueError("default_risk must be YES or NO")
+            default_risk = default_risk.upper() == "YES"
+
+        # Every filter becomes an inclusive range on an indexed column
+        filters = {}
+        if min_credit is not None or max_credit is not None:
+            filters["customer_credit"] = (-np.inf if min_credit is None else min_credit,
+                                          np.inf if max_credit is None else max_credit)
+        if min_timeframe is not None or max_timeframe is not None:
+            filters["timeframe"] = (-np.inf if min_timeframe is None else min_timeframe,
+                                    np.inf if max_timeframe is None else max_timeframe)
+        if default_risk is not None:
+            filters["default_risk"] = (default_risk, default_risk)
+
+        rows = self._candidates(filters)
+        total = len(rows)
+        scores = np.zeros(total)
+        for feature, weight in weights.items():
+            if weight:
+                scores += weight * self._features[feature][rows]
+
+        needed = offset + k
+        if needed < len(rows):
+            # Everything scoring at least the needed-th best score, ties at the boundary included
+            threshold = np.partition(scores, len(rows) - needed)[len(rows) - needed]
+            keep = scores >= threshold
+            rows, scores = rows[keep], scores[keep]
+        order = np.lexsort((self._columns["id"][rows], -scores))[offset:needed]
+        return {
+            "options": self.records(rows[order], scores[order]),
+            "total": total
+        }
+
+    def records(self, rows, scores=None):
+        """Option dicts for rows in the format of financing_data["investment_options"], plus their scores."""
+        columns = {name: column[rows].tolist() for name, column in self._columns.items() if name != "request_date"}
+        dates = self._columns["request_date"][rows]
+        distinct, inverse = np.unique(dates, return_inverse=True)
+        formatted = [value.astype(datetime.date).strftime(REQUEST_DATE_FORMAT) for value in distinct]
+        records = [{
+            "id": columns["id"][i],
+            "description": self.descriptions[columns["description"][i]],
+            "request_date": formatted[inverse[i]],
+            "timeframe": columns["timeframe"][i],
+            "customer_credit": columns["customer_credit"][i],
+            "default_risk": "YES" if columns["default_risk"][i] else "NO",
+            "amount": columns["amount"][i]
+        } for i in range(len(rows))]
+        if scores is not None:
+            for record, score in zip(records, scores.tolist()):
+                record["score"] = round(score, 4)
+        return records
+
+    def to_records(self):
+        return self.records(np.arange(self.size))
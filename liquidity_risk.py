@@ -0,0 +1,259 @@
+"""
+Monte Carlo liquidity at risk.
+
+Simulates forward monthly cash paths per company with the generator's cash-flow
+drivers: depreciation, working-capital retention, capex and dividend draws, and the
+receivable, inventory and payable ratios. Expected revenue comes from the seasonal
+forecast, with an optional lognormal revenue shock. Paths are simulated in chunks,
+each reduced to running counts, minima, sums and fixed-bin histograms before the next
+is drawn, so memory is bounded by the chunk size whatever the number of paths.
+Companies can be spread over a process pool.
+
+    python liquidity_risk.py data/store --paths 100000 --months 12 --workers 4
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from forecasting import SeasonalForecast
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+# Confidence of the liquidity at risk figure
+CONFIDENCE = 0.95
+# Chile's corporate tax rate, as in the generator
+DEFAULT_TAX_RATE = 0.27
+# Histogram bins per month for the percentiles, over the first chunk's range widened by HISTOGRAM_MARGIN of it each way
+HISTOGRAM_BINS = 4096
+HISTOGRAM_MARGIN = 0.5
+
+def _recent_mean(values, months=12):
+    return np.asarray(values[:, -months:], dtype=np.float64).mean(axis=1)
+
+def liquidity_inputs(column, forecast, months=12, tax_rate=DEFAULT_TAX_RATE):
+    """
+    Per-company simulation inputs from column(statement, field) (companies x months
+    arrays) and a SeasonalForecast of the same companies.
+    """
+    revenue = np.asarray(column("income_statement", "revenue"), dtype=np.float64)
+    cogs = np.asarray(column("income_statement", "cost_of_goods_sold"), dtype=np.float64)
+    opex = np.asarray(column("income_statement", "operating_expenses"), dtype=np.float64)
+    recent_revenue = _recent_mean(revenue)
+    return {
+        "cash": np.asarray(column("balance_sheet", "cash_and_equivalents"), dtype=np.float64)[:, -1],
+        "revenue": forecast.project(months)["revenue"],
+        "gross_margin": 1 - _recent_mean(cogs) / recent_revenue,
+        "opex_ratio": _recent_mean(opex) / recent_revenue,
+        "financial_expenses": np.asarray(column("income_statement", "financial_expenses"), dtype=np.float64)[:, -1],
+        "accounts_receivable": np.asarray(column("balance_sheet", "accounts_receivable"), dtype=np.float64)[:, -1],
+        "inventory": np.asarray(column("balance_sheet", "inventory"), dtype=np.float64)[:, -1],
+        "accounts_payable": np.asarray(column("balance_sheet", "accounts_payable"), dtype=np.float64)[:, -1],
+        "tax_rate": np.full(len(revenue), tax_rate)
+    }
+
+def inputs_from_store(store, months=12, tax_rate=DEFAULT_TAX_RATE, forecast=None):
+    """Simulation inputs for every company of a ColumnarStore, optionally with its already fitted forecast."""
+    return liquidity_inputs(lambda statement, field: store.column("monthly", statement, field),
+                            forecast or SeasonalForecast.from_store(store), months, tax_rate)
+
+def inputs_from_batch(batch, months=12, tax_rate=DEFAULT_TAX_RATE):
+    """Simulation inputs for every company of a StatementBatch."""
+    return liquidity_inputs(batch.column, SeasonalForecast.from_batch(batch), months, tax_rate)
+
+def _simulate_chunk(company, n_paths, rng, revenue_volatility, working_capital):
+    """Cash at the end of each month for n_paths paths of one company, shape (paths x months)."""
+    shape = (n_paths, len(company["revenue"]))
+
+    def draw(low, high):
+        return low + (high - low) * rng.random(shape)
+
+    revenue = np.broadcast_to(company["revenue"], shape)
+    if revenue_volatility:
+        revenue = revenue * np.exp(revenue_volatility * rng.standard_normal(shape) - revenue_volatility ** 2 / 2)
+    cogs = revenue * (1 - company["gross_margin"])
+    depreciation = revenue * draw(0.03, 0.07)
+    ebt = revenue - cogs - revenue * company["opex_ratio"] - depreciation - company["financial_expenses"]
+    net_income = ebt - np.maximum(0, ebt * company["tax_rate"])
+
+    cash_from_operations = net_income + depreciation - net_income * draw(0, 0.3)
+    cash_from_investing = -depreciation * draw(0.5, 1.5)
+    cash_from_financing = -net_income * draw(0, 0.2)
+    net_cash_change = cash_from_operations + cash_from_investing + cash_from_financing
+
+    if working_capital:
+        # Cash tied up by changes in receivables and inventory, released by payables
+        balances = revenue * draw(0.5, 0.7) + cogs * draw(0.3, 0.5) - cogs * draw(0.4, 0.6)
+        opening = company["accounts_receivable"] + company["inventory"] - company["accounts_payable"]
+        net_cash_change -= np.diff(balances, axis=1, prepend=np.full((n_paths, 1), opening))
+
+    return company["cash"] + np.cumsum(net_cash_change, axis=1)
+
+class StreamingQuantiles:
+    """
+    Approximate quantiles of each column of (rows x columns) chunks, from fixed-bin
+    histograms over [low, high] per column. Values outside the range are counted in an
+    underflow and an overflow bin bounded by the exact minimum and maximum seen.
+    """
+
+    def __init__(self, low, high, bins=HISTOGRAM_BINS):
+        self.low = np.asarray(low, dtype=np.float64)
+        self.width = np.maximum(np.asarray(high, dtype=np.float64) - self.low, 1e-9) / bins
+        self.bins = bins
+        self.counts = np.zeros((len(self.low), bins + 2), dtype=np.int64)
+        self.minimum = np.full(len(self.low), np.inf)
+        self.maximum = np.full(len(self.low), -np.inf)
+        self.n = 0
+
+    def add(self, values):
+        # Bin 0 is the underflow and bin bins + 1 the overflow; one bincount covers every column
+        bins = np.clip(np.floor((values - self.low) / self.width) + 1, 0, self.bins + 1).astype(np.int64)
+        bins += np.arange(len(self.low)) * (self.bins + 2)
+        self.counts += np.bincount(bins.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        self.minimum = np.minimum(self.minimum, values.min(axis=0))
+        self.maximum = np.maximum(self.maximum, values.max(axis=0))
+        self.n += len(values)
+
+    def quantiles(self, q):
+        """(len(q) x columns) quantiles, interpolated linearly within a bin."""
+        columns = np.arange(len(self.low))
+        inner = self.low[:, None] + self.width[:, None] * np.arange(self.bins + 1)
+        # Bin edges per column, the outer bins closed by the extremes seen
+        edges = np.column_stack([np.minimum(self.minimum, self.low), inner,
+                                 np.maximum(self.maximum, inner[:, -1])])
+        cumulative = np.cumsum(self.counts, axis=1)
+        result = np.empty((len(q), len(self.low)))
+        for i, fraction in enumerate(q):
+            rank = fraction * self.n
+            bins = np.minimum((cumulative < rank).sum(axis=1), self.bins + 1)
+            before = np.where(bins > 0, cumulative[columns, bins - 1], 0)
+            inside = (rank - before) / np.maximum(self.counts[columns, bins], 1)
+            low, high = edges[columns, bins], edges[columns, bins + 1]
+            result[i] = np.clip(low + inside * (high - low), self.minimum, self.maximum)
+        return result
+
+def _histogram(values):
+    """StreamingQuantiles over the range of a first chunk, widened for the chunks to come."""
+    low, high = values.min(axis=0), values.max(axis=0)
+    margin = (high - low) * HISTOGRAM_MARGIN
+    return StreamingQuantiles(low - margin, high + margin)
+
+def simulate_company(company, n_paths=100_000, chunk_paths=25_000, seed=None, index=0,
+                     revenue_volatility=0.05, working_capital=True):
+    """
+    Simulate n_paths cash paths of one company (a dict of scalar inputs and its
+    revenue path) and reduce them to liquidity statistics. Chunk k draws from
+    SeedSequence(seed, spawn_key=(index, k)), so results do not depend on workers.
+    Each chunk is reduced before the next one is drawn; percentiles come from histograms
+    with HISTOGRAM_BINS bins per month, so they are accurate to a small fraction of the
+    spread of the paths.
+    """
+    months = len(company["revenue"])
+    cash_sum = np.zeros(months)
+    negative_by_month = np.zeros(months, dtype=np.int64)
+    negative_paths = 0
+    monthly = minimum = None
+    for k, start in enumerate(range(0, n_paths, chunk_paths)):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index, k)))
+        stop = min(start + chunk_paths, n_paths)
+        cash = _simulate_chunk(company, stop - start, rng, revenue_volatility, working_capital)
+        path_minimum = cash.min(axis=1, keepdims=True)
+        if monthly is None:
+            monthly, minimum = _histogram(cash), _histogram(path_minimum)
+        monthly.add(cash)
+        minimum.add(path_minimum)
+        cash_sum += cash.sum(axis=0)
+        negative_by_month += (cash < 0).sum(axis=0)
+        negative_paths += int((path_minimum < 0).sum())
+
+    tail = monthly.quantiles([1 - CONFIDENCE])[0]
+    return {
+        "cash_percentiles": monthly.quantiles([p / 100 for p in PERCENTILES]),
+        "min_cash_by_month": monthly.minimum,
+        "negative_probability_by_month": negative_by_month / n_paths,
+        "negative_probability": negative_paths / n_paths,
+        # Lowest cash balance reached over the horizon, at the given confidence
+        "worst_cash": float(minimum.quantiles([1 - CONFIDENCE])[0, 0]),
+        # Largest shortfall of cash against its expected path, at the given confidence
+        "liquidity_at_risk": float(np.max(cash_sum / n_paths - tail))
+    }
+
+def _simulate_companies(inputs, indices, n_paths, chunk_paths, seed, revenue_volatility, working_capital):
+    """Simulate rows of inputs; indices are the companies' positions in the full batch, which pick their seeds."""
+    return [simulate_company({name: values[row] for name, values in inputs.items()}, n_paths, chunk_paths,
+                             seed, index, revenue_volatility, working_capital)
+            for row, index in enumerate(indices)]
+
+class LiquidityRisk:
+    """Liquidity statistics of a batch of companies, as arrays with one row per company."""
+
+    def __init__(self, results, starting_cash, n_paths):
+        self.n_paths = n_paths
+        self.starting_cash = starting_cash
+        self.stats = {name: np.array([result[name] for result in results]) for name in results[0]}
+
+    def summary(self, company=0):
+        """JSON-ready liquidity statistics of one company."""
+        stats = {name: values[company] for name, values in self.stats.items()}
+        return {
+            "paths": self.n_paths,
+            "confidence": CONFIDENCE,
+            "starting_cash": round(float(self.starting_cash[company]), 2),
+            "liquidity_at_risk": round(float(stats["liquidity_at_risk"]), 2),
+            "worst_cash": round(float(stats["worst_cash"]), 2),
+            "negative_probability": round(float(stats["negative_probability"]), 4),
+            "ending_cash_percentiles": {str(p): round(float(value), 2)
+                                        for p, value in zip(PERCENTILES, stats["cash_percentiles"][:, -1])},
+            "by_month": {
+                "p5_cash": np.round(stats["cash_percentiles"][PERCENTILES.index(5)], 2).tolist(),
+                "median_cash": np.round(stats["cash_percentiles"][PERCENTILES.index(50)], 2).tolist(),
+                "min_cash": np.round(stats["min_cash_by_month"], 2).tolist(),
+                "negative_probability": np.round(stats["negative_probability_by_month"], 4).tolist()
+            }
+        }
+
+def simulate_liquidity(inputs, n_paths=100_000, chunk_paths=25_000, seed=None, workers=None,
+                       companies=None, revenue_volatility=0.05, working_capital=True):
+    """
+    Run the simulation for the given companies (all by default) of liquidity_inputs().
+    With workers > 1 companies are split over a process pool; the results are the
+    same for any number of workers.
+    """
+    if companies is None:
+        companies = range(len(inputs["cash"]))
+    companies = list(companies)
+    args = (n_paths, chunk_paths, seed, revenue_volatility, working_capital)
+    if workers and workers > 1 and len(companies) > 1:
+        groups = [companies[i::workers] for i in range(workers) if companies[i::workers]]
+        by_company = {}
+        with ProcessPoolExecutor(max_workers=len(groups)) as pool:
+            futures = [pool.submit(_simulate_companies, {name: values[group] for name, values in inputs.items()},
+                                   group, *args) for group in groups]
+            for group, future in zip(groups, futures):
+                by_company.update(zip(group, future.result()))
+        results = [by_company[company] for company in companies]
+    else:
+        results = _simulate_companies({name: values[companies] for name, values in inputs.items()}, companies, *args)
+    return LiquidityRisk(results, inputs["cash"][companies], n_paths)
+
+if __name__ == "__main__":
+    from columnar_store import ColumnarStore
+
+    parser = argparse.ArgumentParser(description="Monte Carlo liquidity at risk for the companies of a columnar store.")
+    parser.add_argument("store", nargs="?", default="data/store")
+    parser.add_argument("--paths", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--chunk-paths", type=int, default=25_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    risk = simulate_liquidity(inputs_from_store(ColumnarStore(args.store), args.months), args.paths,
+                              args.chunk_paths, args.seed, args.workers)
+    for company in range(len(risk.starting_cash)):
+        summary = risk.summary(company)
+        print(f"company {company}: cash {summary['starting_cash']}, liquidity at risk {summary['liquidity_at_risk']}, "
+              f"P(cash < 0) {summary['negative_probability']}")
+    print(f"{len(risk.starting_cash)} companies x {args.paths} paths in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,147 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+def normalize_message(message):
+    """Case-fold, collapse whitespace and drop trailing punctuation so trivially different phrasings share a key."""
+    return re.sub(r"\s+", " ", message.casefold()).strip().rstrip("?!. ")
+
+class LLMResponseCache:
+    """
+    Bounded LRU cache of LLM answers with a TTL, keyed on the normalized message, a hash
+    of the financial context and the tail of the chat history.
+
+    Concurrent identical requests are coalesced: the first caller computes the answer
+    and the others wait on its Future, so only one upstream call is in flight per key.
+    An owner that neither completes nor fails within in_flight_timeout seconds is given
+    up on: its waiters fail and the next caller becomes the owner.
+    """
+
+    def __init__(self, max_entries=1024, ttl=900, history_tail=4, in_flight_timeout=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.history_tail = history_tail
+        self.in_flight_timeout = in_flight_timeout
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.abandoned = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._context_hash = (None, None)
+
+    def _hash_context(self, context):
+        # The context snapshot hands out the same object until the data changes
+        last_context, last_hash = self._context_hash
+        if context is last_context:
+            return last_hash
+        digest = hashlib.sha256(json.dumps(context, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        self._context_hash = (context, digest)
+        return digest
+
+    def key(self, message, context, history=()):
+        """Build the cache key for a message asked against a context after a history."""
+        tail = tuple((entry.get("role"), normalize_message(entry.get("content", "")))
+                     for entry in list(history)[-self.history_tail:]) if self.history_tail else ()
+        return (normalize_message(message), self._hash_context(context), tail)
+
+    def lookup(self, key):
+        """
+        Return (answer, pending, owner). On a hit answer is the cached text. Otherwise, if
+        an identical request is in flight, pending is a Future resolving to its answer.
+        If both are None the caller owns the computation and must pass owner to complete()
+        or fail().
+        """
+        now = time.monotonic()
+        abandoned = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                answer, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return answer, None, None
+                del self._entries[key]
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                pending, deadline = in_flight
+                if deadline > now:
+                    self.coalesced += 1
+                    return None, pending, None
+                abandoned = pending
+                self.abandoned += 1
+            self.misses += 1
+            deadline = now + self.in_flight_timeout if self.in_flight_timeout is not None else float("inf")
+            owner = Future()
+            self._in_flight[key] = (owner, deadline)
+        if abandoned is not None:
+            abandoned.set_exception(TimeoutError("The request computing this answer was abandoned"))
+        return None, None, owner
+
+    def _release(self, key, owner):
+        """Remove key from the in-flight calls if owner still owns it (it may have been abandoned)."""
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None and in_flight[0] is owner:
+            del self._in_flight[key]
+            return True
+        return False
+
+    def complete(self, key, owner, answer):
+        """Store the answer computed by the owner of key and release its waiting callers."""
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            released = self._release(key, owner)
+        if released:
+            owner.set_result(answer)
+
+    def fail(self, key, owner, error):
+        """Release the callers waiting on owner without caching anything."""
+        with self._lock:
+            released = self._release(key, owner)
+        if released:
+            owner.set_exception(error)
+
+    def get_or_compute(self, key, compute, timeout=None):
+        """
+        Return the cached answer for key, waiting up to timeout seconds for an in-flight
+        call or running compute(). A waiter whose call times out or is abandoned runs
+        compute() itself.
+        """
+        answer, pending, owner = self.lookup(key)
+        if answer is not None:
+            return answer
+        if pending is not None:
+            try:
+                return pending.result(timeout)
+            except TimeoutError:
+                return compute()
+        try:
+            answer = compute()
+        except Exception as e:
+            self.fail(key, owner, e)
+            raise
+        self.complete(key, owner, answer)
+        return answer
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "abandoned": self.abandoned,
+                "entries": len(self._entries),
+                "in_flight": len(self._in_flight)
+            }
@@ -0,0 +1,122 @@
+import os
+import queue
+import asyncio
+import threading
+
+# Marks the end of a stream on the hand-off queue
+_DONE = object()
+
+class LLMBusyError(Exception):
+    """Raised when no upstream slot frees up within the acquire timeout."""
+
+class StreamingLLMClient:
+    """
+    Streams chat completions from an OpenAI-compatible API.
+
+    Each process runs one background event loop holding a single AsyncOpenAI client,
+    so HTTP connections are pooled across requests. A semaphore caps the number of
+    concurrent upstream calls per process. Request threads consume tokens through
+    stream(), a plain iterator that fits a Flask streaming response.
+    """
+
+    def __init__(self, api_key=None, base_url=None, model="gpt-4", max_concurrency=16,
+                 max_connections=32, timeout=60.0, connect_timeout=5.0, acquire_timeout=10.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.acquire_timeout = acquire_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+
+    @classmethod
+    def from_env(cls):
+        """Configure from OPENAI_API_KEY, OPENAI_BASE_URL and LLM_* environment variables."""
+        return cls(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            base_url=os.environ.get("OPENAI_BASE_URL"),
+            model=os.environ.get("LLM_MODEL", "gpt-4"),
+            max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 16)),
+            max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", 32)),
+            timeout=float(os.environ.get("LLM_TIMEOUT", 60)),
+            acquire_timeout=float(os.environ.get("LLM_ACQUIRE_TIMEOUT", 10))
+        )
+
+    @property
+    def configured(self):
+        """True when there is an upstream to call: a real API key or a custom base URL (e.g. the stub)."""
+        return bool(self.base_url) or (bool(self.api_key) and self.api_key != "your-api-key-here")
+
+    def _ensure_loop(self):
+        """Start the event loop thread and client on first use, and again after a fork."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self._create_client(), self._loop).result()
+            self._pid = os.getpid()
+
+    async def _create_client(self):
+        # Imported on first use: the SDK is slow to import and unused without an LLM
+        import httpx
+        from openai import AsyncOpenAI
+
+        # Created inside the loop so the connection pool belongs to it
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        )
+        self._client = AsyncOpenAI(api_key=self.api_key or "not-needed", base_url=self.base_url,
+                                   http_client=http_client, max_retries=0)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _produce(self, messages, tokens, params):
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.acquire_timeout)
+            except asyncio.TimeoutError:
+                raise LLMBusyError("Too many concurrent chat requests")
+            try:
+                stream = await self._client.chat.completions.create(
+                    model=self.model, messages=messages, stream=True, **params)
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        tokens.put(chunk.choices[0].delta.content)
+            finally:
+                self._semaphore.release()
+            tokens.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            tokens.put(e)
+
+    def stream(self, messages, temperature=0.7, max_tokens=500):
+        """
+        Yield the completion text chunk by chunk as it arrives. Upstream errors,
+        timeouts and LLMBusyError are raised from the iterator; closing the iterator
+        early (client went away) cancels the upstream call.
+        """
+        self._ensure_loop()
+        tokens = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._produce(messages, tokens, {"temperature": temperature, "max_tokens": max_tokens}),
+            self._loop)
+        try:
+            while True:
+                try:
+                    token = tokens.get(timeout=self.acquire_timeout + self.timeout)
+                except queue.Empty:
+                    raise TimeoutError("Timed out waiting for the LLM stream")
+                if token is _DONE:
+                    return
+                if isinstance(token, Exception):
+                    raise token
+                yield token
+        finally:
+            future.cancel()
@@ -0,0 +1,109 @@
+"""
+Local stand-in for the OpenAI chat completions API, for testing and load-testing the
+chat endpoints offline. Streams a canned answer token by token with a configurable
+time to first token and inter-token delay.
+
+    python llm_stub_server.py --port 8001
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 flask run
+"""
+import json
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_ANSWER = (
+    "Based on your latest figures, your cash position is healthy but receivables are high "
+    "relative to monthly revenue. Invoicing earlier and offering small early payment "
+    "discounts would shorten your cash conversion cycle and reduce short-term borrowing needs."
+)
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients can pool connections
+    first_token_delay = 0.2
+    token_delay = 0.02
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = body.get("model", "stub")
+        tokens = [word + " " for word in CANNED_ANSWER.split()]
+        tokens = tokens[:body.get("max_tokens") or len(tokens)]
+
+        if not body.get("stream"):
+            time.sleep(self.first_token_delay + self.token_delay * len(tokens))
+            self._send_json({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            time.sleep(self.first_token_delay)
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(self.token_delay)
+                self._send_chunk(model, {"content": token}, None)
+            self._send_chunk(model, {}, "stop")
+            # [DONE] and the terminating chunk go out together so the client can reuse the connection
+            self.wfile.write(self._encode_chunk(b"data: [DONE]\n\n") + self._encode_chunk(b""))
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. the request was cancelled
+            self.close_connection = True
+
+    def _send_chunk(self, model, delta, finish_reason):
+        chunk = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        self.wfile.write(self._encode_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8")))
+        self.wfile.flush()
+
+    @staticmethod
+    def _encode_chunk(data):
+        """Frame data for chunked transfer encoding."""
+        return f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n"
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def make_server(host="127.0.0.1", port=8001, first_token_delay=0.2, token_delay=0.02):
+    handler = type("ConfiguredStubLLMHandler", (StubLLMHandler,),
+                   {"first_token_delay": first_token_delay, "token_delay": token_delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stub of the OpenAI chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.first_token_delay, args.token_delay)
+    print(f"Stub LLM listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
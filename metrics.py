@@ -0,0 +1,211 @@
+"""
+Request instrumentation: latency and size histograms, Server-Timing headers and a
+Prometheus text endpoint.
+
+Each request is timed as a whole and split into phases (template render, JSON
+serialization, data loading, LLM calls) with phase(). Recording costs a few
+perf_counter() calls and a bisect per observation. Metrics are kept per process;
+with several gunicorn workers each worker reports its own.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request, before_render_template, template_rendered
+from flask.json.provider import DefaultJSONProvider
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Label of requests that matched no route, so unknown paths do not create new series
+UNMATCHED_ROUTE = "<unmatched>"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with one series per combination of label values."""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._series.get(label_values, 0)
+
+    def samples(self):
+        with self._lock:
+            series = dict(self._series)
+        for values, total in sorted(series.items()):
+            yield f"{self.name}{_label_text(self.labels, values)} {_number(total)}"
+
+class Histogram:
+    """
+    Histogram with fixed upper bounds per series. Observations increment one bucket;
+    counts are made cumulative only when rendered.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket..., count above the last bucket, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        """Observe the seconds spent in the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = {values: list(counts) for values, counts in self._series.items()}
+        for values, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{_number(float(bound))}"'
+                yield f"{self.name}_bucket{_label_text(self.labels, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.labels, values)} {_number(float(counts[-1]))}"
+            yield f"{self.name}_count{_label_text(self.labels, values)} {cumulative}"
+
+class Metrics:
+    """Registry of metrics, rendered together in the Prometheus text format."""
+
+    def __init__(self, prefix="sme_"):
+        self.prefix = prefix
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(self.prefix + name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self.prefix + name, help_text, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+@contextmanager
+def phase(name):
+    """Add the seconds spent in the with block to the current request's timing of a phase."""
+    if not has_request_context() or "request_phases" not in g:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = g.request_phases
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing dumps() as the "serialize" phase (jsonify included)."""
+
+    def dumps(self, obj, **kwargs):
+        with phase("serialize"):
+            return super().dumps(obj, **kwargs)
+
+def _server_timing(phases, total):
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+def instrument(app, metrics, endpoint="/metrics"):
+    """
+    Time every request of app: latency by route, method and status, phase durations and
+    response sizes by route, a Server-Timing header, and the metrics served at endpoint.
+    Call it before registering other before_request hooks so they are timed too.
+    """
+    latency = metrics.histogram("http_request_duration_seconds", "Request latency.",
+                                ("route", "method", "status"))
+    phase_latency = metrics.histogram("http_request_phase_duration_seconds",
+                                      "Time spent per request in render, serialize and other phases.",
+                                      ("route", "phase"))
+    size = metrics.histogram("http_response_size_bytes", "Size of response bodies that are not streamed.",
+                             ("route",), SIZE_BUCKETS)
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.request_phases = {}
+
+    def start_render(sender, template, context, **extra):
+        if has_request_context():
+            g.render_start = time.perf_counter()
+
+    def end_render(sender, template, context, **extra):
+        if has_request_context() and "render_start" in g and "request_phases" in g:
+            phases = g.request_phases
+            phases["render"] = phases.get("render", 0.0) + time.perf_counter() - g.pop("render_start")
+
+    before_render_template.connect(start_render, app, weak=False)
+    template_rendered.connect(end_render, app, weak=False)
+
+    @app.after_request
+    def record_request(response):
+        if "request_start" not in g:
+            return response
+        total = time.perf_counter() - g.request_start
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+        latency.observe(total, route, request.method, str(response.status_code))
+        for name, seconds in g.request_phases.items():
+            phase_latency.observe(seconds, route, name)
+        if not response.is_streamed and response.content_length is not None:
+            size.observe(response.content_length, route)
+        response.headers["Server-Timing"] = _server_timing(g.request_phases, total)
+        return response
+
+    @app.route(endpoint)
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    return app
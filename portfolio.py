@@ -0,0 +1,116 @@
+import os
+import json
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from financial_data_model import ChileanSMEFinancialDataGenerator, StatementBatch, STATEMENT_FIELDS
+from integrity import validate_batch
+
+MANIFEST_FILE = "portfolio.json"
+
+def company_rngs(seed, start, stop):
+    """
+    Return one independent random generator per company in [start, stop).
+    Company i always gets the i-th child stream of the master seed, whatever shard it lands in.
+    """
+    return [np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i,)))
+            for i in range(start, stop)]
+
+def save_shard(path, batch):
+    """Write a StatementBatch to an uncompressed .npz file."""
+    arrays = {
+        "company_names": np.array(batch.company_names),
+        "dates": np.array([d.strftime("%Y-%m-%d") for d in batch.dates]),
+        "industry": np.array(batch.industry)
+    }
+    for name, values in batch.profiles.items():
+        arrays[f"profile/{name}"] = values
+    for statement, fields in STATEMENT_FIELDS.items():
+        for field in fields:
+            arrays[f"{statement}/{field}"] = batch.statements[statement][field]
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+def load_shard(path):
+    """Read a shard written by save_shard back into a StatementBatch."""
+    with np.load(path) as shard:
+        dates = [datetime.datetime.strptime(d, "%Y-%m-%d") for d in shard["dates"].tolist()]
+        profiles = {key.split("/", 1)[1]: shard[key] for key in shard.files if key.startswith("profile/")}
+        statements = {statement: {field: shard[f"{statement}/{field}"] for field in fields}
+                      for statement, fields in STATEMENT_FIELDS.items()}
+        return StatementBatch(shard["company_names"].tolist(), str(shard["industry"]), dates,
+                              statements, profiles)
+
+def _generate_shard(task):
+    """Generate, check and write one shard of companies; runs inside a pool worker."""
+    index, start, stop, seed, output_dir, months, start_date, industry = task
+    generator = ChileanSMEFinancialDataGenerator(industry=industry, start_date=start_date)
+    batch = generator.generate_batch(months=months, rng=company_rngs(seed, start, stop))
+    batch.company_names = [f"Company {i + 1:06d}" for i in range(start, stop)]
+
+    integrity = validate_batch(batch, company_offset=start).summary()
+
+    filename = f"shard-{index:05d}.npz"
+    save_shard(os.path.join(output_dir, filename), batch)
+    return {"file": filename, "first_company": start, "n_companies": stop - start,
+            "violations": integrity["violations"], "violation_examples": integrity["examples"]}
+
+def generate_portfolio(n_companies, seed, output_dir, workers=None, shard_size=1000,
+                       months=24, start_date="2023-01-01", industry="Technology"):
+    """
+    Generate n_companies companies across a process pool, one .npz shard per task.
+
+    Shard boundaries and per-company seed streams depend only on seed and shard_size,
+    so the files are byte-identical for any number of workers. A portfolio.json
+    manifest listing the shards, with the integrity violations found in each, is written
+    next to them and returned.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(index, start, min(start + shard_size, n_companies), seed, output_dir,
+              months, start_date, industry)
+             for index, start in enumerate(range(0, n_companies, shard_size))]
+
+    if workers == 1:
+        shards = [_generate_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_generate_shard, tasks))
+
+    manifest = {
+        "seed": seed,
+        "n_companies": n_companies,
+        "months": months,
+        "start_date": start_date,
+        "industry": industry,
+        "shard_size": shard_size,
+        "violations": sum(sum(shard["violations"].values()) for shard in shards),
+        "shards": shards
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def iter_portfolio(output_dir):
+    """Yield the StatementBatch of each shard of a generated portfolio, in company order."""
+    with open(os.path.join(output_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    for shard in manifest["shards"]:
+        yield load_shard(os.path.join(output_dir, shard["file"]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a reproducible multi-company portfolio.")
+    parser.add_argument("n_companies", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default="data/portfolio")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=1000)
+    parser.add_argument("--months", type=int, default=24)
+    args = parser.parse_args()
+
+    manifest = generate_portfolio(args.n_companies, args.seed, args.output_dir, workers=args.workers,
+                                  shard_size=args.shard_size, months=args.months)
+    print(f"Generated {manifest['n_companies']} companies in {len(manifest['shards'])} shards, "
+          f"{manifest['violations']} integrity violations")
@@ -0,0 +1,261 @@
+"""
+Vectorized financial ratios defined as expressions.
+
+A ratio is an arithmetic expression over statement line items, e.g.
+"accounts_receivable / revenue * days". Expressions are parsed and compiled once,
+then evaluated on whole (companies x periods) arrays. Division yields NaN where the
+denominator is not positive, so invalid ratios are NaN with a matching validity mask
+instead of "N/A" strings. A ratio may use the ratios defined before it, and "days" is
+the length of each period.
+"""
+import ast
+
+import numpy as np
+
+# The financial_ratios block of the statements, in STATEMENT_FIELDS order
+FINANCIAL_RATIOS = {
+    "current_ratio": "total_current_assets / total_current_liabilities",
+    "quick_ratio": "(total_current_assets - inventory) / total_current_liabilities",
+    "debt_to_equity": "total_liabilities / total_equity",
+    "return_on_assets": "net_income / total_assets * 100",
+    "return_on_equity": "net_income / total_equity * 100",
+    "profit_margin": "net_income / revenue * 100",
+    "inventory_turnover": "cost_of_goods_sold / inventory"
+}
+
+# Working-capital cycle and debt service, in days and times covered
+WORKING_CAPITAL_RATIOS = {
+    "days_sales_outstanding": "accounts_receivable / revenue * days",
+    "days_inventory_outstanding": "inventory / cost_of_goods_sold * days",
+    "days_payables_outstanding": "accounts_payable / cost_of_goods_sold * days",
+    "cash_conversion_cycle": "days_sales_outstanding + days_inventory_outstanding - days_payables_outstanding",
+    "interest_coverage": "ebit / financial_expenses"
+}
+
+def _divide(numerator, denominator):
+    """Divide where the denominator is positive, NaN elsewhere."""
+    numerator = np.asarray(numerator)
+    denominator = np.asarray(denominator)
+    dtype = np.result_type(numerator, denominator, np.float32)
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan, dtype=dtype)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+_FUNCTIONS = {"_divide": _divide, "abs": np.abs, "min": np.minimum, "max": np.maximum}
+_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.USub, ast.UAdd)
+
+class _SafeDivision(ast.NodeTransformer):
+    """Rewrite a / b as _divide(a, b)."""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Div):
+            return ast.copy_location(ast.Call(ast.Name("_divide", ast.Load()), [node.left, node.right], []), node)
+        return node
+
+def compile_ratio(name, expression):
+    """
+    Parse and compile one ratio expression. Returns (code, names), where names are the
+    line items and ratios it reads. Only numbers, names, + - * /, and abs/min/max are allowed.
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression for ratio {name}: {e.msg}")
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+                raise ValueError(f"Ratio {name} may only call abs, min and max")
+        elif isinstance(node, ast.Name):
+            if node.id not in _FUNCTIONS and node.id not in names:
+                names.append(node.id)
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+                raise ValueError(f"Ratio {name} may only use numeric constants")
+        elif not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Load) + _OPERATORS):
+            raise ValueError(f"Unsupported syntax in ratio {name}: {type(node).__name__}")
+    tree = ast.fix_missing_locations(_SafeDivision().visit(tree))
+    return compile(tree, f"<ratio {name}>", "eval"), names
+
+class RatioTable:
+    """Ratio values as float arrays, NaN where a ratio is undefined, with their validity masks."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    @property
+    def valid(self):
+        return {name: ~np.isnan(values) for name, values in self.values.items()}
+
+class RatioEngine:
+    """
+    Compiled ratio definitions, evaluated in the order they were registered.
+    definitions maps ratio names to expressions.
+    """
+
+    def __init__(self, definitions=FINANCIAL_RATIOS):
+        self._ratios = {}
+        for name, expression in definitions.items():
+            self.register(name, expression)
+
+    def register(self, name, expression):
+        """Compile and add a ratio; it may use the line items, days, and the ratios already registered."""
+        if not name.isidentifier():
+            raise ValueError(f"Ratio names must be identifiers: {name!r}")
+        code, names = compile_ratio(name, expression)
+        if name in names:
+            raise ValueError(f"Ratio {name} refers to itself")
+        self._ratios[name] = (expression, code, names)
+
+    @property
+    def names(self):
+        return list(self._ratios)
+
+    @property
+    def inputs(self):
+        """Line items (and days) read by the ratios, i.e. every name that is not a ratio."""
+        inputs = []
+        for _, _, names in self._ratios.values():
+            inputs.extend(name for name in names if name not in self._ratios and name not in inputs)
+        return inputs
+
+    def needs_days(self):
+        return "days" in self.inputs
+
+    def evaluate(self, columns, names=None):
+        """
+        Evaluate ratios over columns, a mapping of line item (and days) to arrays of any
+        common shape. names restricts the result to some ratios; the ratios they use are
+        evaluated too. Returns a RatioTable.
+        """
+        wanted = self.names if names is None else list(names)
+        unknown = [name for name in wanted if name not in self._ratios]
+        if unknown:
+            raise ValueError(f"Unknown ratios: {', '.join(unknown)}")
+
+        # The wanted ratios and, transitively, the ratios they use
+        needed = set(wanted)
+        for ratio in reversed(self.names):
+            if ratio in needed:
+                needed.update(item for item in self._ratios[ratio][2] if item in self._ratios)
+
+        namespace = {}
+        for name, (_, code, used) in self._ratios.items():
+            if name not in needed:
+                continue
+            absent = [item for item in used if item not in columns and item not in self._ratios]
+            if absent:
+                raise ValueError(f"Ratio {name} uses unknown line items: {', '.join(absent)}")
+            for item in used:
+                if item not in namespace:
+                    namespace[item] = columns[item]
+            values = np.asarray(eval(code, {"__builtins__": {}, **_FUNCTIONS}, namespace))
+            namespace[name] = values if values.dtype.kind == "f" else values.astype(np.float64)
+        return RatioTable({name: namespace[name] for name in wanted})
+
+def period_days(dates, months=1):
+    """Number of days in each period of the given length in months starting at dates."""
+    starts = np.asarray(dates, dtype="datetime64[M]")
+    return ((starts + months).astype("datetime64[D]") - starts.astype("datetime64[D]")).astype(np.float64)
+
+class IncrementalRatios:
+    """
+    Keeps the ratios of a growing or changing set of statements up to date.
+
+    update() compares the new inputs with a copy of the previous ones and evaluates the
+    ratios only for the periods (columns) where some input changed or was added.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._inputs = None
+        self._values = None
+        self.last_recomputed = 0
+
+    def _changed(self, inputs, shape, periods):
+        """Indices of the periods to recompute, or None if everything must be."""
+        previous = self._inputs
+        if (previous is None or set(previous) != set(inputs) or set(self._values) != set(self.engine.names)
+                or any(values.shape[:-1] != shape[:-1] or values.shape[-1] > shape[-1] for values in previous.values())):
+            return None
+        n_old = next(iter(previous.values())).shape[-1]
+        if periods is not None:
+            return np.union1d(np.asarray(periods, dtype=np.int64), np.arange(n_old, shape[-1]))
+        dirty = np.zeros(shape[-1], dtype=bool)
+        dirty[n_old:] = True
+        for name, values in inputs.items():
+            old, new = previous[name], values[..., :n_old]
+            differs = old != new
+            # NaN never equals itself; an unchanged NaN is not a change
+            differs &= ~(np.isnan(old) & np.isnan(new))
+            dirty[:n_old] |= differs.reshape(-1, n_old).any(axis=0)
+        return np.flatnonzero(dirty)
+
+    def update(self, columns, periods=None):
+        """
+        Return the RatioTable for columns, a mapping of line item (and days) to
+        (companies x periods) arrays. periods optionally lists the periods known to have
+        changed, skipping the comparison with the previous inputs. The returned arrays
+        are updated in place by the next call.
+        """
+        inputs = {name: np.asarray(columns[name], dtype=np.float64) for name in self.engine.inputs if name in columns}
+        shape = np.broadcast_shapes(*(values.shape for values in inputs.values()))
+        inputs = {name: np.broadcast_to(values, shape) for name, values in inputs.items()}
+
+        changed = self._changed(inputs, shape, periods)
+        if changed is None:
+            self._inputs = {name: values.copy() for name, values in inputs.items()}
+            self._values = self.engine.evaluate(inputs).values
+            self.last_recomputed = shape[-1]
+            return RatioTable(self._values)
+
+        n_old = next(iter(self._inputs.values())).shape[-1]
+        if shape[-1] > n_old:
+            for arrays in (self._inputs, self._values):
+                for name, old in arrays.items():
+                    grown = np.empty(shape, dtype=old.dtype)
+                    grown[..., :n_old] = old
+                    arrays[name] = grown
+        if len(changed):
+            for name, values in inputs.items():
+                self._inputs[name][..., changed] = values[..., changed]
+            fresh = self.engine.evaluate({name: values[..., changed] for name, values in inputs.items()})
+            for name, values in fresh.values.items():
+                self._values[name][..., changed] = values
+        self.last_recomputed = len(changed)
+        return RatioTable(self._values)
+
+def statement_columns(statements):
+    """Flatten {statement: {field: array}} to {field: array}, leaving out computed ratios."""
+    return {field: values for statement, fields in statements.items() if statement != "financial_ratios"
+            for field, values in fields.items()}
+
+def store_ratio_inputs(store, granularity, engine):
+    """The columns of a ColumnarStore that the engine's ratios read, with days if they use it."""
+    from financial_data_model import STATEMENT_FIELDS
+
+    statement_of = {field: statement for statement, fields in STATEMENT_FIELDS.items()
+                    if statement != "financial_ratios" for field in fields}
+    columns = {name: store.column(granularity, statement_of[name], name)
+               for name in engine.inputs if name in statement_of}
+    if engine.needs_days():
+        # Days covered by each period, counted over the months it includes
+        months = store.period_index("monthly")
+        periods = np.searchsorted(store.period_index(granularity), months, "right") - 1
+        columns["days"] = np.bincount(periods, weights=period_days(months), minlength=store.n_periods(granularity))
+    return columns
+
+def store_ratios(store, granularity="monthly", engine=None, names=None):
+    """
+    Evaluate ratios over every company and period of a ColumnarStore, reading only the
+    line items they use.
+    """
+    engine = engine or RatioEngine()
+    return engine.evaluate(store_ratio_inputs(store, granularity, engine), names)
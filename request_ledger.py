@@ -0,0 +1,331 @@
+"""
+Persistent ledger of financing requests and their status transitions on SQLite.
+
+The database runs in WAL mode. Writes from every thread are queued to one writer
+thread, which commits everything queued since its previous commit as a single
+transaction (a group commit), so concurrent submissions share one sync to disk
+instead of paying one each. Reads go through a pool of read-only connections, which
+WAL lets run alongside the writer without blocking it.
+"""
+import math
+import queue
+import sqlite3
+import datetime
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+from financial_data_model import FINANCING_STATUSES as STATUSES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS financing_requests (
+    id INTEGER PRIMARY KEY,
+    company_id INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    status TEXT NOT NULL,
+    request_date TEXT NOT NULL,
+    purpose TEXT,
+    lending_type TEXT,
+    rate REAL,
+    duration_days INTEGER,
+    payments INTEGER,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS financing_requests_company_date ON financing_requests (company_id, request_date);
+CREATE INDEX IF NOT EXISTS financing_requests_company_status_date ON financing_requests (company_id, status, request_date);
+CREATE TABLE IF NOT EXISTS status_transitions (
+    id INTEGER PRIMARY KEY,
+    request_id INTEGER NOT NULL REFERENCES financing_requests (id),
+    from_status TEXT,
+    to_status TEXT NOT NULL,
+    changed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS status_transitions_request ON status_transitions (request_id);
+"""
+
+# Optional details of a request and their types; whole floats are accepted for the counts
+DETAIL_TYPES = {"purpose": str, "lending_type": str, "rate": float, "duration_days": int, "payments": int}
+DETAIL_FIELDS = tuple(DETAIL_TYPES)
+_COLUMNS = ("id", "company_id", "amount", "status", "request_date") + DETAIL_FIELDS + ("updated_at",)
+_INSERT = (f"INSERT INTO financing_requests ({', '.join(_COLUMNS[1:])}) "
+           f"VALUES ({', '.join('?' * (len(_COLUMNS) - 1))})")
+_INSERT_TRANSITION = "INSERT INTO status_transitions (request_id, from_status, to_status, changed_at) VALUES (?, ?, ?, ?)"
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+def _check_status(status):
+    if status not in STATUSES:
+        raise ValueError(f"Unknown status {status!r}, expected one of {', '.join(STATUSES)}")
+
+def _iso_date(value):
+    """Validate an ISO date (a string or a date) and return it as YYYY-MM-DD."""
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return datetime.date.fromisoformat(value).isoformat()
+
+def _detail_value(field, value):
+    """A detail value converted to its column's type; ValueError for values of another type."""
+    kind = DETAIL_TYPES[field]
+    if value is None:
+        return None
+    if kind is str:
+        if not isinstance(value, str):
+            raise ValueError(f"{field} must be a string")
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{field} must be a number")
+    if kind is int:
+        if value != int(value):
+            raise ValueError(f"{field} must be a whole number")
+        return int(value)
+    return float(value)
+
+def _request_row(company_id, amount, status, request_date, details, updated_at):
+    """Validated values of one financing_requests row, in _INSERT order."""
+    _check_status(status)
+    amount = float(amount)
+    if not (amount > 0 and math.isfinite(amount)):
+        raise ValueError("amount must be positive")
+    unknown = set(details) - set(DETAIL_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown request fields: {', '.join(sorted(unknown))}")
+    return (int(company_id), amount, status, _iso_date(request_date or datetime.date.today()),
+            *(_detail_value(field, details.get(field)) for field in DETAIL_FIELDS), updated_at)
+
+class RequestLedger:
+    """
+    Financing requests of every company in one SQLite database at path.
+
+    submit() and set_status() block until their group commit is durable (per the
+    synchronous pragma) and return its result; the *_async variants return a Future.
+    Queries use up to readers pooled read-only connections.
+    """
+
+    def __init__(self, path, readers=4, max_batch=1000, synchronous="NORMAL"):
+        self.path = path
+        self.max_batch = max_batch
+        self.commits = 0
+        self.operations = 0
+        self.largest_batch = 0
+        self._queue = queue.Queue()
+
+        writer = self._connect()
+        writer.execute("PRAGMA journal_mode=WAL")
+        writer.execute(f"PRAGMA synchronous={synchronous}")
+        writer.executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, args=(writer,), name="request-ledger-writer",
+                                        daemon=True)
+        self._writer.start()
+
+        self._readers = queue.LifoQueue()
+        for _ in range(readers):
+            reader = self._connect()
+            reader.execute("PRAGMA query_only=ON")
+            reader.row_factory = sqlite3.Row
+            self._readers.put(reader)
+
+    def _connect(self):
+        # Autocommit mode: transactions are begun explicitly; other processes' writers are waited for
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+
+    # --------------- Writes ---------------
+
+    def _write_loop(self, connection):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(item is None for item in batch)
+            batch = [item for item in batch if item is not None]
+            if batch:
+                self._commit(connection, batch)
+            if stop:
+                connection.close()
+                return
+
+    def _commit(self, connection, batch):
+        """
+        Run queued operations in one transaction, each in its own savepoint: one that
+        raises is rolled back to the savepoint, so it writes nothing and only its own
+        Future fails.
+        """
+        results = []
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            for operation, future in batch:
+                connection.execute("SAVEPOINT operation")
+                try:
+                    results.append((future, operation(connection), None))
+                except Exception as e:
+                    connection.execute("ROLLBACK TO operation")
+                    results.append((future, None, e))
+                connection.execute("RELEASE operation")
+            connection.execute("COMMIT")
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.commits += 1
+        self.operations += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _enqueue(self, operation):
+        if not self._writer.is_alive():
+            raise RuntimeError("The request ledger is closed")
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def submit_async(self, company_id, amount, status=STATUSES[0], request_date=None, **details):
+        """Queue a new financing request; the Future resolves to its id once committed."""
+        now = _now()
+        row = _request_row(company_id, amount, status, request_date, details, now)
+
+        def insert(connection):
+            request_id = connection.execute(_INSERT, row).lastrowid
+            connection.execute(_INSERT_TRANSITION, (request_id, None, status, now))
+            return request_id
+
+        return self._enqueue(insert)
+
+    def submit(self, company_id, amount, status=STATUSES[0], request_date=None, **details):
+        """Record a new financing request and return its id."""
+        return self.submit_async(company_id, amount, status, request_date, **details).result()
+
+    def add_many_async(self, company_id, requests):
+        """
+        Queue many requests (dicts with amount, status, request_date and optional details)
+        as one operation, e.g. to import a company's history; resolves to the number added.
+        """
+        now = _now()
+        rows = [_request_row(company_id, request["amount"], request.get("status", STATUSES[0]),
+                             request.get("request_date"),
+                             {field: request[field] for field in DETAIL_FIELDS if field in request}, now)
+                for request in requests]
+
+        def insert_many(connection):
+            first = connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM financing_requests").fetchone()[0]
+            connection.executemany(_INSERT, rows)
+            connection.executemany(_INSERT_TRANSITION, ((first + i, None, row[2], now) for i, row in enumerate(rows)))
+            return len(rows)
+
+        return self._enqueue(insert_many)
+
+    def add_many(self, company_id, requests):
+        return self.add_many_async(company_id, requests).result()
+
+    def set_status_async(self, request_id, status):
+        """Queue a status change; the Future resolves to the previous status, or raises KeyError for unknown ids."""
+        _check_status(status)
+        now = _now()
+
+        def update(connection):
+            row = connection.execute("SELECT status FROM financing_requests WHERE id = ?", (request_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown financing request {request_id}")
+            if row[0] != status:
+                connection.execute("UPDATE financing_requests SET status = ?, updated_at = ? WHERE id = ?",
+                                   (status, now, request_id))
+                connection.execute(_INSERT_TRANSITION, (request_id, row[0], status, now))
+            return row[0]
+
+        return self._enqueue(update)
+
+    def set_status(self, request_id, status):
+        """Change the status of a request, recording the transition; returns the previous status."""
+        return self.set_status_async(request_id, status).result()
+
+    # --------------- Reads ---------------
+
+    @contextmanager
+    def _reader(self):
+        connection = self._readers.get()
+        try:
+            yield connection
+        finally:
+            self._readers.put(connection)
+
+    def get(self, request_id):
+        """One request with its status transitions, oldest first, or None."""
+        with self._reader() as connection:
+            row = connection.execute(f"SELECT {', '.join(_COLUMNS)} FROM financing_requests WHERE id = ?",
+                                     (request_id,)).fetchone()
+            if row is None:
+                return None
+            transitions = connection.execute(
+                "SELECT from_status, to_status, changed_at FROM status_transitions WHERE request_id = ? ORDER BY id",
+                (request_id,)).fetchall()
+        request = dict(row)
+        request["transitions"] = [dict(transition) for transition in transitions]
+        return request
+
+    def query(self, company_id, status=None, start=None, end=None, limit=50, cursor=None):
+        """
+        A company's requests, newest request date first, optionally filtered by statuses
+        and an inclusive ISO date range. cursor is the next_cursor of the previous page.
+        """
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        where, params = ["company_id = ?"], [company_id]
+        if status:
+            for value in status:
+                _check_status(value)
+            where.append(f"status IN ({', '.join('?' * len(status))})")
+            params.extend(status)
+        if start:
+            where.append("request_date >= ?")
+            params.append(_iso_date(start))
+        if end:
+            where.append("request_date <= ?")
+            params.append(_iso_date(end))
+        if cursor:
+            try:
+                date, last_id = cursor.split(":")
+                params.extend([_iso_date(date), int(last_id)])
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            where.append("(request_date, id) < (?, ?)")
+
+        with self._reader() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM financing_requests WHERE {' AND '.join(where)} "
+                f"ORDER BY request_date DESC, id DESC LIMIT ?", (*params, limit + 1)).fetchall()
+        requests = [dict(row) for row in rows[:limit]]
+        return {
+            "requests": requests,
+            "next_cursor": f"{requests[-1]['request_date']}:{requests[-1]['id']}" if len(rows) > limit else None
+        }
+
+    def summary(self, company_id):
+        """Number and total amount of a company's requests per status."""
+        with self._reader() as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*), COALESCE(SUM(amount), 0) FROM financing_requests "
+                "WHERE company_id = ? GROUP BY status", (company_id,)).fetchall()
+        by_status = {status: {"count": 0, "amount": 0.0} for status in STATUSES}
+        for status, count, amount in rows:
+            by_status[status] = {"count": count, "amount": round(amount, 2)}
+        return by_status
+
+    def stats(self):
+        return {"commits": self.commits, "operations": self.operations, "largest_batch": self.largest_batch,
+                "queued": self._queue.qsize()}
+
+    def close(self):
+        """Commit what is queued, stop the writer and close every connection."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        while not self._readers.empty():
+            self._readers.get().close()
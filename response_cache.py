@@ -0,0 +1,84 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+# Bodies smaller than this are not worth compressing
+MIN_GZIP_SIZE = 1024
+
+class CachedResponse:
+    """A serialized response body with its gzip encoding and strong ETag."""
+
+    def __init__(self, body, mimetype="application/json"):
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=6) if len(body) >= MIN_GZIP_SIZE else None
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.mimetype = mimetype
+
+    @property
+    def size(self):
+        return len(self.body) + (len(self.gzip_body) if self.gzip_body else 0)
+
+    def to_response(self, request):
+        """Build a 200 or 304 response for a request, honouring If-None-Match and Accept-Encoding."""
+        use_gzip = self.gzip_body is not None and request.accept_encodings["gzip"] > 0
+        # Each encoding is a different representation, so it gets its own strong ETag
+        etag = f"{self.etag}-gzip" if use_gzip else self.etag
+
+        if_none_match = request.if_none_match
+        if if_none_match.star_tag or any(if_none_match.contains_weak(tag) for tag in (self.etag, f"{self.etag}-gzip")):
+            response = Response(status=304)
+        else:
+            response = Response(self.gzip_body if use_gzip else self.body, mimetype=self.mimetype)
+            if use_gzip:
+                response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        response.headers["Vary"] = "Accept-Encoding"
+        # Clients may keep the body but must revalidate, which is a cheap 304
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+class ResponseCache:
+    """
+    LRU cache of serialized responses keyed by (data version, key), bounded by total bytes.
+    A response is serialized and compressed once per data version instead of once per request.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, key, build, serialize):
+        """
+        Return the CachedResponse for key at version, calling build() and serialize()
+        on a miss. Exceptions from build() propagate and nothing is cached.
+        """
+        cache_key = (version, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = CachedResponse(serialize(build()).encode("utf-8"))
+        with self._lock:
+            if cache_key not in self._entries and entry.size <= self.max_bytes:
+                self._entries[cache_key] = entry
+                self.size += entry.size
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= evicted.size
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
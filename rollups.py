@@ -0,0 +1,129 @@
+import numpy as np
+
+from financial_data_model import STATEMENT_FIELDS, compute_financial_ratios, column_lists
+
+GRANULARITIES = ("quarter", "year", "fiscal_year", "ttm", "ytd")
+
+# Statements whose lines are flows over the period; the balance sheet holds stocks
+FLOW_STATEMENTS = ("income_statement", "cash_flow_statement")
+# Cash flow lines that are balances: opening takes the first month, closing the last
+OPENING_BALANCES = ("beginning_cash_balance",)
+CLOSING_BALANCES = ("ending_cash_balance",)
+
+class PeriodRollup:
+    """
+    Statements rolled up to one period granularity for a batch of companies.
+    statements[statement][field] is a (companies x periods) array; starts and ends
+    are the inclusive month indices of each period in the source batch.
+    """
+
+    def __init__(self, granularity, labels, starts, ends, dates, statements):
+        self.granularity = granularity
+        self.labels = labels
+        self.starts = starts
+        self.ends = ends
+        self.dates = dates
+        self.statements = statements
+
+    @property
+    def n_periods(self):
+        return len(self.labels)
+
+    def records(self, company=0):
+        """Build a list of period dicts for one company."""
+        rows = column_lists(self.statements, company)
+        records = []
+        for i, (start, end) in enumerate(zip(self.starts.tolist(), self.ends.tolist())):
+            end_date = self.dates[end]
+            record = {
+                "period": self.labels[i],
+                "date": self.dates[start].strftime("%Y-%m-%d"),
+                "end_date": end_date.strftime("%Y-%m-%d"),
+                "year": int(self.labels[i][2:]) if self.granularity == "fiscal_year" else end_date.year,
+                "months_included": [d.month for d in self.dates[start:end + 1]]
+            }
+            if self.granularity == "quarter":
+                record["quarter"] = (end_date.month - 1) // 3 + 1
+            for statement, fields in STATEMENT_FIELDS.items():
+                record[statement] = {field: rows[statement][field][i] for field in fields}
+            records.append(record)
+        return records
+
+def _group_bounds(keys):
+    """Return start and end indices of each run of equal consecutive keys."""
+    boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries - 1, [len(keys) - 1]))
+    return starts, ends
+
+def period_bounds(dates, granularity, fiscal_year_start=1):
+    """
+    Return (labels, starts, ends) of the periods of a granularity over consecutive months.
+    Fiscal years are labelled by the calendar year in which they end. Trailing-12-month
+    periods start at the first month with a full year of history.
+    """
+    years = np.array([d.year for d in dates])
+    months = np.array([d.month for d in dates])
+
+    if granularity == "quarter":
+        starts, ends = _group_bounds(years * 4 + (months - 1) // 3)
+        labels = [f"{dates[e].year}Q{(dates[e].month - 1) // 3 + 1}" for e in ends]
+    elif granularity == "year":
+        starts, ends = _group_bounds(years)
+        labels = [str(dates[e].year) for e in ends]
+    elif granularity == "fiscal_year":
+        if not 1 <= fiscal_year_start <= 12:
+            raise ValueError("fiscal_year_start must be a month between 1 and 12")
+        fiscal_years = years + (months >= fiscal_year_start) if fiscal_year_start > 1 else years
+        starts, ends = _group_bounds(fiscal_years)
+        labels = [f"FY{fiscal_years[e]}" for e in ends]
+    elif granularity == "ttm":
+        ends = np.arange(11, len(dates))
+        starts = ends - 11
+        labels = [f"TTM {dates[e]:%Y-%m}" for e in ends]
+    elif granularity == "ytd":
+        year_starts, year_ends = _group_bounds(years)
+        ends = np.arange(len(dates))
+        starts = np.repeat(year_starts, year_ends - year_starts + 1)
+        labels = [f"YTD {d:%Y-%m}" for d in dates]
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    return labels, starts, ends
+
+def rollup(batch, granularities=("quarter", "year"), fiscal_year_start=1):
+    """
+    Roll a StatementBatch up to several period granularities in one pass.
+
+    Each flow line is cumulatively summed once; every period total of every granularity
+    is then a difference of two cumulative sums. Balance sheet lines take the value of
+    the period's last month and ratios are recomputed from the period figures.
+    Returns a dict mapping granularity to PeriodRollup.
+    """
+    cumulative = {}
+    for statement in FLOW_STATEMENTS:
+        cumulative[statement] = {}
+        for field in STATEMENT_FIELDS[statement]:
+            if field in OPENING_BALANCES or field in CLOSING_BALANCES:
+                continue
+            values = batch.statements[statement][field]
+            totals = np.zeros((values.shape[0], values.shape[1] + 1), dtype=values.dtype)
+            np.cumsum(values, axis=1, out=totals[:, 1:])
+            cumulative[statement][field] = totals
+
+    rollups = {}
+    for granularity in granularities:
+        labels, starts, ends = period_bounds(batch.dates, granularity, fiscal_year_start)
+        statements = {
+            statement: {field: totals[:, ends + 1] - totals[:, starts] for field, totals in columns.items()}
+            for statement, columns in cumulative.items()
+        }
+        for field in OPENING_BALANCES:
+            statements["cash_flow_statement"][field] = batch.statements["cash_flow_statement"][field][:, starts]
+        for field in CLOSING_BALANCES:
+            statements["cash_flow_statement"][field] = batch.statements["cash_flow_statement"][field][:, ends]
+        statements["balance_sheet"] = {field: values[:, ends]
+                                       for field, values in batch.statements["balance_sheet"].items()}
+        statements["financial_ratios"] = compute_financial_ratios(statements["income_statement"],
+                                                                  statements["balance_sheet"])
+        rollups[granularity] = PeriodRollup(granularity, labels, starts, ends, batch.dates, statements)
+    return rollups
@@ -29,42 +29,86 @@ $(document).ready(function () {
         // Show typing indicator
         showTypingIndicator();
 
-        // Call the API
-        $.ajax({
-            url: '/api/chat',
-            type: 'POST',
-            contentType: 'application/json',
-            data: JSON.stringify({
-                message: message,
-                history: chatHistory.slice(-10) // Send last 10 messages for context
-            }),
-            success: function (response) {
-                // Remove typing indicator
-                removeTypingIndicator();
-
-                // Add AI response to chat
-                appendMessage('ai', response.text);
-
-                // Add to history
-                chatHistory.push({
-                    role: "assistant",
-                    content: response.text
-                });
-
-                // Display recommendations if any
-                if (response.recommendations && response.recommendations.length > 0) {
-                    displayRecommendations(response.recommendations);
-                }
-            },
-            error: function () {
-                // Remove typing indicator
-                removeTypingIndicator();
+        // Stream the answer from the API
+        streamChat(message, chatHistory.slice(-10)); // Send last 10 messages for context
+    });
+
+    async function streamChat(message, history) {
+        let messageElement = null;
+        let answer = '';
+
+        try {
+            // Ask about the company the page was opened for
+            const company = new URLSearchParams(window.location.search).get('company');
+            const url = company ? `/api/chat/stream?company=${encodeURIComponent(company)}` : '/api/chat/stream';
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ message: message, history: history })
+            });
+
+            if (!response.ok) {
+                const error = await response.json().catch(() => ({}));
+                throw new Error(error.text || "I'm sorry, I encountered an error processing your request. Please try again.");
+            }
 
-                // Show error message
-                appendMessage('ai', "I'm sorry, I encountered an error processing your request. Please try again.");
+            // Read Server-Sent Events as they arrive; events are separated by a blank line
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const event = parseEvent(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+
+                    if (event.type === 'done') {
+                        // Display recommendations if any
+                        if (event.data.recommendations && event.data.recommendations.length > 0) {
+                            displayRecommendations(event.data.recommendations);
+                        }
+                    } else if (event.type === 'error') {
+                        throw new Error(event.data.text);
+                    } else {
+                        // Replace the typing indicator with the answer on the first chunk
+                        if (!messageElement) {
+                            removeTypingIndicator();
+                            messageElement = appendMessage('ai', '');
+                        }
+                        answer += event.data.text;
+                        messageElement.text(answer);
+                        chatMessages.scrollTop(chatMessages[0].scrollHeight);
+                    }
+                }
             }
+        } catch (error) {
+            removeTypingIndicator();
+            appendMessage('ai', error.message);
+            return;
+        }
+
+        removeTypingIndicator();
+
+        // Add to history
+        chatHistory.push({
+            role: "assistant",
+            content: answer
         });
-    });
+    }
+
+    function parseEvent(block) {
+        const event = { type: 'message', data: {} };
+        block.split('\n').forEach(line => {
+            if (line.startsWith('event: ')) event.type = line.slice(7);
+            if (line.startsWith('data: ')) event.data = JSON.parse(line.slice(6));
+        });
+        return event;
+    }
 
     function appendMessage(sender, content) {
         const messageClass = sender === 'user' ? 'message user' : 'message ai';
@@ -80,6 +124,8 @@ $(document).ready(function () {
 
         // Scroll to bottom
         chatMessages.scrollTop(chatMessages[0].scrollHeight);
+
+        return chatMessages.find('.message-content p').last();
     }
 
     function showTypingIndicator() {
@@ -0,0 +1,152 @@
+"""
+Per-company data for serving many companies from one deployment.
+
+Each company (tenant) has its own on-disk shard: a columnar store plus its financing
+data and recommendations. TenantStore keeps the recently used tenants loaded in an
+LRU bounded by their approximate size in bytes, and loads the others on first use;
+concurrent requests for a cold tenant share one load.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from forecasting import ForecastService
+from context_snapshot import FinancialContextService
+
+class UnknownTenantError(LookupError):
+    """Raised for company ids that are not served."""
+
+def path_bytes(paths):
+    """Total size of the files at paths, walking directories; missing paths count as 0."""
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, files in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+def _array_bytes(obj):
+    """Bytes of the numpy arrays held in obj's attributes and their dicts."""
+    total = 0
+    for value in vars(obj).values():
+        for array in (value.values() if isinstance(value, dict) else (value,)):
+            if isinstance(array, np.ndarray):
+                total += array.nbytes
+    return total
+
+class Tenant:
+    """
+    The loaded data of one company: its statements, financing data and recommendations,
+    the contract ledger and investment ranking built on them, and the per-version
+    forecast and chat context. version identifies the shard files it was loaded from.
+    """
+
+    def __init__(self, company_id, version, financial_data, financing_data, ai_recommendations,
+                 financing_ledger, investment_ranker, files=()):
+        self.company_id = company_id
+        self.version = version
+        self.financial_data = financial_data
+        self.financing_data = financing_data
+        self.ai_recommendations = ai_recommendations
+        self.financing_ledger = financing_ledger
+        self.investment_ranker = investment_ranker
+        self.forecast_service = ForecastService(source=lambda: (self.version, self.financial_data.store))
+        self.context_service = FinancialContextService(
+            source=lambda: (self.version, self.financial_data, self.ai_recommendations))
+        # Approximate: the shard files (parsed JSON and touched store pages) plus the index arrays
+        self.nbytes = path_bytes(files) + _array_bytes(financing_ledger) + _array_bytes(investment_ranker)
+
+    @property
+    def name(self):
+        return self.financial_data["company_info"]["name"]
+
+class TenantStore:
+    """
+    LRU of loaded tenants bounded by their total nbytes. loader(company_id) loads a
+    tenant (or raises UnknownTenantError); a tenant larger than max_bytes is served
+    but not kept.
+    """
+
+    def __init__(self, loader, max_bytes=256 * 1024 * 1024):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self._tenants = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, company_id):
+        """Return the tenant of company_id, loading it if it is not in memory."""
+        with self._lock:
+            tenant = self._tenants.get(company_id)
+            if tenant is not None:
+                self._tenants.move_to_end(company_id)
+                self.hits += 1
+                return tenant
+            loading = self._loading.get(company_id)
+            owner = loading is None
+            if owner:
+                loading = self._loading[company_id] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            return loading.result()
+
+        start = time.perf_counter()
+        try:
+            tenant = self.loader(company_id)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[company_id]
+            loading.set_exception(e)
+            raise
+        with self._lock:
+            self.load_seconds += time.perf_counter() - start
+            del self._loading[company_id]
+            self._insert(company_id, tenant)
+        loading.set_result(tenant)
+        return tenant
+
+    def _insert(self, company_id, tenant):
+        if tenant.nbytes > self.max_bytes:
+            return
+        self._tenants[company_id] = tenant
+        self.size += tenant.nbytes
+        while self.size > self.max_bytes:
+            _, evicted = self._tenants.popitem(last=False)
+            self.size -= evicted.nbytes
+            self.evictions += 1
+
+    def loaded(self):
+        """The tenants in memory, least recently used first."""
+        with self._lock:
+            return list(self._tenants.values())
+
+    def discard(self, company_id):
+        """Drop a tenant from memory; it is reloaded on its next use."""
+        with self._lock:
+            tenant = self._tenants.pop(company_id, None)
+            if tenant is not None:
+                self.size -= tenant.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._tenants.clear()
+            self.size = 0
+
+    def stats(self):
+        return {"tenants": len(self._tenants), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "evictions": self.evictions, "load_seconds": round(self.load_seconds, 3)}
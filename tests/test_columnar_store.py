@@ -0,0 +1,124 @@
+import os
+import json
+
+import numpy as np
+import pytest
+
+from columnar_store import ColumnarStore, append_store, write_store, STATEMENT_FIELDS
+from financial_data_model import ChileanSMEFinancialDataGenerator, merge_appended_data
+from integrity import validate_store
+
+def stored_copy(data):
+    # generate_all_data() returns the generator's own lists, which append_months() extends
+    return json.loads(json.dumps(data))
+
+def assert_same_store(a, b):
+    assert a.manifest == b.manifest
+    for granularity in ("monthly", "quarterly", "yearly"):
+        for statement, fields in STATEMENT_FIELDS.items():
+            for field in fields:
+                np.testing.assert_allclose(a.column(granularity, statement, field),
+                                           b.column(granularity, statement, field), atol=1e-9)
+
+def assert_close(expected, actual):
+    if isinstance(expected, dict):
+        assert list(expected) == list(actual)
+        for key in expected:
+            assert_close(expected[key], actual[key])
+    elif isinstance(expected, list):
+        assert len(expected) == len(actual)
+        for a, b in zip(expected, actual):
+            assert_close(a, b)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, abs=1e-9)
+    else:
+        assert expected == actual
+
+def test_round_trip_and_queries(tmp_path):
+    data = stored_copy(ChileanSMEFinancialDataGenerator(seed=3).generate_all_data())
+    write_store(str(tmp_path / "store"), data)
+    company = ColumnarStore(str(tmp_path / "store")).company(0)
+
+    exported = company.to_dict()
+    assert exported["company_info"] == data["company_info"]
+    for key in ("monthly_data", "quarterly_data", "yearly_data"):
+        assert len(exported[key]) == len(data[key])
+        for expected, actual in zip(data[key], exported[key]):
+            assert_close({k: expected[k] for k in actual}, actual)
+            assert set(actual) == set(expected)
+    assert company["monthly_data"][-1] == exported["monthly_data"][-1]
+    assert company["quarterly_data"][2:4] == exported["quarterly_data"][2:4]
+
+    pages, cursor = [], None
+    while True:
+        page = company.query(granularity="monthly", start="2023-03-01", end="2024-02-01",
+                             fields=["revenue", "balance_sheet.total_assets"], cursor=cursor, limit=5)
+        pages.extend(page["periods"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert [period["date"] for period in pages] == [month["date"] for month in data["monthly_data"][2:14]]
+    assert pages[0]["income_statement"] == {"revenue": data["monthly_data"][2]["income_statement"]["revenue"]}
+    assert pages[0]["balance_sheet"] == {"total_assets": data["monthly_data"][2]["balance_sheet"]["total_assets"]}
+    assert set(pages[0]) == {"date", "year", "month", "income_statement", "balance_sheet"}
+    with pytest.raises(ValueError):
+        company.query(fields=["no_such_line"])
+
+def test_rewrite_is_swapped_in_atomically(tmp_path):
+    directory = str(tmp_path / "store")
+    generator = ChileanSMEFinancialDataGenerator(seed=5)
+    first = stored_copy(generator.generate_all_data())
+    write_store(directory, first)
+    old = ColumnarStore(directory)
+    old_revenue = np.array(old.column("monthly", "income_statement", "revenue"))
+
+    second = stored_copy(ChileanSMEFinancialDataGenerator(seed=6).generate_all_data())
+    write_store(directory, second)
+
+    # Memory maps opened before the rewrite keep reading the old files
+    np.testing.assert_array_equal(old.column("monthly", "income_statement", "revenue"), old_revenue)
+    new = ColumnarStore(directory)
+    assert new.column("monthly", "income_statement", "revenue")[0].tolist() == \
+        [month["income_statement"]["revenue"] for month in second["monthly_data"]]
+    # No temporary or replaced directories are left behind
+    assert os.listdir(tmp_path) == ["store"]
+
+def test_appended_store_matches_a_rebuilt_one(tmp_path):
+    generator = ChileanSMEFinancialDataGenerator(seed=2)
+    data = stored_copy(generator.generate_all_data())
+    write_store(str(tmp_path / "appended"), data)
+    before = (tmp_path / "appended" / "monthly" / "income_statement.revenue.npy").read_bytes()
+
+    for months in (1, 2, 5, 12, 3):
+        update = generator.append_months(months)
+        data = merge_appended_data(data, stored_copy(update))
+        written = append_store(str(tmp_path / "appended"), update)
+        assert written["monthly"] == months
+    write_store(str(tmp_path / "rebuilt"), data)
+
+    appended = ColumnarStore(str(tmp_path / "appended"))
+    assert_same_store(appended, ColumnarStore(str(tmp_path / "rebuilt")))
+    assert validate_store(appended).ok
+    # The stored months were kept; only the header's shape changed
+    after = (tmp_path / "appended" / "monthly" / "income_statement.revenue.npy").read_bytes()
+    header = before.index(b"\n") + 1
+    assert after[header:len(before)] == before[header:]
+
+def test_append_resumes_from_saved_state(tmp_path):
+    generator = ChileanSMEFinancialDataGenerator(seed=4)
+    data = stored_copy(generator.generate_all_data())
+    write_store(str(tmp_path / "store"), data)
+    generator.save_state(str(tmp_path / "state.json"))
+
+    resumed = ChileanSMEFinancialDataGenerator.load_state(str(tmp_path / "state.json"))
+    append_store(str(tmp_path / "store"), resumed.append_months(4))
+    write_store(str(tmp_path / "rebuilt"), merge_appended_data(data, stored_copy(generator.append_months(4))))
+    assert_same_store(ColumnarStore(str(tmp_path / "store")), ColumnarStore(str(tmp_path / "rebuilt")))
+
+def test_append_rejects_months_that_do_not_follow(tmp_path):
+    generator = ChileanSMEFinancialDataGenerator(seed=1)
+    write_store(str(tmp_path / "store"), stored_copy(generator.generate_all_data()))
+    generator.append_months(1)
+    with pytest.raises(ValueError):
+        append_store(str(tmp_path / "store"), generator.append_months(1))
+    assert ColumnarStore(str(tmp_path / "store")).n_periods("monthly") == 24
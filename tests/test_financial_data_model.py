@@ -0,0 +1,44 @@
+import datetime
+
+import numpy as np
+
+from financial_data_model import ChileanSMEFinancialDataGenerator, MONTHLY_RATIO_FIELDS
+
+NOW = datetime.datetime(2024, 6, 1)
+
+def test_seeded_generator_draws_the_same_batches():
+    first, second = ChileanSMEFinancialDataGenerator(seed=3), ChileanSMEFinancialDataGenerator(seed=3)
+    assert first.generate_all_data(vectorized=True) == second.generate_all_data(vectorized=True)
+    assert first.generate_batch(4, 6).monthly_records(2) == second.generate_batch(4, 6).monthly_records(2)
+    other = ChileanSMEFinancialDataGenerator(seed=4)
+    assert other.generate_batch(4, 6).monthly_records(2) != first.generate_batch(4, 6).monthly_records(2)
+
+def test_saved_state_resumes_the_numpy_stream(tmp_path):
+    generator = ChileanSMEFinancialDataGenerator(seed=5)
+    generator.generate_all_data(vectorized=True)
+    path = str(tmp_path / "generator_state.json")
+    generator.save_state(path)
+    resumed = ChileanSMEFinancialDataGenerator.load_state(path)
+
+    expected = generator.generate_financing_history(50, now=NOW)
+    actual = resumed.generate_financing_history(50, now=NOW)
+    # due_date is NaT for open contracts
+    assert all(np.array_equal(expected[name], actual[name], equal_nan=name == "due_date") for name in expected)
+
+def test_period_reports_keep_the_original_format():
+    data = ChileanSMEFinancialDataGenerator(seed=1).generate_all_data()
+    months = data["monthly_data"]
+    flows = ["cash_from_operations", "cash_from_investing", "cash_from_financing", "net_change_in_cash"]
+    for quarter in data["quarterly_data"]:
+        last = next(month for month in months if month["year"] == quarter["year"]
+                    and month["month"] == quarter["months_included"][-1])
+        assert list(quarter["cash_flow_statement"]) == flows
+        assert quarter["balance_sheet"] == last["balance_sheet"]
+        assert quarter["financial_ratios"] == last["financial_ratios"]
+    for year in data["yearly_data"]:
+        in_year = [month for month in months if month["year"] == year["year"]]
+        net_income = sum(month["income_statement"]["net_income"] for month in in_year)
+        assert list(year["cash_flow_statement"]) == flows
+        assert list(year["financial_ratios"]) == MONTHLY_RATIO_FIELDS[:-1]
+        assert year["financial_ratios"]["return_on_assets"] == round(
+            net_income / in_year[-1]["balance_sheet"]["total_assets"] * 100, 2)
@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+
+from financial_data_model import ChileanSMEFinancialDataGenerator
+from financing_ledger import FinancingLedger
+
+SPECS = ("id", "-amount", "request_date,-amount", "status,-request_date", "-status,amount")
+
+def contracts(n, first_id=1, seed=0):
+    columns = ChileanSMEFinancialDataGenerator(seed=0).generate_financing_history(n, rng=seed)
+    columns["id"] = columns["id"] + first_id - 1
+    return columns
+
+def slice_columns(columns, start, stop):
+    return {name: values[start:stop] for name, values in columns.items()}
+
+def all_pages(ledger, sort, **filters):
+    ids, cursor = [], None
+    while True:
+        page = ledger.query(sort=sort, cursor=cursor, limit=97, **filters)
+        ids.extend(contract["id"] for contract in page["contracts"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, page["total"]
+
+def test_appends_are_merged_into_cached_orders():
+    columns = contracts(5000)
+    ledger = FinancingLedger.from_columns(slice_columns(columns, 0, 3000))
+    for spec in SPECS:
+        ledger.query(sort=spec)
+    ledger.rows(status="Denied")
+    for start in range(3000, 5000, 500):
+        ledger.add_columns(slice_columns(columns, start, start + 500))
+
+    rebuilt = FinancingLedger.from_columns(columns)
+    for spec in SPECS:
+        assert spec in {",".join(("-" if d else "") + k for k, d in cached) for cached in ledger._orders}
+        assert all_pages(ledger, spec) == all_pages(rebuilt, spec)
+    assert np.array_equal(ledger.rows(status="Denied"), rebuilt.rows(status="Denied"))
+
+def test_totals_follow_appends_and_status_changes():
+    columns = contracts(4000)
+    ledger = FinancingLedger.from_columns(slice_columns(columns, 0, 2000))
+    filters = [{}, {"status": ["Waiting approval", "Denied"]}, {"min_amount": 10.0, "max_amount": 80.0},
+               {"status": "Denied", "start": "2024-01-01"}]
+
+    def check():
+        for f in filters:
+            ids, total = all_pages(ledger, "-amount", **f)
+            assert total == len(ids)
+
+    check()
+    ledger.add_columns(slice_columns(columns, 2000, 4000))
+    check()
+    for contract_id in range(1, 200, 3):
+        ledger.set_status(contract_id, "Closed")
+    check()
+
+def test_concurrent_queries_during_appends():
+    columns = contracts(6000)
+    ledger = FinancingLedger.from_columns(slice_columns(columns, 0, 2000))
+    errors = []
+
+    def query(n):
+        try:
+            for i in range(40):
+                ledger.query(sort=SPECS[(n + i) % len(SPECS)], min_amount=float(i * 1000), limit=20)
+                ledger.rows(status="Denied")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=query, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for start in range(2000, 6000, 250):
+        ledger.add_columns(slice_columns(columns, start, start + 250))
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    rebuilt = FinancingLedger.from_columns(columns)
+    for spec in SPECS:
+        assert all_pages(ledger, spec, min_amount=5000.0) == all_pages(rebuilt, spec, min_amount=5000.0)
+    assert np.array_equal(ledger.rows(status="Denied"), rebuilt.rows(status="Denied"))
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from columnar_store import ColumnarStore, write_store
+from gl_ingest import AccountMapper, ingest_ledger, write_sample_ledger
+from integrity import validate_batch
+
+# Capital contribution, a credit sale collected the next month and two expenses; April is empty
+LEDGER = """entry,date,account,debit,credit
+1,2024-01-02,110101,1000,
+1,2024-01-02,310101,,1000
+2,2024-01-15,110201,300,
+2,2024-01-15,410101,,300
+3,2024-01-20,520101,50,
+3,2024-01-20,110101,,50
+4,2024-02-10,110101,300,
+4,2024-02-10,110201,,300
+5,2024-03-05,120101,200,
+5,2024-03-05,110101,,200
+6,2024-03-31,530101,20,
+6,2024-03-31,120101,,20
+7,2024-05-01,110101,100,
+7,2024-05-01,220101,,100
+"""
+
+def write(tmp_path, text, name="ledger.csv"):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def month(batch, statement, field):
+    return batch.statements[statement][field][0].tolist()
+
+def test_statements_from_journal_lines(tmp_path):
+    batch, stats = ingest_ledger(write(tmp_path, LEDGER))
+    assert [d.strftime("%Y-%m") for d in batch.dates] == ["2024-01", "2024-02", "2024-03", "2024-04", "2024-05"]
+    assert (stats["rows"], stats["months"], stats["unmapped"]) == (14, 5, {})
+
+    assert month(batch, "income_statement", "revenue") == [300, 0, 0, 0, 0]
+    assert month(batch, "income_statement", "net_income") == [250, 0, -20, 0, 0]
+    assert month(batch, "balance_sheet", "cash_and_equivalents") == [950, 1250, 1050, 1050, 1150]
+    assert month(batch, "balance_sheet", "accounts_receivable") == [300, 0, 0, 0, 0]
+    assert month(batch, "balance_sheet", "property_plant_equipment") == [0, 0, 180, 180, 180]
+    assert month(batch, "balance_sheet", "retained_earnings") == [250, 250, 230, 230, 230]
+    assert month(batch, "balance_sheet", "long_term_debt") == [0, 0, 0, 0, 100]
+    # Capex is the PPE change plus depreciation; the equity contribution is financing
+    assert month(batch, "cash_flow_statement", "cash_from_investing") == [0, 0, -200, 0, 0]
+    assert month(batch, "cash_flow_statement", "cash_from_financing") == [1000, 0, 0, 0, 100]
+    assert month(batch, "cash_flow_statement", "cash_from_operations") == [-50, 300, 0, 0, 0]
+    assert month(batch, "cash_flow_statement", "beginning_cash_balance") == [0, 950, 1250, 1050, 1050]
+    assert validate_batch(batch).ok
+
+def test_chunking_does_not_change_the_statements(tmp_path):
+    path = str(tmp_path / "sample.csv")
+    write_sample_ledger(path, 20_000, months=14, chunk_lines=3_000)
+    whole, stats = ingest_ledger(path, chunk_rows=1_000_000)
+    chunked, chunked_stats = ingest_ledger(path, chunk_rows=777)
+    assert stats["chunks"] == 1 and chunked_stats["chunks"] == -(-stats["rows"] // 777)
+    for statement, fields in whole.statements.items():
+        for field, values in fields.items():
+            np.testing.assert_allclose(chunked.statements[statement][field], values, atol=1e-6)
+    assert len(whole.dates) == 14
+    assert validate_batch(whole).ok
+
+    write_store(str(tmp_path / "store"), whole)
+    store = ColumnarStore(str(tmp_path / "store"))
+    assert store.n_periods("monthly") == 14 and store.n_periods("quarterly") == 5
+
+def test_signed_amounts_custom_maps_and_unmapped_accounts(tmp_path):
+    path = write(tmp_path, "date;account;amount\n"
+                           "01/02/2024;1000;500\n01/02/2024;3000;-500\n"
+                           "15/02/2024;9999;42\n15/02/2024;4000;-80\n15/02/2024;1000;80\n")
+    account_map = {"1": "cash_and_equivalents", "3": "capital", "4": "revenue"}
+    batch, stats = ingest_ledger(path, account_map=account_map, date_format="%d/%m/%Y", scale=0.5,
+                                 amount_column="amount", delimiter=";")
+    assert stats["unmapped"] == {"9999": 1}
+    assert month(batch, "balance_sheet", "cash_and_equivalents") == [290]
+    assert month(batch, "income_statement", "revenue") == [40]
+    with pytest.raises(ValueError, match="9999"):
+        ingest_ledger(path, account_map=account_map, date_format="%d/%m/%Y", amount_column="amount",
+                      delimiter=";", strict=True)
+
+def test_invalid_input(tmp_path):
+    with pytest.raises(ValueError, match="no column credit"):
+        ingest_ledger(write(tmp_path, "date,account,debit\n2024-01-01,1101,5\n"))
+    with pytest.raises(ValueError, match="Malformed journal line"):
+        ingest_ledger(write(tmp_path, "date,account,debit,credit\n2024-01-01,1101,five,\n"))
+    with pytest.raises(ValueError, match="no mapped journal lines"):
+        ingest_ledger(write(tmp_path, "date,account,debit,credit\n2024-01-01,9999,5,\n"))
+    with pytest.raises(ValueError, match="Unknown line items"):
+        AccountMapper({"1": "cash"})
+    # The longest matching prefix wins
+    mapper = AccountMapper({"1": "cash_and_equivalents", "1102": "accounts_receivable"})
+    assert (mapper["110201"], mapper["1101"], mapper["2"]) == (1, 0, -1)
@@ -0,0 +1,72 @@
+import copy
+
+import numpy as np
+
+from columnar_store import ColumnarStore, write_store
+from financial_data_model import ChileanSMEFinancialDataGenerator
+from integrity import (IntegrityReport, validate_batch, validate_financial_data, validate_portfolio,
+                       validate_store)
+from portfolio import generate_portfolio
+
+def violated(report):
+    return {name for name, count in report.violations.items() if count}
+
+def test_generated_data_passes(tmp_path):
+    generator = ChileanSMEFinancialDataGenerator(seed=7)
+    data = copy.deepcopy(generator.generate_all_data())
+    report = validate_financial_data(data)
+    assert report.ok and report.examples == []
+    assert report.checked["monthly/balance_sheet_equation"] == 24
+    assert report.checked["quarter/sum/revenue"] == 8 and report.checked["year/closing/total_assets"] == 2
+
+    assert validate_batch(generator.generate_batch(50, 18)).ok
+    write_store(str(tmp_path / "store"), data)
+    assert validate_store(ColumnarStore(str(tmp_path / "store"))).ok
+
+def test_corrupted_values_are_located():
+    data = copy.deepcopy(ChileanSMEFinancialDataGenerator(seed=7).generate_all_data())
+    data["monthly_data"][5]["balance_sheet"]["total_assets"] += 100
+    data["quarterly_data"][3]["income_statement"]["revenue"] += 1
+    report = validate_financial_data(data)
+    assert violated(report) == {"monthly/total_assets", "monthly/balance_sheet_equation", "quarter/gross_profit",
+                                "quarter/sum/revenue", "quarter/closing/total_assets"}
+    assert report.total_violations == 5 and not report.summary()["ok"]
+
+    example = next(example for example in report.examples if example["check"] == "monthly/balance_sheet_equation")
+    assert example["company"] == 0 and example["period"] == "2023-06-01"
+    assert round(example["actual"] - example["expected"], 6) == round(example["difference"], 6) == 100
+    example = next(example for example in report.examples if example["check"] == "quarter/sum/revenue")
+    assert example["period"] == "2023Q4" and round(example["difference"], 6) == 1
+
+def test_tolerance_scales_with_the_rounded_values():
+    periods = ["2024-01-01", "2024-02-01"]
+    report = IntegrityReport()
+    # Three values rounded to cents can be off by up to 1.5 cents together
+    report.check("within", [[100.0, 200.0]], [[100.014, 199.986]], 3, periods)
+    report.check("outside", [[100.0, 200.0]], [[100.016, 200.0]], 3, periods)
+    report.check("nan", [[np.nan, 1.0]], [[1.0, 1.0]], 1, periods)
+    # rtol allows for the float error of large magnitudes
+    report.check("large", [[1e9]], [[1e9 + 500]], 1, periods)
+    assert report.violations == {"within": 0, "outside": 1, "nan": 1, "large": 0}
+    assert [(example["check"], example["period"]) for example in report.examples] == \
+        [("outside", "2024-01-01"), ("nan", "2024-01-01")]
+
+    batch = ChileanSMEFinancialDataGenerator(seed=2).generate_batch(20, 12)
+    for fields in batch.statements.values():
+        for name in fields:
+            fields[name] = np.round(fields[name], 2)
+    assert validate_batch(batch).ok
+    assert not validate_batch(batch, atol=0).ok
+
+def test_portfolio_reports_are_merged(tmp_path):
+    generate_portfolio(5, 11, str(tmp_path), workers=1, shard_size=2, months=12)
+    report = validate_portfolio(str(tmp_path))
+    assert report.ok and report.checked["monthly/total_assets"] == 5 * 12
+
+    merged = IntegrityReport(max_examples=3)
+    for offset in (0, 2):
+        shard = IntegrityReport(company_offset=offset)
+        shard.check("monthly/cash_balance", np.ones((2, 2)), np.zeros((2, 2)), 1, ["a", "b"])
+        merged.merge(shard)
+    assert merged.violations == {"monthly/cash_balance": 8} and len(merged.examples) == 3
+    assert [example["company"] for example in merged.examples] == [0, 0, 1]
@@ -0,0 +1,40 @@
+import pytest
+
+from intent_router import IntentRouter
+
+router = IntentRouter()
+
+# The suggested questions and chat history of templates/index.html, with the intent
+# the original substring checks ("cashflow"/"cash flow", "expenses", "predict"/"forecast") gave them
+@pytest.mark.parametrize("message, intent", [
+    ("How can I optimize my business cashflow?", "cash_flow"),
+    ("What expenses are increasing the most this month?", "expenses"),
+    ("Predict my financial status in 30 days?", "forecast"),
+    ("Cash flow optimization for next month", "cash_flow"),
+    ("Upcoming payments for ABC", None),
+    ("Supplier ABC analysis", None),
+    ("Costs analysis", None),
+    ("New machine impact on cash", None),
+    ("How can you help me?", None),
+    ("Show me the cash flow forecast", "cash_flow"),
+])
+def test_baseline_examples(message, intent):
+    assert router.best(message) == intent
+
+@pytest.mark.parametrize("message, intent", [
+    ("¿Cómo mejoro mi flujo de caja?", "cash_flow"),
+    ("Saldo de las cajas", "cash_flow"),
+    ("Pronóstico de ventas", "forecast"),
+    ("Mis gastos del mes", "expenses"),
+])
+def test_synonyms_and_longer_forms(message, intent):
+    assert router.best(message) == intent
+
+@pytest.mark.parametrize("message", [
+    "Costume party budget",
+    "That was costly",
+    "Cashier hours",
+    "Habla con el cajero",
+])
+def test_short_terms_match_whole_words_only(message):
+    assert router.match(message) == []
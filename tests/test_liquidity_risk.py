@@ -0,0 +1,21 @@
+import numpy as np
+
+from liquidity_risk import StreamingQuantiles, _histogram
+
+def test_streaming_quantiles_match_exact_quantiles():
+    rng = np.random.default_rng(0)
+    values = np.cumsum(rng.normal(1.0, 5.0, size=(60_000, 12)), axis=1)
+    sketch = _histogram(values[:10_000])
+    for start in range(0, len(values), 10_000):
+        sketch.add(values[start:start + 10_000])
+    q = [0.01, 0.05, 0.5, 0.95, 0.99]
+    spread = values.max(axis=0) - values.min(axis=0)
+    assert np.all(np.abs(sketch.quantiles(q) - np.quantile(values, q, axis=0)) < 1e-3 * spread)
+    assert np.array_equal(sketch.minimum, values.min(axis=0))
+
+def test_values_outside_the_range_stay_within_the_extremes():
+    sketch = StreamingQuantiles(low=[0.0], high=[1.0], bins=10)
+    sketch.add(np.array([[-5.0], [0.5], [0.6], [9.0]]))
+    quantiles = sketch.quantiles([0.0, 0.1, 0.9, 1.0])[:, 0]
+    assert quantiles[0] == -5.0 and quantiles[-1] == 9.0
+    assert np.all(np.diff(quantiles) >= 0)
@@ -0,0 +1,58 @@
+import time
+import threading
+
+import pytest
+
+from llm_cache import LLMResponseCache
+
+def test_waiters_share_the_owners_answer():
+    cache = LLMResponseCache()
+    key = cache.key("How is my cash?", {"cash": 1})
+    answer, pending, owner = cache.lookup(key)
+    assert answer is None and pending is None and owner is not None
+    _, pending, _ = cache.lookup(key)
+    cache.complete(key, owner, "Fine")
+    assert pending.result(0) == "Fine"
+    assert cache.lookup(key) == ("Fine", None, None)
+
+def test_abandoned_owner_is_replaced_after_the_deadline():
+    cache = LLMResponseCache(in_flight_timeout=0.05)
+    key = cache.key("How is my cash?", {"cash": 1})
+    _, _, owner = cache.lookup(key)
+    _, pending, _ = cache.lookup(key)
+    time.sleep(0.06)
+    # The owner never completed: the next caller takes over and the old waiters fail
+    _, _, new_owner = cache.lookup(key)
+    assert new_owner is not None and new_owner is not owner
+    with pytest.raises(TimeoutError):
+        pending.result(0)
+    assert cache.stats()["abandoned"] == 1
+    cache.complete(key, new_owner, "Fine")
+    assert cache.stats()["in_flight"] == 0
+
+def test_abandoned_owner_finishing_late_leaves_the_new_owner_alone():
+    cache = LLMResponseCache(in_flight_timeout=0.05)
+    key = cache.key("How is my cash?", {"cash": 1})
+    _, _, stale = cache.lookup(key)
+    time.sleep(0.06)
+    _, _, owner = cache.lookup(key)
+    _, waiting, _ = cache.lookup(key)
+
+    cache.fail(key, stale, RuntimeError("late failure"))
+    assert not waiting.done() and cache.stats()["in_flight"] == 1
+    cache.complete(key, stale, "Late")
+    assert not waiting.done() and cache.stats()["in_flight"] == 1
+
+    cache.complete(key, owner, "Fine")
+    assert waiting.result(0) == "Fine"
+    assert cache.lookup(key) == ("Fine", None, None)
+
+def test_get_or_compute_waits_a_bounded_time_then_computes():
+    cache = LLMResponseCache(in_flight_timeout=60)
+    key = cache.key("How is my cash?", {"cash": 1})
+    cache.lookup(key)  # an owner that hangs
+    results = []
+    thread = threading.Thread(target=lambda: results.append(cache.get_or_compute(key, lambda: "Computed", timeout=0.05)))
+    thread.start()
+    thread.join(5)
+    assert results == ["Computed"]
@@ -0,0 +1,57 @@
+import copy
+
+import numpy as np
+
+from columnar_store import ColumnarStore, write_store
+from financial_data_model import ChileanSMEFinancialDataGenerator, merge_appended_data
+from ratio_engine import (RatioEngine, IncrementalRatios, FINANCIAL_RATIOS, WORKING_CAPITAL_RATIOS,
+                          store_ratio_inputs, store_ratios)
+
+DEFINITIONS = {**FINANCIAL_RATIOS, **WORKING_CAPITAL_RATIOS}
+
+class CountingEngine(RatioEngine):
+    """Records the number of periods of every evaluation."""
+
+    def __init__(self, definitions):
+        super().__init__(definitions)
+        self.evaluated = []
+
+    def evaluate(self, columns, names=None):
+        self.evaluated.append(np.broadcast_shapes(*(np.shape(values) for values in columns.values()))[-1])
+        return super().evaluate(columns, names)
+
+def assert_same(table, expected):
+    for name in expected:
+        np.testing.assert_allclose(table[name], expected[name], equal_nan=True)
+
+def test_only_appended_and_changed_periods_are_evaluated(tmp_path):
+    engine = CountingEngine(DEFINITIONS)
+    generator = ChileanSMEFinancialDataGenerator(seed=3)
+    financial_data = generator.generate_all_data()
+    write_store(str(tmp_path / "v1"), financial_data)
+    states = {granularity: IncrementalRatios(engine) for granularity in ("monthly", "quarterly")}
+    for granularity, state in states.items():
+        state.update(store_ratio_inputs(ColumnarStore(str(tmp_path / "v1")), granularity, engine))
+    months = len(financial_data["monthly_data"])
+
+    # Three more months, written as a new version of the store
+    financial_data = merge_appended_data(copy.deepcopy(financial_data), generator.append_months(3))
+    write_store(str(tmp_path / "v2"), financial_data)
+    store = ColumnarStore(str(tmp_path / "v2"))
+    engine.evaluated.clear()
+    monthly = states["monthly"].update(store_ratio_inputs(store, "monthly", engine))
+    assert states["monthly"].last_recomputed == 3 and engine.evaluated == [3]
+    assert_same(monthly, store_ratios(store, "monthly", RatioEngine(DEFINITIONS)).values)
+    assert store.n_periods("monthly") == months + 3
+
+    engine.evaluated.clear()
+    quarterly = states["quarterly"].update(store_ratio_inputs(store, "quarterly", engine))
+    # The new months open one quarter (and may finish the last one)
+    assert 1 <= states["quarterly"].last_recomputed <= 2
+    assert engine.evaluated == [states["quarterly"].last_recomputed]
+    assert_same(quarterly, store_ratios(store, "quarterly", RatioEngine(DEFINITIONS)).values)
+
+    # Unchanged inputs evaluate nothing
+    engine.evaluated.clear()
+    states["monthly"].update(store_ratio_inputs(store, "monthly", engine))
+    assert states["monthly"].last_recomputed == 0 and engine.evaluated == []
@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from request_ledger import RequestLedger
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = RequestLedger(str(tmp_path / "requests.db"))
+    yield ledger
+    ledger.close()
+
+def hold_writer(ledger):
+    """Queue an operation that blocks the writer until the returned event is set, so the next ones share a commit."""
+    started, release = threading.Event(), threading.Event()
+
+    def wait(connection):
+        started.set()
+        release.wait(5)
+
+    ledger._enqueue(wait)
+    started.wait(5)
+    return release
+
+def count(ledger, table):
+    with ledger._reader() as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def test_failed_operation_writes_nothing_in_a_shared_commit(ledger):
+    release = hold_writer(ledger)
+    before = ledger.submit_async(1, 100)
+
+    def insert_then_fail(connection):
+        connection.execute("INSERT INTO financing_requests (company_id, amount, status, request_date, updated_at) "
+                           "VALUES (1, 5, 'Waiting approval', '2024-01-01', '2024-01-01')")
+        raise RuntimeError("failed part-way")
+
+    failing = ledger._enqueue(insert_then_fail)
+    unknown = ledger.set_status_async(999, "Denied")
+    after = ledger.add_many_async(1, [{"amount": 7}, {"amount": 8, "purpose": "Working capital"}])
+    commits = ledger.commits
+    release.set()
+
+    assert before.result(5) == 1
+    with pytest.raises(RuntimeError):
+        failing.result(5)
+    with pytest.raises(KeyError):
+        unknown.result(5)
+    assert after.result(5) == 2
+    # The waiting operation's commit plus one for everything queued behind it
+    assert ledger.commits - commits <= 2
+    assert [request["amount"] for request in ledger.query(1)["requests"]] == [8.0, 7.0, 100.0]
+    assert count(ledger, "financing_requests") == 3
+    assert count(ledger, "status_transitions") == 3
+
+def test_invalid_details_are_rejected_before_queueing(ledger):
+    for details in ({"purpose": {"x": 1}}, {"rate": True}, {"rate": "high"}, {"payments": 1.5},
+                    {"duration_days": float("nan")}):
+        with pytest.raises(ValueError):
+            ledger.add_many(1, [{"amount": 5}, {"amount": 6, **details}])
+    with pytest.raises(ValueError):
+        ledger.submit(1, float("inf"))
+    assert ledger.operations == 0
+    request_id = ledger.submit(1, 5, rate=2, payments=4.0, lending_type="Factoring")
+    request = ledger.get(request_id)
+    assert (request["rate"], request["payments"], request["lending_type"]) == (2.0, 4, "Factoring")
+
+def test_concurrent_submissions_are_group_committed(ledger):
+    writers, per_writer = 16, 50
+    ids, errors = [], []
+    lock = threading.Lock()
+
+    def submit(company_id):
+        try:
+            for i in range(per_writer):
+                request_id = ledger.submit(company_id, 10 + i, request_date=f"2024-01-{i % 28 + 1:02d}")
+                with lock:
+                    ids.append(request_id)
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        # Readers run alongside the writer without errors or partial pages
+        try:
+            while len(ids) < writers * per_writer and not errors:
+                page = ledger.query(0, limit=20)
+                assert len(page["requests"]) <= 20
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=submit, args=(n % 4,)) for n in range(writers)]
+    threads.append(threading.Thread(target=read))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert sorted(ids) == list(range(1, writers * per_writer + 1))
+    assert ledger.operations == writers * per_writer
+    assert ledger.commits < ledger.operations
+    assert ledger.largest_batch > 1
+    assert sum(status["count"] for company in range(4) for status in ledger.summary(company).values()) == len(ids)
+    assert count(ledger, "status_transitions") == len(ids)
+
+def test_closed_ledger_rejects_writes(tmp_path):
+    ledger = RequestLedger(str(tmp_path / "requests.db"))
+    ledger.submit(1, 5)
+    ledger.close()
+    with pytest.raises(RuntimeError):
+        ledger.submit(1, 5)
@@ -0,0 +1,75 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, request
+
+from response_cache import ResponseCache, MIN_GZIP_SIZE
+
+@pytest.fixture
+def served():
+    """A Flask client serving /data/<n> through a ResponseCache, and the calls to build()."""
+    app = Flask(__name__)
+    cache = ResponseCache(max_bytes=64 * 1024)
+    state = {"version": 1, "builds": 0}
+
+    @app.route("/data/<int:n>")
+    def data(n):
+        def build():
+            state["builds"] += 1
+            return {"version": state["version"], "values": list(range(n))}
+        return cache.get(state["version"], n, build, json.dumps).to_response(request)
+
+    return app.test_client(), cache, state
+
+def test_built_once_per_version(served):
+    client, cache, state = served
+    first = client.get("/data/10")
+    assert client.get("/data/10").data == first.data
+    assert state["builds"] == 1 and (cache.hits, cache.misses) == (1, 1)
+    state["version"] = 2
+    assert json.loads(client.get("/data/10").data)["version"] == 2
+    assert state["builds"] == 2
+
+def test_etag_revalidation(served):
+    client, _, state = served
+    response = client.get("/data/10")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200 and response.headers["Cache-Control"] == "no-cache"
+
+    revalidated = client.get("/data/10", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304 and revalidated.data == b""
+    assert revalidated.headers["ETag"] == etag
+    assert client.get("/data/10", headers={"If-None-Match": "*"}).status_code == 304
+    assert client.get("/data/10", headers={"If-None-Match": '"other"'}).status_code == 200
+
+    # A new data version changes the body and so the ETag
+    state["version"] = 2
+    assert client.get("/data/10", headers={"If-None-Match": etag}).status_code == 200
+
+def test_gzip_for_large_bodies(served):
+    client, _, _ = served
+    plain = client.get("/data/1000")
+    assert len(plain.data) >= MIN_GZIP_SIZE and "Content-Encoding" not in plain.headers
+
+    compressed = client.get("/data/1000", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(compressed.data) == plain.data
+    # Each encoding has its own ETag, and either revalidates
+    assert compressed.headers["ETag"] != plain.headers["ETag"]
+    assert client.get("/data/1000", headers={"Accept-Encoding": "gzip",
+                                             "If-None-Match": plain.headers["ETag"]}).status_code == 304
+
+    small = client.get("/data/3", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+def test_bounded_by_bytes():
+    cache = ResponseCache(max_bytes=2000)
+    for n in range(20):
+        cache.get(1, n, lambda: "x" * 300, lambda body: body)
+    assert cache.size <= 2000 and len(cache._entries) == 2000 // 300
+    # The least recently used entries were evicted
+    assert (1, 19) in cache._entries and (1, 0) not in cache._entries
+    assert cache.get(1, "big", lambda: "x" * 5000, lambda body: body).body == b"x" * 5000
+    assert (1, "big") not in cache._entries
@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+import app as app_module
+from tenant_store import TenantStore, UnknownTenantError
+
+class FakeTenant:
+    def __init__(self, company_id, nbytes):
+        self.company_id = company_id
+        self.nbytes = nbytes
+
+def test_least_recently_used_tenants_are_evicted():
+    loads = []
+
+    def load(company_id):
+        loads.append(company_id)
+        return FakeTenant(company_id, 100)
+
+    store = TenantStore(load, max_bytes=300)
+    for company_id in (1, 2, 3):
+        store.get(company_id)
+    store.get(1)
+    store.get(4)
+    assert [tenant.company_id for tenant in store.loaded()] == [3, 1, 4]
+    assert store.size == 300 and store.evictions == 1
+    store.get(2)
+    assert loads == [1, 2, 3, 4, 2]
+    assert store.stats()["hits"] == 1
+
+    # Tenants larger than the whole budget are served but not kept
+    store.loader = lambda company_id: FakeTenant(company_id, 1000)
+    assert store.get(9).nbytes == 1000
+    assert 9 not in [tenant.company_id for tenant in store.loaded()]
+
+def test_concurrent_requests_share_one_load_and_failures_are_not_cached():
+    release = threading.Event()
+    calls = []
+
+    def load(company_id):
+        calls.append(company_id)
+        release.wait(5)
+        if company_id >= 100:
+            raise UnknownTenantError(f"Unknown company {company_id}")
+        return FakeTenant(company_id, 10)
+
+    store = TenantStore(load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get(7))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while store.misses + store.coalesced < 8:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len({id(tenant) for tenant in results}) == 1 and calls == [7]
+
+    for _ in range(2):
+        with pytest.raises(UnknownTenantError):
+            store.get(100)
+    assert calls == [7, 100, 100] and store.loaded() == results[:1]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(app_module, "TENANTS_DIR", str(tmp_path / "data" / "tenants"))
+    monkeypatch.setattr(app_module, "REQUEST_LEDGER_PATH", str(tmp_path / "data" / "financing_requests.db"))
+    monkeypatch.setattr(app_module, "_request_ledger", None)
+    app_module.tenant_store.clear()
+    yield app_module.app.test_client()
+    app_module.tenant_store.clear()
+    if app_module._request_ledger is not None:
+        app_module._request_ledger.close()
+
+@pytest.mark.parametrize("method, path", [
+    ("GET", "/dashboard"),
+    ("GET", "/api/financial-data"),
+    ("GET", "/api/financing/requests"),
+    ("GET", "/api/financing/requests/summary"),
+    ("POST", "/api/financing/requests"),
+    ("GET", "/api/financing/requests/1"),
+    ("POST", "/api/financing/requests/1/status"),
+])
+@pytest.mark.parametrize("company", ["9", "abc", "²", str(app_module.MAX_COMPANIES)])
+def test_unknown_companies_are_404(client, tmp_path, method, path, company):
+    response = client.open(path, method=method, query_string={"company": company}, json={"amount": 100})
+    assert response.status_code == 404
+    assert "Unknown company" in response.get_json()["error"]
+    # Nothing is generated or recorded for them
+    assert not (tmp_path / "data").exists()
+
+def test_generated_companies_are_served(client, tmp_path):
+    assert client.get("/api/financial-data?company=3").status_code == 404
+    app_module.load_or_generate_data(3)
+    data = client.get("/api/financial-data?company=3").get_json()
+    assert data["company_info"]["name"] == "Company 000004"
+    response = client.post("/api/financing/requests?company=3", json={"amount": 100})
+    assert response.status_code == 201
+    request_id = response.get_json()["id"]
+    assert client.get(f"/api/financing/requests/{request_id}?company=3").status_code == 200
+    # Another company's requests are not found
+    app_module.load_or_generate_data(4)
+    response = client.get(f"/api/financing/requests/{request_id}?company=4")
+    assert response.status_code == 404 and "financing request" in response.get_json()["error"]